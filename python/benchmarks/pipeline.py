@@ -0,0 +1,469 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+'''
+Benchmark the generation pipeline on a synthetic corpus of models.
+
+For every corpus size a tree of R-Type models is generated. Every run is a
+fresh interpreter, so the peak memory of the sizes does not add up. The
+toolchain and gem5 are replaced by stand-in trees, that only contain the
+files the generation steps read and write, the gem5 isa parser is replaced
+by a parser, that only resolves the includes. The phases are:
+    parse            Parser.parse_models
+    instructions     Extensions.gen_instructions, includes the check
+    check            Extensions.check_opcodes
+    compiler.*       Compiler.extend_header/extend_source/extend_stdlibs
+    gem5.decoder     Gem5.gen_decoder
+    gem5.cxx         Gem5.gen_cxx_files
+
+The results are saved as baseline with --save. With --baseline, phases
+that got slower or use more memory than the threshold allows are flagged
+and the exit status is 1.
+'''
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from mako.template import Template
+
+pythonpath = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, pythonpath)
+from modelparsing.allocator import OPCODES
+from modelparsing.compiler import Compiler
+from modelparsing.compiler import OPCC
+from modelparsing.compiler import OPCH
+from modelparsing.compiler import TERMINATOR
+from modelparsing.gem5 import Gem5
+from modelparsing.model import Model
+from modelparsing.parser import Parser
+from tst.scripts import model_gen
+from tst.scripts.ccmodel import CCModel
+
+# bump, if the layout of the results changes
+VERSION = 1
+
+SIZES = [10, 100, 1000, 4000]
+
+PHASES = ['parse',
+          'instructions',
+          'check',
+          'compiler.header',
+          'compiler.source',
+          'compiler.stdlibs',
+          'gem5.decoder',
+          'gem5.cxx']
+
+# differences below this duration (seconds) are never flagged
+NOISE = 0.002
+
+# encodings of the builtin models, that access the custom registers
+RESERVED = set((model.opc, model.funct3, model.funct7)
+               for model in (Model(read=True), Model(write=True)))
+
+# number of R-Type models, that fit in the custom opcodes
+MAXSIZE = len(OPCODES) * 8 * 128 - len(RESERVED)
+
+# replaces isa_parser.py of gem5
+ISAPARSER = r"""
+import os
+import re
+
+# files, the gem5 isa parser generates
+OUTPUTS = ['decoder-ns.cc.inc', 'decoder-ns.hh.inc', 'exec-ns.cc.inc']
+
+
+class ISAParser(object):
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def read(self, file, lines):
+        if not os.path.isfile(file):
+            return
+        with open(file, 'r') as fh:
+            for line in fh:
+                match = re.match(r'^\s*##include\s+"([^"]+)"', line)
+                if match:
+                    self.read(os.path.join(os.path.dirname(file),
+                                           match.group(1)), lines)
+                else:
+                    lines.append(line)
+
+    def parse_isa_desc(self, isa_desc):
+        lines = []
+        self.read(isa_desc, lines)
+        for name in OUTPUTS:
+            with open(os.path.join(self.output_dir, name), 'w') as fh:
+                fh.writelines(lines)
+"""
+
+
+def encodings():
+    '''
+    Yield all free R-Type encodings of the custom opcodes.
+    '''
+    for opc in OPCODES:
+        for funct3 in range(8):
+            for funct7 in range(128):
+                if (opc, funct3, funct7) not in RESERVED:
+                    yield opc, funct3, funct7
+
+
+def corpus(path, size):
+    '''
+    Write size models and a register file below path.
+    Every model is placed in its own directory, like the models
+    in extensions/.
+    '''
+    modelgen = Template(filename=model_gen)
+    for i, (opc, funct3, funct7) in zip(range(size), encodings()):
+        name = 'bench{}'.format(i)
+        model = CCModel(name, 'R', 'uint32_t', opc, funct3, funct7, [])
+        os.makedirs(os.path.join(path, name))
+        with open(os.path.join(path, name, name + '.cc'), 'w') as fh:
+            fh.write(modelgen.render(model=model))
+
+    with open(os.path.join(path, 'registers.hh'), 'w') as fh:
+        for i in range(16):
+            fh.write('#define CUSTOM_REG_{} 0x{:03x}\n'.format(i, 0x800 + i))
+
+
+def toolchain(path):
+    '''
+    Create a stand-in toolchain below path and return its path.
+    '''
+    opch = os.path.join(path, OPCH)
+    os.makedirs(os.path.dirname(opch))
+    with open(opch, 'w') as fh:
+        fh.write('#ifndef RISCV_ENCODING_H\n#define RISCV_ENCODING_H\n')
+        for i in range(256):
+            fh.write('#define MATCH_BASE{0} 0x{0:x}\n'.format(i))
+            fh.write('#define MASK_BASE{} 0x707f\n'.format(i))
+        fh.write('#endif\n')
+
+    opcc = os.path.join(path, OPCC)
+    os.makedirs(os.path.dirname(opcc))
+    with open(opcc, 'w') as fh:
+        fh.write('const struct riscv_opcode riscv_opcodes[] =\n{\n')
+        for i in range(256):
+            fh.write('{{"base{0}",  "I",  "d,s,t", MATCH_BASE{0}, '
+                     'MASK_BASE{0}, match_opcode, 0 }},\n'.format(i))
+        fh.write('\n' + TERMINATOR)
+        fh.write('{0, 0, 0, 0, 0, 0, 0}\n};\n')
+
+    install = os.path.join(path, 'install')
+    os.makedirs(os.path.join(install, 'lib/gcc/riscv32-unknown-elf',
+                             '7.2.0/include'))
+    with open(os.path.join(path, 'Makefile'), 'w') as fh:
+        fh.write('INSTALL_DIR := {}\n'.format(install))
+
+    return path
+
+
+def gem5(path):
+    '''
+    Create a stand-in gem5 checkout below path and return its path.
+    '''
+    decoder = os.path.join(path, 'src/arch/riscv/isa/decoder/rv32.isa')
+    os.makedirs(os.path.dirname(decoder))
+    with open(decoder, 'w') as fh:
+        fh.write('decode OPCODE default Unknown::unknown() {\n}\n')
+
+    with open(os.path.join(path, 'src/arch/isa_parser.py'), 'w') as fh:
+        fh.write(ISAPARSER)
+
+    return path
+
+
+def peak():
+    '''
+    Return the peak memory of this process in KiB.
+    '''
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # bytes instead of KiB
+        maxrss //= 1024
+    return maxrss
+
+
+def pipeline(workdir, jobs, fast, lowmem):
+    '''
+    Run all phases on the models in workdir/models and return the
+    result. The stand-in trees are created again for every run.
+    '''
+    for tree in ('toolchain', 'gem5', 'build'):
+        shutil.rmtree(os.path.join(workdir, tree), ignore_errors=True)
+    tcpath = toolchain(os.path.join(workdir, 'toolchain'))
+    gem5path = gem5(os.path.join(workdir, 'gem5'))
+    buildpath = os.path.join(workdir, 'build')
+    os.makedirs(buildpath)
+
+    phases = {}
+
+    def timed(phase, func):
+        start = timeit.default_timer()
+        func()
+        phases[phase] = timeit.default_timer() - start
+
+    # a dry run does not touch the toolchain, it is extended below
+    parser = Parser(tcpath, os.path.join(workdir, 'models'), jobs=jobs,
+                    fast=fast, dryrun=True, buildpath=buildpath,
+                    lowmem=lowmem)
+    timed('parse', parser.parse_models)
+
+    exts = parser.extensions
+    timed('instructions', exts.gen_instructions)
+    timed('check', exts.check_opcodes)
+
+    compiler = Compiler(exts, parser.regs, tcpath)
+    timed('compiler.header', compiler.extend_header)
+    timed('compiler.source', compiler.extend_source)
+    timed('compiler.stdlibs', compiler.extend_stdlibs)
+
+    decoder = Gem5(exts, parser.regs, buildpath=buildpath,
+                   gem5path=gem5path)
+    timed('gem5.decoder', decoder.gen_decoder)
+    timed('gem5.cxx', decoder.gen_cxx_files)
+
+    return {'phases': phases, 'peak': peak()}
+
+
+def measure(workdir, jobs, fast, lowmem):
+    '''
+    Run the pipeline in a new interpreter and return the result.
+    The result is passed in a file, the templates may write to stdout.
+    '''
+    cmd = [sys.executable, os.path.realpath(__file__),
+           '--run', workdir, '--jobs', str(jobs)]
+    if fast:
+        cmd.append('--fast')
+    if lowmem:
+        cmd.append('--low-memory')
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(cmd, stdout=devnull)
+    with open(os.path.join(workdir, 'result.json'), 'r') as fh:
+        return json.load(fh)
+
+
+def run(sizes, runs, jobs, fast, lowmem):
+    '''
+    Return the best result of all runs for every size.
+    '''
+    results = {}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            workdir = os.path.join(tmpdir, str(size))
+            corpus(os.path.join(workdir, 'models'), size)
+
+            best = None
+            for _ in range(runs):
+                result = measure(workdir, jobs, fast, lowmem)
+                if best is None:
+                    best = result
+                    continue
+                for phase, seconds in result['phases'].items():
+                    best['phases'][phase] = min(best['phases'][phase],
+                                                seconds)
+                best['peak'] = min(best['peak'], result['peak'])
+            results[str(size)] = best
+
+            shutil.rmtree(workdir)
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+def compare(results, baseline, threshold):
+    '''
+    Return the regressions of results against the baseline as
+    (size, phase, before, after) tuples. The phase of the peak memory
+    is 'peak'.
+    '''
+    regressions = []
+    for size in sorted(results, key=int):
+        before = baseline['results'].get(size)
+        if before is None:
+            continue
+        after = results[size]
+        for phase in PHASES:
+            if phase not in before['phases']:
+                continue
+            old = before['phases'][phase]
+            new = after['phases'][phase]
+            if new > old * (1 + threshold) and new - old > NOISE:
+                regressions.append((size, phase, old, new))
+        if after['peak'] > before['peak'] * (1 + threshold):
+            regressions.append((size, 'peak', before['peak'], after['peak']))
+    return regressions
+
+
+def report(results, regressions):
+    '''
+    Return a table with a column for every size.
+    Regressions are marked with an exclamation mark.
+    '''
+    sizes = sorted(results, key=int)
+    flagged = set((size, phase) for (size, phase, _, _) in regressions)
+
+    def row(name, cells):
+        return '{:<18}'.format(name) + ''.join(
+            '{:>14}'.format(cell) for cell in cells) + '\n'
+
+    table = row('models', sizes)
+    for phase in PHASES + ['total']:
+        cells = []
+        for size in sizes:
+            phases = results[size]['phases']
+            if phase == 'total':
+                seconds = sum(phases.values())
+            else:
+                seconds = phases[phase]
+            mark = '!' if (size, phase) in flagged else ' '
+            cells.append('{:.2f} ms{}'.format(seconds * 1000, mark))
+        table += row(phase, cells)
+    table += row('peak memory', [
+        '{:.1f} MiB{}'.format(results[size]['peak'] / 1024.,
+                              '!' if (size, 'peak') in flagged else ' ')
+        for size in sizes])
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the phases of the generation pipeline.')
+    parser.add_argument('-s',
+                        '--sizes',
+                        type=int,
+                        nargs='+',
+                        default=SIZES,
+                        help='Number of models of the generated corpora.')
+    parser.add_argument('-n',
+                        '--runs',
+                        type=int,
+                        default=3,
+                        help='Number of runs per size, the best is taken.')
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=1,
+                        help='Number of models parsed in parallel.')
+    parser.add_argument('-f',
+                        '--fast',
+                        action='store_true',
+                        help='Parse the models without libclang.')
+    parser.add_argument('-l',
+                        '--low-memory',
+                        action='store_true',
+                        help='Read the definitions from the model files, '
+                        'whenever they are needed.')
+    parser.add_argument('--save',
+                        metavar='FILE',
+                        help='Save the results as baseline.')
+    parser.add_argument('-b',
+                        '--baseline',
+                        metavar='FILE',
+                        help='Compare the results with a saved baseline.')
+    parser.add_argument('-t',
+                        '--threshold',
+                        type=float,
+                        default=0.2,
+                        help='Allowed slowdown against the baseline, '
+                        'e.g. 0.2 for 20%%.')
+    parser.add_argument('--run',
+                        metavar='WORKDIR',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # single run in this interpreter
+        result = pipeline(args.run, args.jobs, args.fast, args.low_memory)
+        with open(os.path.join(args.run, 'result.json'), 'w') as fh:
+            json.dump(result, fh)
+        return 0
+
+    for size in args.sizes:
+        if not 0 < size <= MAXSIZE:
+            parser.error('size {} not in 1..{}'.format(size, MAXSIZE))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as fh:
+            baseline = json.load(fh)
+        if baseline.get('version') != VERSION:
+            parser.error('baseline {} has an unknown layout'.format(
+                args.baseline))
+        if (baseline['fast'] != args.fast or
+                baseline['jobs'] != args.jobs or
+                baseline.get('lowmem', False) != args.low_memory):
+            sys.stderr.write('warning: baseline was taken with other '
+                             'options\n')
+
+    results = run(args.sizes, args.runs, args.jobs, args.fast,
+                  args.low_memory)
+
+    regressions = []
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+    sys.stdout.write(report(results, regressions))
+    for (size, phase, old, new) in regressions:
+        if phase == 'peak':
+            sys.stdout.write('Regression: {} models, peak memory {:.1f} -> '
+                             '{:.1f} MiB\n'.format(size, old / 1024.,
+                                                   new / 1024.))
+        else:
+            sys.stdout.write('Regression: {} models, {} {:.2f} -> '
+                             '{:.2f} ms\n'.format(size, phase, old * 1000,
+                                                  new * 1000))
+
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump({'version': VERSION,
+                       'python': platform.python_version(),
+                       'platform': '{} {}'.format(platform.system(),
+                                                   platform.machine()),
+                       'fast': args.fast,
+                       'jobs': args.jobs,
+                       'lowmem': args.low_memory,
+                       'runs': args.runs,
+                       'results': results},
+                      fh, indent=4, sort_keys=True, separators=(',', ': '))
+            fh.write('\n')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+'''
+Benchmark the template registry.
+
+Every run is a fresh interpreter, that loads all templates of the registry:
+    memory  templates are compiled in memory (no module directory)
+    cold    empty module directory, templates are compiled and stored
+    warm    module directory filled by a previous run
+'''
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+# executed in a fresh interpreter, prints the load time
+snippet = r'''
+import sys
+import timeit
+start = timeit.default_timer()
+sys.path.insert(0, {path!r})
+from modelparsing import templating
+templating.set_module_directory({modules!r})
+for name in templating.templates():
+    templating.get_template(name)
+sys.stdout.write(str(timeit.default_timer() - start))
+'''
+
+pythonpath = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+
+def load(modules):
+    '''
+    Load all templates in a new interpreter and return the time needed.
+    '''
+    out = subprocess.check_output(
+        [sys.executable, '-c', snippet.format(path=pythonpath,
+                                              modules=modules)])
+    return float(out)
+
+
+def run(runs):
+    '''
+    Return the load times of all runs for every mode.
+    '''
+    times = {'memory': [], 'cold': [], 'warm': []}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        modules = os.path.join(tmpdir, 'mako')
+        for _ in range(runs):
+            times['memory'].append(load(None))
+            shutil.rmtree(modules, ignore_errors=True)
+            times['cold'].append(load(modules))
+            times['warm'].append(load(modules))
+    finally:
+        shutil.rmtree(tmpdir)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark cold and warm starts of the template registry.')
+    parser.add_argument('-n',
+                        '--runs',
+                        type=int,
+                        default=10,
+                        help='Number of runs per mode.')
+    args = parser.parse_args()
+
+    times = run(args.runs)
+    memory = min(times['memory'])
+    for mode in ('memory', 'cold', 'warm'):
+        best = min(times[mode])
+        print('{:<8} best {:8.2f} ms  mean {:8.2f} ms  speedup {:5.2f}x'.format(
+            mode, best * 1000, sum(times[mode]) / len(times[mode]) * 1000,
+            memory / best))
+
+
+if __name__ == '__main__':
+    main()
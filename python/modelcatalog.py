@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import argparse
+import os
+import sys
+
+from modelparsing.catalog import Catalog
+from modelparsing.encoding import encode
+
+# default location of the catalog
+catalogpath = os.path.join(os.path.expanduser('~'),
+                           '.cache/riscv-custom-extension/catalog.db')
+
+
+class Encoding:
+    '''
+    Encoding fields of a queried instruction.
+    '''
+
+    def __init__(self, opc, funct3, funct7=None):
+        self.name = 'query'
+        self.opc = opc
+        self.funct3 = funct3
+        self.funct7 = funct7
+        self.form = 'I' if funct7 is None else 'R'
+
+
+def describe(model):
+    '''
+    Return a line describing a model of the catalog.
+    '''
+    funct7 = '' if model['funct7'] is None else ' funct7 {}'.format(
+        hex(model['funct7']))
+    return '{} ({}-Type, opc {} funct3 {}{}) in {}'.format(
+        model['name'], model['form'], hex(model['opc']),
+        hex(model['funct3']), funct7, model['file'])
+
+
+def main():
+    '''
+    Query the catalog of models, encodings and registers.
+    Exits with 1, if the query found conflicts or nothing.
+    '''
+    parser = argparse.ArgumentParser(
+        prog='modelcatalog',
+        description='Look up models, encodings and custom registers of ' +
+        'all extension repositories, that were recorded by ' +
+        'modelparser --catalog.')
+
+    parser.add_argument('-d',
+                        '--database',
+                        type=str,
+                        default=catalogpath,
+                        help='Catalog database.')
+    parser.add_argument('-n',
+                        '--name',
+                        type=str,
+                        help='Look up the models with this name.')
+    parser.add_argument('-e',
+                        '--encoding',
+                        type=lambda value: int(value, 0),
+                        nargs='+',
+                        metavar='FIELD',
+                        help='Look up the models overlapping with the ' +
+                        'encoding opc funct3 [funct7].')
+    parser.add_argument('-r',
+                        '--register',
+                        type=str,
+                        help='Look up a custom register by name or address.')
+    parser.add_argument('-c',
+                        '--conflicts',
+                        nargs='?',
+                        const='',
+                        metavar='REPOSITORY',
+                        help='List conflicting models of all ' +
+                        'repositories or only of one.')
+
+    args = parser.parse_args()
+    catalog = Catalog(args.database)
+
+    found = []
+    if args.name:
+        found = [describe(model) for model in catalog.lookup(args.name)]
+    elif args.encoding:
+        if len(args.encoding) not in (2, 3):
+            parser.error('the encoding is opc funct3 [funct7]')
+        (mask, match) = encode(Encoding(*args.encoding))
+        found = [describe(model) for model in catalog.encoding(mask, match)]
+    elif args.register:
+        try:
+            registers = catalog.registers(address=int(args.register, 0))
+        except ValueError:
+            registers = catalog.registers(name=args.register)
+        found = ['{} {} in {}'.format(name, hex(address), repository)
+                 for (repository, name, address) in registers]
+    elif args.conflicts is not None:
+        conflicts = catalog.conflicts(args.conflicts or None)
+        for (first, second) in conflicts:
+            sys.stdout.write('{}\n  conflicts with {}\n'.format(
+                describe(first), describe(second)))
+        return 1 if conflicts else 0
+    else:
+        found = catalog.repositories()
+
+    for line in found:
+        sys.stdout.write(line + '\n')
+    return 0 if found else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,8 +33,7 @@ import ConfigParser
 import logging
 import logging.handlers
 import os
-import shutil
-from modelparsing.parser import Parser
+import sys
 
 # get root logger
 root_logger = logging.getLogger()
@@ -63,6 +62,16 @@ root_logger.addHandler(console_handler)
 
 logger = logging.getLogger(__name__)
 
+# default location of the model cache
+cachepath = os.path.join(os.path.expanduser('~'),
+                         '.cache/riscv-custom-extension')
+# default build directory of the generated files
+buildpath = os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), '../build'))
+# gem5 isa description, that includes the generated decoder
+isapath = os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), '../src/isa'))
+
 
 class ModelParser():
     '''
@@ -78,22 +87,121 @@ class ModelParser():
 
         self.modelpath = os.path.expanduser(config.get("DEFAULT", "MODELPATH"))
         self.tcpath = os.path.expanduser(config.get("DEFAULT", "TOOLCHAIN"))
+        self.jobs = 1
+        if config.has_option("DEFAULT", "JOBS"):
+            self.jobs = config.getint("DEFAULT", "JOBS")
+        self.cachepath = cachepath
+        if config.has_option("DEFAULT", "CACHE"):
+            self.cachepath = os.path.expanduser(config.get("DEFAULT", "CACHE"))
+        self.remote = None
+        if config.has_option("DEFAULT", "REMOTE_CACHE"):
+            self.remote = config.get("DEFAULT", "REMOTE_CACHE")
+        self.buildpath = buildpath
+        if config.has_option("DEFAULT", "BUILD"):
+            self.buildpath = os.path.abspath(
+                os.path.expanduser(config.get("DEFAULT", "BUILD")))
+        # trace of the generation, see --profile
+        self.profile = None
+        if config.has_option("DEFAULT", "PROFILE"):
+            self.profile = os.path.expanduser(config.get("DEFAULT", "PROFILE"))
+        self.cprofile = False
+        if config.has_option("DEFAULT", "CPROFILE"):
+            self.cprofile = config.getboolean("DEFAULT", "CPROFILE")
+        self.lowmem = False
+        if config.has_option("DEFAULT", "LOW_MEMORY"):
+            self.lowmem = config.getboolean("DEFAULT", "LOW_MEMORY")
 
         assert(self.modelpath)
         assert(self.tcpath)
 
-    def parse(self):
-        modelparser = Parser(self.tcpath, self.modelpath)
+    def parse(self, force_gem5=False):
+        '''
+        Generate the extensions. With PROFILE in config.ini, the
+        generation is traced like with --profile.
+        '''
+        profiler = start_profiler(self.profile, self.cprofile)
+        try:
+            self.generate(force_gem5)
+        finally:
+            stop_profiler(profiler, self.profile)
+
+    def generate(self, force_gem5=False):
+        '''
+        Parse the models and extend the toolchain and gem5. If force_gem5
+        is set, the gem5 files are generated, even if they are up to date.
+        '''
+        from modelparsing import templating
+        from modelparsing.cache import ModelCache
+        from modelparsing.isacache import IsaCache
+        from modelparsing.parser import Parser
+        from modelparsing.store import open_store
 
-        buildpath = os.path.join(
-            os.path.dirname(os.path.realpath(__file__)), '../build')
+        cache = None
+        isacache = None
+        if self.cachepath:
+            remote = open_store(self.remote) if self.remote else None
+            cache = ModelCache(os.path.join(self.cachepath, 'models'),
+                               remote=remote)
+            isacache = IsaCache(os.path.join(self.cachepath, 'isa'),
+                                remote=remote)
+            templating.set_module_directory(
+                os.path.join(self.cachepath, 'mako'))
 
-        if not os.path.exists(buildpath):
-            os.makedirs(buildpath)
+        modelparser = Parser(self.tcpath, self.modelpath, self.jobs, cache,
+                             isacache=isacache, buildpath=self.buildpath,
+                             lowmem=self.lowmem)
+
+        if not os.path.exists(self.buildpath):
+            os.makedirs(self.buildpath)
 
         modelparser.parse_models()
-        modelparser.extend_compiler()
-        modelparser.extend_gem5()
+        modelparser.extend(force_gem5=force_gem5)
+        report(modelparser.timings)
+
+    def sources(self):
+        '''
+        Return all files, the generated files depend on.
+        These are the models, the headers they include, the record of the
+        assigned encodings, the isa description and the code and templates
+        of the generators.
+        '''
+        from modelparsing import templating
+        from modelparsing.cache import includes
+        from modelparsing.parser import encodings
+
+        if os.path.isdir(self.modelpath):
+            models = []
+            for dirpath, dirnames, filenames in os.walk(self.modelpath):
+                models.extend(os.path.join(dirpath, file)
+                              for file in filenames
+                              if file.endswith(('.cc', '.hh')))
+        else:
+            models = [self.modelpath]
+
+        files = set(models)
+        for model in models:
+            files.update(includes(model))
+        if os.path.isfile(encodings(self.modelpath)):
+            files.add(encodings(self.modelpath))
+
+        files.update(os.path.join(isapath, file)
+                     for file in os.listdir(isapath)
+                     if file.endswith('.isa'))
+        files.update(os.path.join(templating.templatepath, name)
+                     for name in templating.templates())
+        package = os.path.dirname(templating.__file__)
+        files.update(os.path.join(package, file)
+                     for file in os.listdir(package)
+                     if file.endswith('.py'))
+        return sorted(files)
+
+    def targets(self):
+        '''
+        Return the files, that are generated for the gem5 extension library.
+        '''
+        from modelparsing.gem5 import outputs
+
+        return outputs(self.buildpath)
 
 
 def main():
@@ -112,6 +220,53 @@ def main():
                         action='store_true',
                         help='If set, the toolchain and Gem5 will be ' +
                         'rebuild.')
+    parser.add_argument('-o',
+                        '--build-dir',
+                        type=str,
+                        default=buildpath,
+                        help='Directory, where the generated files are ' +
+                        'placed. Several build directories can be ' +
+                        'generated side by side.')
+    parser.add_argument('-c',
+                        '--cache',
+                        type=str,
+                        default=cachepath,
+                        help='Directory, where parsed models, compiled ' +
+                        'templates and decoder files are cached.')
+    parser.add_argument('--remote-cache',
+                        type=str,
+                        help='Url or directory of a cache, that is ' +
+                        'shared with other machines.')
+    parser.add_argument('--catalog',
+                        type=str,
+                        help='Database, where the models, encodings and ' +
+                        'registers are recorded.')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='If set, no cache is used.')
+    parser.add_argument('-n',
+                        '--dry-run',
+                        action='store_true',
+                        help='If set, the generated files are only ' +
+                        'compared with the files on disk. Exits with 1, ' +
+                        'if they differ and with 2, if the models are ' +
+                        'invalid.')
+    parser.add_argument('-f',
+                        '--fast',
+                        action='store_true',
+                        help='If set, models that follow the layout of ' +
+                        'the example models are parsed without libclang.')
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=1,
+                        help='Number of models that are parsed and ' +
+                        'files that are generated in parallel.')
+    parser.add_argument('--low-memory',
+                        action='store_true',
+                        help='If set, the definitions of the models are ' +
+                        'read from the model files, whenever they are ' +
+                        'needed, instead of being kept in memory.')
     parser.add_argument('-m',
                         '--modelpath',
                         type=str,
@@ -136,6 +291,25 @@ def main():
     parser.add_argument('--gem5-only',
                         action='store_true',
                         help='If set, only gem5 is extended')
+    parser.add_argument('--timings',
+                        action='store_true',
+                        help='If set, the duration of every phase is ' +
+                        'printed at the end.')
+    parser.add_argument('--profile',
+                        type=str,
+                        metavar='FILE',
+                        help='Write a chrome trace of the run to FILE ' +
+                        'and a summary of the spans next to it.')
+    parser.add_argument('--cprofile',
+                        action='store_true',
+                        help='If set, the phases are profiled with ' +
+                        'cProfile and the statistics of the longest phase ' +
+                        'are written next to the trace.')
+    parser.add_argument('-w',
+                        '--watch',
+                        action='store_true',
+                        help='If set, the models are watched and the ' +
+                        'extensions are updated on every change.')
     parser.add_argument('-v',
                         '--verbose',
                         default=0,
@@ -144,37 +318,175 @@ def main():
 
     args = parser.parse_args()
     set_log_level_from_verbose(args)
+    if args.cprofile and not args.profile:
+        parser.error('--cprofile requires --profile')
+    if args.low_memory and args.watch:
+        # the released models are compared with the changed files
+        parser.error('--low-memory can not be combined with --watch')
+
+    profiler = start_profiler(args.profile, args.cprofile)
+    try:
+        run(args)
+    finally:
+        stop_profiler(profiler, args.profile)
+
+
+def run(args):
+    '''
+    Parse the models and extend the toolchain and gem5 as requested
+    by args.
+    '''
+
+    from modelparsing import templating
+    from modelparsing.cache import ModelCache
+    from modelparsing.isacache import IsaCache
+    from modelparsing.parser import Parser
+    from modelparsing.store import open_store
 
     logger.info('Start parsing models')
-    modelparser = Parser(args.toolchain, args.modelpath)
+    cache = None
+    isacache = None
+    if not args.no_cache:
+        remote = None
+        if args.remote_cache:
+            remote = open_store(args.remote_cache)
+        cache = ModelCache(os.path.join(args.cache, 'models'), remote=remote)
+        isacache = IsaCache(os.path.join(args.cache, 'isa'), remote=remote)
+        templating.set_module_directory(os.path.join(args.cache, 'mako'))
 
-    buildpath = os.path.join(
-        os.path.dirname(os.path.realpath(__file__)), '../build')
+    catalog = None
+    if args.catalog:
+        from modelparsing.catalog import Catalog
+        catalog = Catalog(args.catalog)
 
-    if args.restore:
-        if os.path.exists(buildpath):
-            try:
-                logger.info('Remove build directory')
-                shutil.rmtree(buildpath)
-            except OSError as e:
-                logger.error("Error: %s - %s" % (e.filename, e.strerror))
-        modelparser.restore()
+    modelparser = Parser(args.toolchain, args.modelpath,
+                         args.jobs, cache, args.fast, isacache,
+                         dryrun=args.dry_run,
+                         buildpath=os.path.abspath(args.build_dir),
+                         catalog=catalog, lowmem=args.low_memory)
+
+    if args.dry_run:
+        sys.exit(dry_run(modelparser))
+    elif args.restore:
+        try:
+            modelparser.restore(clean=True)
+        except OSError as e:
+            logger.error("Error: %s - %s" % (e.filename, e.strerror))
     else:
-        if not os.path.exists(buildpath):
-            os.makedirs(buildpath)
+        if not os.path.exists(modelparser.buildpath):
+            os.makedirs(modelparser.buildpath)
 
         modelparser.parse_models()
 
-        if not args.gem5_only:
-            # extend compiler with models
-            modelparser.extend_compiler()
-        if not args.tc_only:
-            # extend gem5
-            modelparser.extend_gem5()
+        # extend compiler and gem5 with models
+        modelparser.extend(compiler=not args.gem5_only,
+                           gem5=not args.tc_only)
+        report(modelparser.timings, args.timings)
+
+        if args.watch:
+            watch(modelparser, not args.gem5_only, not args.tc_only,
+                  args.timings)
 
     # modelparser.remove_models()
 
 
+def start_profiler(profile, cprofile=False):
+    '''
+    Start recording the spans of the run, if a profile is requested.
+    '''
+    if not profile:
+        return None
+    from modelparsing import profiling
+
+    profiler = profiling.Profiler(cprofile)
+    profiling.enable(profiler)
+    return profiler
+
+
+def stop_profiler(profiler, profile):
+    '''
+    Stop recording and write the trace and the summary.
+    '''
+    if profiler is None:
+        return
+    from modelparsing import profiling
+
+    profiling.disable()
+    profiler.save(profile)
+
+
+def report(timings, show=False):
+    '''
+    Report the duration of the parsing and generation phases.
+    '''
+    from modelparsing.scheduler import summary
+
+    table = summary(timings)
+    if show:
+        sys.stdout.write(table)
+    else:
+        logger.info('Phase timings:\n' + table)
+
+
+def dry_run(modelparser):
+    '''
+    Parse the models and compare the generated files with the files on
+    disk, without writing anything. Returns the exit status.
+    '''
+    from modelparsing import preview
+    from modelparsing import profiling
+
+    try:
+        modelparser.parse_models()
+        with profiling.span('preview', 'phase'):
+            files = preview.artifacts(modelparser.extensions,
+                                      modelparser.regs,
+                                      modelparser.tcpath,
+                                      modelparser.buildpath,
+                                      modelparser.allocator)
+    except Exception as e:
+        logger.error('Invalid models: {}'.format(e))
+        return 2
+
+    (diff, changed) = preview.compare(files)
+    sys.stdout.write(diff)
+    if changed:
+        logger.info('Changed files: {}'.format(', '.join(changed)))
+        return 1
+    return 0
+
+
+def watch(modelparser, compiler=True, gem5=True, timings=False):
+    '''
+    Update the extensions, whenever models or registers change.
+    The parser state, libclang and the compiled templates are kept in
+    memory, so only the changed models are parsed again.
+    '''
+    from modelparsing.watcher import Watcher
+
+    watcher = Watcher(modelparser.modelpath)
+    logger.info('Watch {} for changes'.format(modelparser.modelpath))
+    failed = False
+    try:
+        while True:
+            (changed, removed) = watcher.wait()
+            logger.info('Changed: {}, removed: {}'.format(
+                ', '.join(changed), ', '.join(removed)))
+            del modelparser.timings[:]
+            try:
+                modelparser.update(changed, removed, compiler, gem5,
+                                   full=failed)
+                failed = False
+            except Exception as e:
+                # keep watching, the next change may fix the model
+                logger.error('Update failed: {}'.format(e))
+                failed = True
+                continue
+            report(modelparser.timings, timings)
+    except KeyboardInterrupt:
+        logger.info('Stop watching')
+
+
 def set_log_level_from_verbose(args):
     if not args.verbose:
         console_handler.setLevel('ERROR')
@@ -26,9 +26,7 @@
 #
 # Authors: Robert Scheffel
 
-import clang.cindex
 import logging
-import platform
 
 # Set default logging handler to avoid "No handler found" warnings.
 try:  # Python 2.7+
@@ -39,20 +37,3 @@ except ImportError:
             pass
 
 logger = logging.getLogger(__name__).addHandler(logging.NullHandler())
-
-if platform.system() == 'Linux':
-    (name, version, code) = platform.linux_distribution()
-else:
-    (name, version, code) = ('n/a', 'n/a', 'n/a')
-
-if name == 'Ubuntu':
-    if version == '16.04':
-        clang.cindex.Config.set_library_file(
-            '/usr/lib/llvm-3.8/lib/libclang-3.8.so')
-    else:
-        clang.cindex.Config.set_library_file(
-            '/usr/lib/llvm-4.0/lib/libclang-4.0.so')
-elif name == 'CentOS Linux':
-    clang.cindex.Config.set_library_file('/usr/lib64/llvm/libclang.so')
-else:
-    raise ValueError(name, 'Linux Version not supported.')
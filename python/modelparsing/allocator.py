@@ -0,0 +1,218 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import json
+import logging
+import os
+
+from exceptions import OpcodeError
+from fileutils import write_if_changed
+
+logger = logging.getLogger(__name__)
+
+# custom-0..3 major opcodes
+OPCODES = [0x02, 0x0a, 0x16, 0x1e]
+# all funct7 values of a funct3 slot are used
+FULL = (1 << 128) - 1
+
+
+def encoded(model):
+    '''
+    Check if all encoding fields of a model are set.
+    '''
+    return (model.opc is not None and model.funct3 is not None and
+            (model.form != 'R' or model.funct7 is not None))
+
+
+class Allocator(object):
+    '''
+    Assigns free encodings to models, that leave opc, funct3 or funct7 unset.
+    The custom encoding space is kept as bitmap of funct7 values for every
+    opcode and funct3 pair. An I-Type instruction occupies the whole funct3
+    slot. Instructions are packed into as few opcodes and funct3 slots as
+    possible, so the decoder tree stays small.
+    Assignments are recorded in a file and reused in later runs. The record
+    is kept next to the models and meant to be checked in with them, so
+    all build directories and machines use the same encodings. Models, that
+    no longer exist, are dropped from the record.
+    A readonly allocator reads the record, but never writes it.
+    '''
+
+    def __init__(self, record=None, readonly=False):
+        self._bitmap = {}
+        self._record = record
+        self._readonly = readonly
+        self._assigned = {}
+
+        if record and os.path.isfile(record):
+            logger.info('Read recorded encodings from {}'.format(record))
+            with open(record, 'r') as fh:
+                self._assigned = json.load(fh)
+
+    def allocate(self, models):
+        '''
+        Assign encodings to all models without a complete encoding.
+        '''
+        for model in models:
+            if encoded(model):
+                self.reserve(model.form, model.opc, model.funct3, model.funct7)
+
+        pending = sorted([model for model in models if not encoded(model)],
+                         key=lambda model: model.name)
+
+        # removed models give up their recorded encodings
+        names = set(model.name for model in models)
+        for name in sorted(self._assigned):
+            if name not in names:
+                logger.info('Drop recorded encoding of {}'.format(name))
+                del self._assigned[name]
+
+        # recorded encodings are reused, as long as they are still free
+        for model in list(pending):
+            fields = self._assigned.get(model.name)
+            if fields is None or fields['form'] != model.form:
+                continue
+            slot = (fields['opc'], fields['funct3'], fields['funct7'])
+            if self.fits(model, *slot) and self.free(model.form, *slot):
+                self.assign(model, *slot)
+                pending.remove(model)
+            else:
+                logger.warn('Recorded encoding of {} is not available'.format(
+                    model.name))
+
+        for model in pending:
+            slot = self.find(model)
+            if slot is None:
+                logger.error('No free encoding for {}'.format(model.name))
+                raise OpcodeError('Function opcode could not be generated')
+            self.assign(model, *slot)
+
+        self.save()
+
+    def assign(self, model, opc, funct3, funct7):
+        '''
+        Set the encoding of a model and mark it as used.
+        '''
+        logger.info('Assign opc {} funct3 {} funct7 {} to {}'.format(
+            hex(opc), hex(funct3), funct7 if funct7 is None else hex(funct7),
+            model.name))
+        model.set_encoding(opc, funct3, funct7)
+        self.reserve(model.form, opc, funct3, funct7)
+        self._assigned[model.name] = {'form': model.form,
+                                      'opc': opc,
+                                      'funct3': funct3,
+                                      'funct7': funct7}
+
+    def reserve(self, form, opc, funct3, funct7):
+        '''
+        Mark an encoding as used.
+        '''
+        bitmap = self._bitmap.get((opc, funct3), 0)
+        if form == 'R':
+            bitmap |= 1 << funct7
+        else:
+            bitmap = FULL
+        self._bitmap[(opc, funct3)] = bitmap
+
+    def free(self, form, opc, funct3, funct7):
+        '''
+        Check if an encoding is unused.
+        '''
+        bitmap = self._bitmap.get((opc, funct3), 0)
+        if form == 'R':
+            return not bitmap & (1 << funct7)
+        return bitmap == 0
+
+    def fits(self, model, opc, funct3, funct7):
+        '''
+        Check if an encoding agrees with the fields, that a model sets.
+        '''
+        return ((model.opc is None or model.opc == opc) and
+                (model.funct3 is None or model.funct3 == funct3) and
+                (model.form != 'R' or model.funct7 is None or
+                 model.funct7 == funct7))
+
+    def find(self, model):
+        '''
+        Return a free encoding for a model or None.
+        '''
+        opcs = OPCODES if model.opc is None else [model.opc]
+        funct3s = range(8) if model.funct3 is None else [model.funct3]
+        slots = [(opc, funct3) for opc in opcs for funct3 in funct3s]
+
+        if model.form == 'R':
+            funct7s = range(128) if model.funct7 is None else [model.funct7]
+            # fill funct3 slots, that already decode R-Type instructions
+            for opc, funct3 in slots:
+                bitmap = self._bitmap.get((opc, funct3), 0)
+                if bitmap == 0 or bitmap == FULL:
+                    continue
+                for funct7 in funct7s:
+                    if not bitmap & (1 << funct7):
+                        return opc, funct3, funct7
+            funct7 = funct7s[0]
+        else:
+            funct7 = None
+
+        # open a new funct3 slot, prefer opcodes that are already decoded
+        used = set(opc for opc, funct3 in self._bitmap)
+        slots.sort(key=lambda slot: slot[0] not in used)
+        for opc, funct3 in slots:
+            if self._bitmap.get((opc, funct3), 0) == 0:
+                return opc, funct3, funct7
+        return None
+
+    def save(self):
+        '''
+        Record all assigned encodings.
+        '''
+        if not self._record or self._readonly:
+            return
+        if not self._assigned and not os.path.isfile(self._record):
+            return
+        logger.info('Record encodings in {}'.format(self._record))
+        write_if_changed(self._record, self.dump())
+
+    def dump(self):
+        '''
+        Return the content of the record.
+        '''
+        return json.dumps(self._assigned, indent=4, sort_keys=True,
+                          separators=(',', ': ')) + '\n'
+
+    @property
+    def assigned(self):
+        return self._assigned
+
+    @property
+    def readonly(self):
+        return self._readonly
+
+    @property
+    def record(self):
+        return self._record
@@ -0,0 +1,260 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import hashlib
+import json
+import logging
+import os
+import re
+
+from exceptions import ConsistencyError
+from libclang import library_version
+from model import CLANGFLAGS
+from model import Model
+
+logger = logging.getLogger(__name__)
+
+# cached entries are dropped, if the cache grows beyond this size (bytes)
+MAXSIZE = 4 * 1024 * 1024
+# bump, if the layout of the cached entries changes
+VERSION = 5
+# code, that extracts the cached information, entries are invalid, if it
+# changes
+EXTRACTORS = ('libclang.py', 'model.py', 'scanner.py')
+
+# hash over the extractors and the libclang, that is used
+_extractor = None
+
+
+def extractor():
+    '''
+    Return a hash over the code, that extracts the models, and the
+    version of libclang. It is only calculated once.
+    '''
+    global _extractor
+    if _extractor is None:
+        sha = hashlib.sha1()
+        path = os.path.dirname(os.path.realpath(__file__))
+        for name in EXTRACTORS:
+            with open(os.path.join(path, name), 'rb') as fh:
+                sha.update(fh.read())
+        sha.update(library_version())
+        _extractor = sha.hexdigest()
+    return _extractor
+
+
+def includes(file, seen=None, missing=False):
+    '''
+    Return all local headers, that are included by file.
+    Only headers that are included with quotes are followed, system headers
+    do not change between runs. If missing is set, headers, that do not
+    exist, e.g. because they were removed, are returned as well.
+    '''
+    if seen is None:
+        seen = set()
+
+    prog = re.compile(r'^\s*#\s*include\s+"([^"]+)"')
+
+    with open(file, 'r') as fh:
+        content = fh.readlines()
+
+    for line in content:
+        match = prog.match(line)
+        if match:
+            header = os.path.normpath(os.path.join(
+                os.path.dirname(file), match.group(1)))
+            if header in seen:
+                continue
+            if os.path.isfile(header):
+                seen.add(header)
+                includes(header, seen, missing)
+            elif missing:
+                seen.add(header)
+
+    return sorted(seen)
+
+
+class ModelCache:
+    '''
+    Persistent cache for the information extracted from models.
+    An entry is keyed by a hash over the model file, all headers the model
+    includes, the flags, that are used to parse it, the code, that extracts
+    the models, and the version of libclang.
+    Entries, that are missing locally, are looked up in the remote store.
+    '''
+
+    def __init__(self, path, maxsize=MAXSIZE, remote=None):
+        self._path = path
+        self._maxsize = maxsize
+        self._remote = remote
+
+        if not os.path.exists(self._path):
+            os.makedirs(self._path)
+
+    def key(self, impl):
+        '''
+        Calculate the key for the model file impl.
+        '''
+        sha = hashlib.sha1()
+        sha.update('{} {} {}'.format(VERSION, extractor(),
+                                     ' '.join(CLANGFLAGS)))
+
+        for file in [impl] + includes(impl):
+            with open(file, 'rb') as fh:
+                sha.update(fh.read())
+
+        return sha.hexdigest()
+
+    def get(self, impl):
+        '''
+        Return the cached models of impl or None, if there is no entry.
+        '''
+        key = self.key(impl)
+        entry = os.path.join(self._path, key + '.json')
+        try:
+            with open(entry, 'r') as fh:
+                fields = json.load(fh)
+        except (IOError, ValueError):
+            fields = self.fetch(key)
+            if fields is None:
+                logger.debug('Cache miss for {}'.format(impl))
+                return None
+            models = self.load(key, fields)
+            if models is None:
+                return None
+            logger.info('Remote cache hit for {}'.format(impl))
+            self.store(key, fields)
+            return models
+
+        models = self.load(key, fields)
+        if models is None:
+            return None
+
+        logger.info('Cache hit for {}'.format(impl))
+        # mark the entry as recently used
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+
+        return models
+
+    def load(self, key, fields):
+        '''
+        Return the models of entry key or None, if the layout
+        of the entry is invalid.
+        '''
+        try:
+            return [Model.from_dict(model) for model in fields['models']]
+        except (ConsistencyError, KeyError, TypeError, ValueError):
+            logger.warn('Invalid cache entry {}'.format(key))
+            return None
+
+    def put(self, impl, models):
+        '''
+        Store the information of the models, that were parsed from impl.
+        '''
+        key = self.key(impl)
+        fields = {'models': []}
+        for model in models:
+            entry = model.to_dict()
+            # the position of the definition, so it can be released
+            entry['span'] = model.span
+            fields['models'].append(entry)
+        self.store(key, fields)
+        if self._remote is not None:
+            self._remote.put('models/' + key, json.dumps(fields))
+
+    def fetch(self, key):
+        '''
+        Return the fields of entry key from the remote store or None.
+        '''
+        if self._remote is None:
+            return None
+        data = self._remote.get('models/' + key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            logger.warn('Invalid remote cache entry {}'.format(key))
+            return None
+
+    def store(self, key, fields):
+        '''
+        Store the fields of the models of a file as entry key.
+        '''
+        entry = os.path.join(self._path, key + '.json')
+
+        # write to a temporary file first, so that
+        # concurrent readers never see partial entries
+        tmp = '{}.{}.tmp'.format(entry, os.getpid())
+        with open(tmp, 'w') as fh:
+            json.dump(fields, fh)
+        os.rename(tmp, entry)
+
+        self.evict()
+
+    def evict(self):
+        '''
+        Remove the least recently used entries, until the size
+        of the cache is below the limit.
+        '''
+        entries = []
+        size = 0
+        for file in os.listdir(self._path):
+            if not file.endswith('.json'):
+                continue
+            try:
+                st = os.stat(os.path.join(self._path, file))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, file))
+            size += st.st_size
+
+        entries.sort()
+        while size > self._maxsize and entries:
+            (_, fsize, file) = entries.pop(0)
+            logger.debug('Evict cache entry {}'.format(file))
+            try:
+                os.remove(os.path.join(self._path, file))
+            except OSError:
+                pass
+            size -= fsize
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def remote(self):
+        return self._remote
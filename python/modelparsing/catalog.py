@@ -0,0 +1,280 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import hashlib
+import logging
+import os
+import sqlite3
+
+from cache import includes
+from encoding import encode
+
+logger = logging.getLogger(__name__)
+
+# bump, if the schema changes
+VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS repositories (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    repo INTEGER NOT NULL REFERENCES repositories(id) ON DELETE CASCADE,
+    file TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    form TEXT NOT NULL,
+    opc INTEGER NOT NULL,
+    funct3 INTEGER NOT NULL,
+    funct7 INTEGER,
+    mask INTEGER NOT NULL,
+    match INTEGER NOT NULL,
+    cycles INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS models_repo ON models (repo, file);
+CREATE INDEX IF NOT EXISTS models_name ON models (name);
+CREATE INDEX IF NOT EXISTS models_slot ON models (opc, funct3);
+CREATE TABLE IF NOT EXISTS registers (
+    repo INTEGER NOT NULL REFERENCES repositories(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    address INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS registers_repo ON registers (repo);
+CREATE INDEX IF NOT EXISTS registers_name ON registers (name);
+CREATE INDEX IF NOT EXISTS registers_address ON registers (address);
+'''
+
+# columns of a model in query results
+COLUMNS = ('repository', 'file', 'name', 'form', 'opc', 'funct3', 'funct7',
+           'mask', 'match', 'cycles')
+
+
+def columns(model, repo):
+    '''
+    Return the columns of a model for a query, in the order of COLUMNS.
+    '''
+    return ', '.join(['{}.path'.format(repo)] +
+                     ['{}.{}'.format(model, column)
+                      for column in COLUMNS[1:]])
+
+
+def source_hash(file, models=()):
+    '''
+    Return a hash over a model file, all headers it includes and the
+    encodings assigned to its models.
+    '''
+    sha = hashlib.sha1()
+    for source in [file] + includes(file):
+        with open(source, 'rb') as fh:
+            sha.update(fh.read())
+    # the allocator may change encodings of an unchanged file
+    for model in models:
+        sha.update(repr((model.name, model.form, model.opc, model.funct3,
+                         model.funct7, model.cycles)))
+    return sha.hexdigest()
+
+
+class Catalog:
+    '''
+    Index of the models, encodings and registers of many extension
+    repositories. It answers lookups and conflict queries without parsing
+    the repositories again. Repositories are updated incrementally, only
+    models of changed files are written.
+    '''
+
+    def __init__(self, path):
+        self._path = path
+        if path != ':memory:' and not os.path.isdir(
+                os.path.dirname(os.path.abspath(path))):
+            os.makedirs(os.path.dirname(os.path.abspath(path)))
+
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA foreign_keys = ON')
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, VERSION):
+            logger.info('Catalog schema changed, recreate {}'.format(path))
+            with self._db:
+                self._db.executescript('DROP TABLE IF EXISTS registers;'
+                                       'DROP TABLE IF EXISTS models;'
+                                       'DROP TABLE IF EXISTS repositories;')
+        with self._db:
+            self._db.executescript(SCHEMA)
+            self._db.execute('PRAGMA user_version = {}'.format(VERSION))
+
+    def close(self):
+        self._db.close()
+
+    def repository(self, path):
+        '''
+        Return the id of the repository path, it is added if needed.
+        '''
+        path = os.path.abspath(path)
+        row = self._db.execute('SELECT id FROM repositories WHERE path = ?',
+                               (path,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self._db.execute('INSERT INTO repositories (path) VALUES (?)',
+                                (path,)).lastrowid
+
+    def update(self, path, models, regmap):
+        '''
+        Update the entries of the repository path.
+        models is a list of (file, model) pairs, regmap the map of the
+        custom registers. Models of files, whose hash and encodings did
+        not change, are kept. Returns the number of files, that were written.
+        '''
+        with self._db:
+            repo = self.repository(path)
+            known = dict(self._db.execute(
+                'SELECT file, hash FROM models WHERE repo = ?', (repo,)))
+
+            files = {}
+            for (file, model) in models:
+                files.setdefault(os.path.abspath(file), []).append(model)
+
+            written = 0
+            for file in sorted(files):
+                digest = source_hash(file, files[file])
+                if known.get(file) == digest:
+                    continue
+                self._db.execute(
+                    'DELETE FROM models WHERE repo = ? AND file = ?',
+                    (repo, file))
+                for model in files[file]:
+                    (mask, match) = encode(model)
+                    self._db.execute(
+                        'INSERT INTO models (repo, file, hash, name, form, ' +
+                        'opc, funct3, funct7, mask, match, cycles) ' +
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (repo, file, digest, model.name, model.form,
+                         model.opc, model.funct3,
+                         model.funct7 if model.form == 'R' else None,
+                         mask, match, model.cycles))
+                written += 1
+
+            # files, that were removed from the repository
+            for file in set(known).difference(files):
+                self._db.execute(
+                    'DELETE FROM models WHERE repo = ? AND file = ?',
+                    (repo, file))
+
+            self._db.execute('DELETE FROM registers WHERE repo = ?', (repo,))
+            self._db.executemany(
+                'INSERT INTO registers (repo, name, address) VALUES (?, ?, ?)',
+                [(repo, name, address)
+                 for (name, address) in sorted(regmap.items())])
+
+        logger.info('Catalog: {} of {} files of {} changed'.format(
+            written, len(files), path))
+        return written
+
+    def remove(self, path):
+        '''
+        Remove the repository path and all its entries.
+        '''
+        with self._db:
+            self._db.execute('DELETE FROM repositories WHERE path = ?',
+                             (os.path.abspath(path),))
+
+    def query(self, where='', args=()):
+        '''
+        Return the models matching the where clause as dictionaries.
+        '''
+        sql = ('SELECT ' + columns('m', 'r') + ' FROM models m ' +
+               'JOIN repositories r ON r.id = m.repo ' + where +
+               ' ORDER BY m.name, r.path, m.file')
+        return [dict(zip(COLUMNS, row))
+                for row in self._db.execute(sql, args)]
+
+    def lookup(self, name):
+        '''
+        Return all models called name.
+        '''
+        return self.query('WHERE m.name = ?', (name,))
+
+    def encoding(self, mask, match):
+        '''
+        Return all models, whose encoding overlaps with mask and match.
+        Two encodings overlap, if an instruction word matches both.
+        '''
+        # all custom encodings share the opcode and funct3 fields,
+        # the slot index narrows the candidates down
+        opc = (match >> 2) & 0x1f
+        funct3 = (match >> 12) & 0x7
+        return [model for model in self.query(
+                'WHERE m.opc = ? AND m.funct3 = ?', (opc, funct3))
+                if (model['match'] ^ match) & model['mask'] & mask == 0]
+
+    def conflicts(self, path=None):
+        '''
+        Return pairs of models with the same name or overlapping encodings.
+        If path is given, only conflicts with models of this repository
+        are returned.
+        '''
+        sql = ('SELECT ' + columns('a', 'ra') + ', ' + columns('b', 'rb') +
+               ' FROM models a JOIN models b ' +
+               'ON a.id < b.id AND (a.name = b.name OR ' +
+               '(a.opc = b.opc AND a.funct3 = b.funct3 AND ' +
+               '(a.funct7 IS NULL OR b.funct7 IS NULL OR ' +
+               'a.funct7 = b.funct7))) ' +
+               'JOIN repositories ra ON ra.id = a.repo ' +
+               'JOIN repositories rb ON rb.id = b.repo')
+        args = ()
+        if path is not None:
+            sql += ' WHERE ra.path = ?1 OR rb.path = ?1'
+            args = (os.path.abspath(path),)
+
+        size = len(COLUMNS)
+        return sorted((dict(zip(COLUMNS, row[:size])),
+                       dict(zip(COLUMNS, row[size:])))
+                      for row in self._db.execute(sql, args))
+
+    def registers(self, name=None, address=None):
+        '''
+        Return the registers with name or address as
+        (repository, name, address) tuples.
+        '''
+        sql = ('SELECT r.path, g.name, g.address FROM registers g ' +
+               'JOIN repositories r ON r.id = g.repo')
+        if name is not None:
+            rows = self._db.execute(sql + ' WHERE g.name = ?', (name,))
+        elif address is not None:
+            rows = self._db.execute(sql + ' WHERE g.address = ?', (address,))
+        else:
+            rows = self._db.execute(sql)
+        return sorted(rows.fetchall())
+
+    def repositories(self):
+        return [row[0] for row in self._db.execute(
+            'SELECT path FROM repositories ORDER BY path')]
+
+    @property
+    def path(self):
+        return self._path
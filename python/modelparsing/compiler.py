@@ -30,10 +30,113 @@ import logging
 import os
 import re
 
-from mako.template import Template
+from fileutils import write_if_changed
+from scheduler import Scheduler
+from templating import render
+from templating import render_file
 
 logger = logging.getLogger(__name__)
 
+# end of the opcode table in riscv-opc.c
+TERMINATOR = '/* Terminate the list.  */\n'
+
+# files of the toolchain, relative to its checkout
+OPCH = 'riscv-binutils-gdb/include/opcode/riscv-opc.h'
+OPCH_CUST = 'riscv-binutils-gdb/include/opcode/riscv-custom-opc.h'
+OPCC = 'riscv-binutils-gdb/opcodes/riscv-opc.c'
+
+
+def opcode_entry(inst):
+    '''
+    Return the entry of an instruction in the opcode table of riscv-opc.c.
+    '''
+    return '{{"{}",  "I",  "{}", {}, {}, match_opcode, 0 }},\n'.format(
+        inst.name, inst.operands, inst.matchname, inst.maskname)
+
+
+def opcode_block(insts, content):
+    '''
+    Return the sorted entries of all instructions, that are not yet part
+    of content.
+    '''
+    known = set(content)
+    block = set()
+    for inst in insts:
+        entry = opcode_entry(inst)
+        if entry in known:
+            logger.warn('Instruction {} already taken, skip'.format(
+                inst.name))
+            continue
+        block.add(entry)
+    return sorted(block)
+
+
+def original_source(opcc):
+    '''
+    Return the lines of riscv-opc.c without custom instructions.
+    '''
+    opccold = opcc + '_old'
+    with open(opccold if os.path.exists(opccold) else opcc, 'r') as fh:
+        return fh.readlines()
+
+
+def intrinsics(regmap, insts):
+    '''
+    Return the content of riscvintr.h.
+    '''
+    return render('riscvintr.h.mako', regmap=regmap, insts=insts)
+
+
+def find_stdlibs(tcpath):
+    '''
+    Return the include directory of the installed toolchain or None,
+    if it can not be found.
+    '''
+    # we need to find the location of the installed toolchain
+    # this is simply done by parsing the makefile in the
+    # riscv-gnu-toolchain project, which is available via args
+    mfile = os.path.join(tcpath, 'Makefile')
+    if not os.path.exists(mfile):
+        return None
+
+    with open(mfile, 'r') as fh:
+        content = fh.readlines()
+
+    prog = re.compile(r"^INSTALL_DIR\s:=\s([\w\W]+/)([\w_-]+)")
+
+    # find the install path of the toolchain
+    # only works if toolchain was built with this project
+    # and the toolchain to be altered is the last one,
+    # that was configured
+    for line in content:
+        match = prog.match(line)
+        if match:
+            break
+    else:
+        return None
+    instpath = os.path.join(match.group(1), match.group(2))
+
+    stdlibs = os.path.join(*[instpath,
+                             'lib/gcc/',
+                             'riscv32-unknown-elf',
+                             '7.2.0/include'])
+    if not os.path.exists(stdlibs):
+        return None
+    return stdlibs
+
+
+def splice(content, block):
+    '''
+    Insert the block of entries at the end of the opcode table.
+    '''
+    # the block is added right before the termination of the list
+    try:
+        line = content.index(TERMINATOR) - 1
+    except ValueError:
+        # choose random line number near the end of the file
+        line = len(content) - 4
+    return content[:line] + block + content[line:]
+
 
 class Compiler:
     '''
@@ -46,49 +149,18 @@ class Compiler:
         self._regs = regs
 
         # header file that needs to be edited
-        self.opch = os.path.abspath(
-            os.path.join(
-                tcpath,
-                'riscv-binutils-gdb/include/opcode/riscv-opc.h'))
+        self.opch = os.path.abspath(os.path.join(tcpath, OPCH))
         # custom opc.h file
-        self.opch_cust = os.path.abspath(
-            os.path.join(
-                tcpath,
-                'riscv-binutils-gdb/include/opcode/riscv-custom-opc.h'))
+        self.opch_cust = os.path.abspath(os.path.join(tcpath, OPCH_CUST))
         # c source file that needs to be edited
-        self.opcc = os.path.abspath(
-            os.path.join(
-                tcpath,
-                'riscv-binutils-gdb/opcodes/riscv-opc.c'))
-
-        mfile = os.path.join(tcpath, 'Makefile')
-        assert(os.path.exists(mfile))
-
-        with open(mfile, 'r') as fh:
-            content = fh.readlines()
-
-        prog = re.compile(r"^INSTALL_DIR\s:=\s([\w\W]+/)([\w_-]+)")
-
-        # find the install path of the toolchain
-        # only works if toolchain was built with this project
-        # and the toolchain to be altered is the last one,
-        # that was configured
-        for line in content:
-            match = prog.match(line)
-            if match:
-                break
-        instpath = os.path.join(match.group(1), match.group(2))
-        assert(os.path.exists(instpath))
+        self.opcc = os.path.abspath(os.path.join(tcpath, OPCC))
 
-        self.stdlibs = os.path.join(*[instpath,
-                                      'lib/gcc/',
-                                      'riscv32-unknown-elf',
-                                      '7.2.0/include'])
+        self._tcpath = tcpath
+        self._stdlibs = None
 
         assert os.path.exists(self.opch)
         assert os.path.exists(os.path.dirname(self.opch_cust))
         assert os.path.exists(self.opcc)
-        assert(os.path.exists(self.stdlibs))
 
     def restore(self):
         '''
@@ -113,8 +185,7 @@ class Compiler:
             with open(opchold, 'r') as fh:
                 content = fh.read()
 
-            with open(self.opch, 'w') as fh:
-                fh.write(content)
+            write_if_changed(self.opch, content)
 
             logger.info('Original header restored')
 
@@ -144,8 +215,7 @@ class Compiler:
             with open(opccold, 'r') as fh:
                 content = fh.read()
 
-            with open(self.opcc, 'w') as fh:
-                fh.write(content)
+            write_if_changed(self.opcc, content)
 
             logger.info('Original source restored')
 
@@ -179,9 +249,18 @@ class Compiler:
         '''
 
         logger.info('Extending the toolchain')
-        self.extend_header()
-        self.extend_source()
-        self.extend_stdlibs()
+        scheduler = Scheduler()
+        self.schedule(scheduler)
+        scheduler.run()
+
+    def schedule(self, scheduler):
+        '''
+        Add the steps, that extend the toolchain, to the scheduler.
+        They all work on different files.
+        '''
+        scheduler.add('compiler.header', self.extend_header)
+        scheduler.add('compiler.source', self.extend_source)
+        scheduler.add('compiler.stdlibs', self.extend_stdlibs)
 
     def extend_header(self):
         '''
@@ -199,22 +278,19 @@ class Compiler:
         opchold = self.opch + '_old'
         if not os.path.exists(opchold):
             logger.info('Copy original {}'.format(self.opch))
-            with open(opchold, 'w') as fh:
-                fh.write(content)
+            write_if_changed(opchold, content)
 
         # we include a whole directory
         # at first, we create our own custom opc header file
         # write file
-        with open(self.opch_cust, 'w') as fh:
-            fh.write(self._exts.cust_header)
+        write_if_changed(self.opch_cust, self._exts.cust_header)
 
         # write the include statement for our custom header
         if '#include "riscv-custom-opc.h"\n' not in content:
             content = '#include "riscv-custom-opc.h"\n' + content
 
         # write back generated header file
-        with open(self.opch, 'w') as fh:
-            fh.write(content)
+        write_if_changed(self.opch, content)
 
     def extend_source(self):
         '''
@@ -232,109 +308,60 @@ class Compiler:
         opccold = self.opcc + '_old'
         if not os.path.exists(opccold):
             logger.info('Copy original {}'.format(self.opcc))
-            with open(opccold, 'w') as fh:
-                data = ''.join(content)
-                fh.write(data)
-
-        for inst in self._exts.instructions:
-            # build string that has to be added to the content of the file
-            dfn = '{{"{}",  "I",  "{}", {}, {}, match_opcode, 0 }},\n'.format(
-                inst.name, inst.operands, inst.matchname, inst.maskname)
-
-            if dfn in content:
-                logger.warn('Instruction already taken, skip')
-                continue
-
-            # we simply add the instruction right before the termination of the
-            # list in riscv-opc.c
-            try:
-                line = content.index('/* Terminate the list.  */\n') - 1
-            except ValueError:
-                # choose random line number near the end of the file
-                line = len(content) - 4
+            write_if_changed(opccold, ''.join(content))
+            original = content
+        else:
+            # the custom entries are always spliced into the original source
+            with open(opccold, 'r') as fh:
+                original = fh.readlines()
 
-            logger.info('Adding instruction {}'.format(inst.name))
-            content.insert(line, dfn)
+        block = opcode_block(self._exts.instructions, original)
 
-        # write back modified content
-        with open(self.opcc, 'w') as fh:
-            content = ''.join(content)
-            fh.write(content)
+        # the file is only written, if the entries changed
+        spliced = splice(original, block)
+        if spliced == content:
+            logger.info('Opcode table is up to date')
+            return
+        logger.info('Write {} custom instructions'.format(len(block)))
+        write_if_changed(self.opcc, ''.join(spliced))
 
     def extend_stdlibs(self):
-        # first: we need to find the location of the installed toolchain
-        # this is simply done by parsing the makefile in the
-        # riscv-gnu-toolchain project, which is available via args
-
-        # create a new file
-        riscvintr_templ = Template(r"""<%
-%>\
-// === AUTO GENERATED FILE ===
-
-#ifndef __RISCVINTR_H__
-#define __RISCVINTR_H__
-
-#include <stdint.h>
-
-% for reg, addr in regmap.items():
-#define ${reg} ${hex(addr)}
-% endfor
-
-uint32_t READ_CUSTOM_REG(uint32_t reg)
-{
-    // uint32_t *val;
-    // val = (uint32_t *)reg;
-    // return *val;
-    uint32_t val;
-    __asm__ __volatile__(
-        "read_custreg %0, zero, %1"
-        : "=r" (val)
-        : "r" (reg)
-    );
-    return val;
-}
-
-void WRITE_CUSTOM_REG(uint32_t reg, uint32_t val)
-{
-    // uint32_t *addr = (uint32_t *)reg;
-    // *addr = val;
-    __asm__ __volatile__(
-        "write_custreg zero, %1, %0"
-        :
-        : "r" (reg), "r" (val)
-    );
-}
-
-// access methods for custom instructions
-% for inst in insts:
-% if inst.form is 'R':
-% if not inst.name in ('read_custreg', 'write_custreg'):
-<% print(inst.name)%>\
-
-void ${inst.name.upper()}(uint32_t* rd, uint32_t rs1, uint32_t rs2)
-{
-    __asm__ __volatile__(
-        "${inst.name} %0, %1, %2"
-        : "=r" (*rd)
-        : "r" (rs1), "r" (rs2)
-    );
-}
-% endif
-% endif
-% endfor
-
-#endif // __RISCVINTR_H__
-""")
-
-        intr_file = riscvintr_templ.render(
-            regmap=self._regs.regmap, insts=self._exts.instructions)
-
         # lets put a new file there
         riscvintr = os.path.join(self.stdlibs, 'riscvintr.h')
         logger.info("Create intrinsics file @ {}". format(riscvintr))
 
-        with open(riscvintr, 'w') as fh:
-            fh.write(intr_file)
+        # the intrinsics are rendered straight into the file
+        render_file(riscvintr, 'riscvintr.h.mako',
+                    regmap=self._regs.regmap, insts=self._exts.instructions)
+
+    def inputs(self):
+        '''
+        Return the files besides the models, the patched files depend on.
+        The original toolchain sources are kept next to the patched ones.
+        '''
+        return []
+
+    def outputs(self):
+        '''
+        Return the files, that exist once the toolchain is extended.
+        '''
+        outputs = [self.opch_cust, self.opch + '_old', self.opcc + '_old']
+        stdlibs = find_stdlibs(self._tcpath)
+        if stdlibs is not None:
+            outputs.append(os.path.join(stdlibs, 'riscvintr.h'))
+        return outputs
+
+    @property
+    def stdlibs(self):
+        '''
+        Include directory of the installed toolchain.
+        The Makefile is only parsed, once the path is needed.
+        '''
+        if self._stdlibs is None:
+            self._stdlibs = find_stdlibs(self._tcpath)
+            assert(self._stdlibs is not None)
+
+        return self._stdlibs
 
     @property
     def exts(self):
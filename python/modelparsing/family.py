@@ -0,0 +1,122 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import itertools
+import logging
+import re
+import string
+
+from exceptions import ConsistencyError
+from model import Model
+
+logger = logging.getLogger(__name__)
+
+# names of the generated instructions are used as C identifiers
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def build(name, form, definition, cycles=1, opc=None, funct3=None,
+          funct7=None):
+    '''
+    Create a model without a model file. The model is checked like a
+    parsed model, but the definition is not compiled. Encoding fields
+    left unset are assigned by the allocator.
+    '''
+    if not _identifier.match(name):
+        raise ConsistencyError(name, 'Invalid instruction name.')
+    if form not in ('R', 'I'):
+        raise ConsistencyError(form, 'Unknown instruction format.')
+
+    return Model.from_dict({'cycles': cycles,
+                            'definition': definition.strip(),
+                            'form': form,
+                            'funct3': funct3,
+                            'funct7': funct7 if form == 'R' else None,
+                            'name': name,
+                            'opc': opc,
+                            'check_rd': True,
+                            'check_rs1': True,
+                            'check_op2': True,
+                            'rettype': 'void'})
+
+
+class Family(object):
+    '''
+    Models, that only differ in some parameters, e.g. the width or the
+    saturation mode of an operation.
+    The name and the definition are templates, that refer to the
+    parameters as $param. Cycles and the encoding fields are either
+    values or functions, that map the parameters to a value.
+
+        mac = Family('mac$bits', 'R',
+                     '{ Rd = (Rs1 * Rs2 + Rd) & ((1ull << $bits) - 1); }',
+                     cycles=lambda params: params['bits'] // 8)
+        models = mac.models(bits=[8, 16, 32])
+    '''
+
+    def __init__(self, name, form, definition, cycles=1, opc=None,
+                 funct3=None, funct7=None):
+        self._name = string.Template(name)
+        self._form = form
+        self._definition = string.Template(definition)
+        self._fields = {'cycles': cycles,
+                        'opc': opc,
+                        'funct3': funct3,
+                        'funct7': funct7}
+
+    def model(self, **params):
+        '''
+        Create the model of one set of parameters.
+        '''
+        fields = {}
+        for field, value in self._fields.items():
+            fields[field] = value(params) if callable(value) else value
+        try:
+            name = self._name.substitute(params)
+            definition = self._definition.substitute(params)
+        except KeyError as e:
+            raise ConsistencyError(e.args[0], 'Parameter not set.')
+
+        return build(name, self._form, definition, **fields)
+
+    def models(self, **params):
+        '''
+        Create a model for every combination of the parameter values.
+        Every parameter is given as list of values.
+        '''
+        names = sorted(params)
+        models = []
+        for values in itertools.product(*[params[name] for name in names]):
+            models.append(self.model(**dict(zip(names, values))))
+        logger.info('Created {} models of family {}'.format(
+            len(models), self._name.template))
+        return models
+
+    @property
+    def form(self):
+        return self._form
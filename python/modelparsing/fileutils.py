@@ -0,0 +1,184 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import errno
+import fcntl
+import filecmp
+import logging
+import os
+import tempfile
+import threading
+
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+# the umask can only be read by setting it, which is not thread safe
+_umask = None
+_umask_lock = threading.Lock()
+
+
+def write_if_changed(path, content):
+    '''
+    Write content to path, if the file does not already contain it.
+    The file is replaced atomically, so it is never left half written.
+    Unchanged files keep their modification time, so build tools do not
+    rebuild anything. Returns True, if the file was written.
+    '''
+    with span(path, 'write'):
+        if os.path.isfile(path):
+            with open(path, 'r') as fh:
+                if fh.read() == content:
+                    logger.debug('{} is up to date'.format(path))
+                    return False
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                   prefix='.' + os.path.basename(path))
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                fh.write(content)
+            replace(tmp, path)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+        logger.debug('Wrote {}'.format(path))
+        return True
+
+
+def write_stream_if_changed(path, write):
+    '''
+    Like write_if_changed, but the content is written by calling write
+    with a file object. The content is written to a temporary file and
+    compared with path on disk, so it is never held in memory as a whole.
+    '''
+    with span(path, 'write'):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                   prefix='.' + os.path.basename(path))
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                write(fh)
+            if os.path.isfile(path) and filecmp.cmp(tmp, path, shallow=False):
+                logger.debug('{} is up to date'.format(path))
+                os.remove(tmp)
+                return False
+            replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        logger.debug('Wrote {}'.format(path))
+        return True
+
+
+def replace(tmp, path):
+    '''
+    Replace path with the temporary file tmp. The file keeps its
+    permissions, new files are created according to the umask.
+    '''
+    if os.path.isfile(path):
+        os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+    else:
+        os.chmod(tmp, 0o666 & ~umask())
+    os.rename(tmp, path)
+
+
+class FileLock(object):
+    '''
+    Advisory lock on a file, that serializes processes on one host.
+    The lock can be acquired repeatedly by its owner and is used
+    as a context manager.
+    '''
+
+    def __init__(self, path):
+        self._path = path
+        self._fh = None
+        self._count = 0
+
+    def acquire(self):
+        if self._fh is None:
+            makedirs(os.path.dirname(os.path.abspath(self._path)))
+            fh = open(self._path, 'a')
+            logger.debug('Wait for lock {}'.format(self._path))
+            try:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                fh.close()
+                raise
+            self._fh = fh
+        self._count += 1
+
+    def release(self):
+        self._count -= 1
+        if self._count == 0:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+            logger.debug('Released lock {}'.format(self._path))
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    @property
+    def locked(self):
+        return self._fh is not None
+
+    @property
+    def path(self):
+        return self._path
+
+
+def makedirs(path):
+    '''
+    Create the directory path with all parents.
+    Unlike os.makedirs, it is no error, if the directory already exists,
+    so concurrent tasks can create the same directory.
+    '''
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+
+def umask():
+    '''
+    Return the umask of the process.
+    It is only read once.
+    '''
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            _umask = os.umask(0)
+            os.umask(_umask)
+    return _umask
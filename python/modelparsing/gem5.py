@@ -28,13 +28,110 @@
 
 import logging
 import os
+import re
+import shutil
 import sys
-
-from mako.template import Template
+import tempfile
+import threading
+
+from fileutils import makedirs
+from fileutils import write_if_changed
+from isacache import install
+from isacache import isa_includes
+from profiling import span
+from scheduler import Scheduler
+from templating import render
+from templating import render_file
 
 logger = logging.getLogger(__name__)
 
 
+# default build directory
+BUILDPATH = os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), '../../build'))
+
+# gem5 checkout, this repository is placed in
+GEM5PATH = os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), '../../../..'))
+
+# generated files, relative to the build directory
+DECODER = 'isa/custom.isa'
+ISAMAIN = 'isa/main.isa'
+REGSINTR = 'generated/regsintr.hh'
+TIMINGS = 'python/minor_custom_timings.py'
+# files generated by the gem5 isa_parser, that are compiled
+GENERATED = ['generated/decoder.cc', 'generated/inst-constrs.cc',
+             'generated/generic_cpu_exec.cc']
+
+# sys.path is shared by all threads, that run the isa parser
+_syspath_lock = threading.Lock()
+
+
+def add_syspath(paths):
+    '''
+    Prepend the paths to sys.path, that are not already in it.
+    '''
+    with _syspath_lock:
+        for path in reversed(paths):
+            if path not in sys.path:
+                sys.path.insert(0, path)
+
+
+def custom_decoder(models):
+    '''
+    Return the custom isa decoder for the models.
+    '''
+    # opcode > funct3 (> funct7)
+    models = sorted(models, key=lambda x: (x.opc, x.funct3, x.funct7))
+    return render('custom.isa.mako', models=models)
+
+
+def isa_main(isamain, decoder):
+    '''
+    Return the isa description isamain, that includes the custom decoder
+    of a build directory. All other includes are made absolute, so the
+    description can be placed in any build directory.
+    '''
+    prog = re.compile(r'^(\s*##include\s+")([^"]+)(".*)$')
+
+    with open(isamain, 'r') as fh:
+        content = fh.readlines()
+
+    lines = []
+    for line in content:
+        match = prog.match(line)
+        if match:
+            include = os.path.normpath(os.path.join(
+                os.path.dirname(isamain), match.group(2)))
+            if include.endswith(os.sep + DECODER):
+                include = decoder
+            line = '{}{}{}\n'.format(match.group(1), include, match.group(3))
+        lines.append(line)
+    return ''.join(lines)
+
+
+def outputs(buildpath):
+    '''
+    Return the files, that are generated in the build directory.
+    '''
+    return [os.path.join(buildpath, file)
+            for file in [DECODER, ISAMAIN] + GENERATED + [REGSINTR, TIMINGS]]
+
+
+def fu_timings(insts):
+    '''
+    Return the functional unit timings for the Minor CPU.
+    '''
+    return render('minor_custom_timings.py.mako', insts=insts)
+
+
+def regs_intrinsics(regmap):
+    '''
+    Return the functions, that access the custom registers.
+    '''
+    return render('regsintr.hh.mako', regmap=regmap)
+
+
 class Gem5:
     '''
     This class builds the code snippets, that are later integrated in the gem5
@@ -42,15 +139,13 @@ class Gem5:
     models.
     '''
 
-    def __init__(self, exts, regs):
+    def __init__(self, exts, regs, isacache=None, buildpath=BUILDPATH,
+                 gem5path=GEM5PATH):
         self._exts = exts
         self._regs = regs
-        self._decoder = ''
+        self._isacache = isacache
 
-        self._gem5_path = os.path.abspath(
-            os.path.join(
-                os.path.dirname(os.path.realpath(__file__)),
-                '../../../..'))
+        self._gem5_path = os.path.abspath(gem5path)
         self._gem5_arch_path = os.path.abspath(
             os.path.join(
                 self._gem5_path,
@@ -63,10 +158,7 @@ class Gem5:
                 'riscv/isa/decoder/rv32.isa'))
         assert os.path.exists(self._isa_decoder)
 
-        self._buildpath = os.path.abspath(
-            os.path.join(
-                os.path.dirname(os.path.realpath(__file__)),
-                '../../build'))
+        self._buildpath = os.path.abspath(buildpath)
 
         self._isamain = os.path.abspath(
             os.path.join(
@@ -87,8 +179,7 @@ class Gem5:
             with open(decoder_old, 'r') as fh:
                 content = fh.read()
 
-            with open(self._isa_decoder, 'w') as fh:
-                fh.write(content)
+            write_if_changed(self._isa_decoder, content)
 
             logger.info('Original decoder restored')
 
@@ -105,14 +196,21 @@ class Gem5:
         Calls the functions to generate a custom decoder and
         patch the necessary files in gem5.
         '''
+        scheduler = Scheduler()
+        self.schedule(scheduler)
+        scheduler.run()
 
+    def schedule(self, scheduler):
+        '''
+        Add the generation steps to the scheduler.
+        Only the cxx files depend on the generated decoder.
+        '''
         # first: decoder related stuff
-        self.gen_decoder()
-        self.gen_cxx_files()
-        self.create_regsintr()
-        # self.patch_decoder()
+        scheduler.add('gem5.decoder', self.gen_decoder)
+        scheduler.add('gem5.cxx', self.gen_cxx_files, ['gem5.decoder'])
+        scheduler.add('gem5.regsintr', self.create_regsintr)
         # second: create timings for functional units
-        self.create_FU_timings()
+        scheduler.add('gem5.timings', self.create_FU_timings)
 
     def gen_decoder(self):
         assert os.path.exists(self._buildpath)
@@ -125,120 +223,57 @@ class Gem5:
         # sort models
         self._exts.models.sort(key=lambda x: (x.opc, x.funct3, x.funct7))
 
-        dec_templ = Template(r"""<%
-dfn = {}
-for model in models:
-    if model.opc in dfn:
-        dfn[model.opc].append(model)
-    else:
-        dfn[model.opc] = [model]
-for opc, mdls in dfn.items():
-    funct3 = {}
-    for mdl in mdls:
-        if mdl.form == 'I':
-            funct3[mdl.funct3] = mdl
-        else:
-            if mdl.funct3 in funct3:
-                funct3[mdl.funct3].append(mdl)
-            else:
-                funct3[mdl.funct3] = [mdl]
-    dfn[opc] = funct3
-%>\
-// === AUTO GENERATED FILE ===
-
-% if dfn.items():
-decode OPCODE default Unknown::unknown() {
-% for opc,funct3_dict in dfn.items():
-${hex(opc)}: decode FUNCT3 {
-% for funct3, val in funct3_dict.items():
-% if type(val) != list:
-${hex(funct3)}: I32Op::${val.name}({${val.definition}}, uint32_t, IntCustOp);
-% else:
-${hex(funct3)}: decode FUNCT7 {
-% for mdl in val:
-${hex(mdl.funct7)}: R32Op::${mdl.name}({${mdl.definition}}, IntCustOp);
-% endfor
-}
-% endif
-% endfor
-}
-% endfor
-}
-% else:
-decode OPCODE {
-default: Unknown::unknown();
-}
-% endif
-""")
-
-        self._decoder = dec_templ.render(models=self._exts.models)
-        logger.debug('custom decoder: \n' + self._decoder)
+        # the decoder is rendered straight into the build directory
+        isafile = os.path.join(self._buildpath, DECODER)
+        makedirs(os.path.dirname(isafile))
+        render_file(isafile, 'custom.isa.mako', models=self._exts.models)
+        logger.debug('custom decoder written to {}'.format(isafile))
 
     def gen_cxx_files(self):
         # now generate the cxx files using the isa parser
-        isabuildpath = os.path.join(self._buildpath, 'isa')
-        if not os.path.exists(isabuildpath):
-            os.makedirs(isabuildpath)
+        isafile = os.path.join(self._buildpath, DECODER)
 
-        isafile = os.path.join(isabuildpath, 'custom.isa')
-
-        with open(isafile, 'w') as fh:
-            fh.write(self._decoder)
+        # the isa description includes the decoder of this build directory
+        isamain = os.path.join(self._buildpath, ISAMAIN)
+        write_if_changed(isamain, isa_main(self._isamain, isafile))
 
         # create a builddir
         gen_build_dir = os.path.join(self._buildpath, 'generated')
-        if not os.path.exists(gen_build_dir):
-            os.makedirs(gen_build_dir)
+        makedirs(gen_build_dir)
+
+        key = None
+        if self._isacache is not None:
+            isaparser = os.path.join(self._gem5_arch_path, 'isa_parser.py')
+            key = self._isacache.key(isamain, isaparser, gen_build_dir)
+            if self._isacache.get(key, gen_build_dir):
+                logger.info('Decoder files taken from cache')
+                return
 
         # add some paths to call the gem5 isa parser
-        sys.path[0:0] = [self._gem5_arch_path]
-        sys.path[0:0] = [self._gem5_ply_path]
-        sys.path[0:0] = [os.path.join(self._gem5_path, 'src/python')]
+        add_syspath([os.path.join(self._gem5_path, 'src/python'),
+                     self._gem5_ply_path, self._gem5_arch_path])
         import isa_parser
 
-        logger.info('Let gem5 isa_parser generate decoder files')
-        parser = isa_parser.ISAParser(gen_build_dir)
-        parser.parse_isa_desc(self._isamain)
+        # the files are generated in a temporary directory and only
+        # copied, if they changed
+        tmpdir = tempfile.mkdtemp(dir=self._buildpath)
+        try:
+            logger.info('Let gem5 isa_parser generate decoder files')
+            with span('isa_parser', 'tool'):
+                parser = isa_parser.ISAParser(tmpdir)
+                parser.parse_isa_desc(isamain)
+
+            install(tmpdir, gen_build_dir)
+            if key is not None:
+                self._isacache.put(key, tmpdir)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
 
     def patch_decoder(self):
         # patch the gem5 isa decoder
 
-        dec_templ = Template(r"""<%
-dfn = {}
-for model in models:
-    if model.opc in dfn:
-        dfn[model.opc].append(model)
-    else:
-        dfn[model.opc] = [model]
-for opc, mdls in dfn.items():
-    funct3 = {}
-    for mdl in mdls:
-        if mdl.form == 'I':
-            funct3[mdl.funct3] = mdl
-        else:
-            if mdl.funct3 in funct3:
-                funct3[mdl.funct3].append(mdl)
-            else:
-                funct3[mdl.funct3] = [mdl]
-    dfn[opc] = funct3
-%>\
-% for opc,funct3_dict in dfn.items():
-${hex(opc)}: decode FUNCT3 {
-% for funct3, val in funct3_dict.items():
-% if type(val) != list:
-${hex(funct3)}: I32Op::${val.name}({${val.definition}}, uint32_t, IntCustOp);
-% else:
-${hex(funct3)}: decode FUNCT7 {
-% for mdl in val:
-${hex(mdl.funct7)}: R32Op::${mdl.name}({${mdl.definition}}, IntCustOp);
-% endfor
-}
-% endif
-% endfor
-}
-% endfor""")
-
-        decoder_patch = dec_templ.render(models=self._exts.models)
+        decoder_patch = render('decoder-patch.isa.mako',
+                               models=self._exts.models)
 
         # for now: always choose rv32.isa
         logger.info("Patch the gem5 isa file " + self._isa_decoder)
@@ -250,17 +285,13 @@ ${hex(mdl.funct7)}: R32Op::${mdl.name}({${mdl.definition}}, IntCustOp);
         gem5_isa_old = self._isa_decoder + '_old'
         if not os.path.exists(gem5_isa_old):
             logger.info('Copy original {}'.format(self._isa_decoder))
-            with open(gem5_isa_old, 'w') as fh:
-                data = ''.join(content)
-                fh.write(data)
+            write_if_changed(gem5_isa_old, ''.join(content))
 
         line = len(content) - 2
         content.insert(line, decoder_patch)
 
         # write back modified content
-        with open(self._isa_decoder, 'w') as fh:
-            content = ''.join(content)
-            fh.write(content)
+        write_if_changed(self._isa_decoder, ''.join(content))
 
     def create_FU_timings(self):
         '''
@@ -268,43 +299,13 @@ ${hex(mdl.funct7)}: R32Op::${mdl.name}({${mdl.definition}}, IntCustOp);
         Together with the mask and match value, create a timing for
         every custom instruction.
         '''
-
         assert os.path.exists(self._buildpath)
         logger.info("Create custom timing file for Minor CPU.")
-        timing_templ = Template(r"""<%
-%>\
-# === AUTO GENERATED FILE ===
-
-from m5.objects import *
-% for inst in insts:
-
-
-class MinorFUTiming${inst.name.title()}(MinorFUTiming):
-    description = 'Custom${inst.name.title()}'
-    match = ${hex(inst.matchvalue)}
-    mask = ${hex(inst.maskvalue)}
-    srcRegsRelativeLats = [2]
-    extraCommitLat = ${inst.cycles - 1}
-% endfor
-
-
-custom_timings = [
-% for inst in insts:
-    MinorFUTiming${inst.name.title()}(),
-% endfor
-]
-""")
-
-        _FUtimings = timing_templ.render(insts=self._exts.instructions)
+        timingfile = os.path.join(self._buildpath, TIMINGS)
+        makedirs(os.path.dirname(timingfile))
 
-        pythonbuildpath = os.path.join(self._buildpath, 'python')
-        if not os.path.exists(pythonbuildpath):
-            os.makedirs(pythonbuildpath)
-
-        timingfile = os.path.join(pythonbuildpath, 'minor_custom_timings.py')
-
-        with open(timingfile, 'w') as fh:
-            fh.write(_FUtimings)
+        render_file(timingfile, 'minor_custom_timings.py.mako',
+                    insts=self._exts.instructions)
 
     def create_regsintr(self):
         '''
@@ -312,43 +313,53 @@ custom_timings = [
         custom registers within the execute function of the
         gem5 decoded instruction.
         '''
+        intrfile = os.path.join(self._buildpath, REGSINTR)
+        makedirs(os.path.dirname(intrfile))
+        render_file(intrfile, 'regsintr.hh.mako', regmap=self._regs.regmap)
 
-        intr_templ = Template(r"""<%
-%>\
-// === AUTO GENERATED FILE ===
-
-#include <stdint.h>
-
-% for reg, addr in regmap.items():
-#define ${reg} ${hex(addr)}
-% endfor
-
-#define READ_CUSTOM_REG(reg) \
-({uint32_t val; \
-val = xc->readMiscReg(reg); \
-val;})
-
-#define WRITE_CUSTOM_REG(reg, val) \
-(xc->setMiscReg(reg,val))
-""")
-        intr = intr_templ.render(regmap=self._regs.regmap)
-
-        genpath = os.path.join(self._buildpath, 'generated')
-        if not os.path.exists(genpath):
-            os.makedirs(genpath)
+    def inputs(self):
+        '''
+        Return the files besides the models, the generated files
+        depend on: the isa description and the gem5 isa_parser.
+        '''
+        isapath = os.path.dirname(self._isamain)
+        files = set(os.path.join(isapath, file)
+                    for file in os.listdir(isapath) if file.endswith('.isa'))
+        # the generated decoder is an output
+        files.update(file for file in isa_includes(self._isamain)
+                     if not file.endswith(os.sep + DECODER))
+        files.add(os.path.join(self._gem5_arch_path, 'isa_parser.py'))
+        return sorted(files)
+
+    def outputs(self):
+        '''
+        Return the files, that are generated in the build directory.
+        '''
+        return outputs(self._buildpath)
 
-        intrfile = os.path.join(genpath, 'regsintr.hh')
-        with open(intrfile, 'w') as fh:
-            fh.write(intr)
+    @property
+    def buildpath(self):
+        return self._buildpath
 
     @property
     def decoder(self):
-        return self._decoder
+        '''
+        Content of the generated decoder.
+        '''
+        isafile = os.path.join(self._buildpath, DECODER)
+        if not os.path.isfile(isafile):
+            return ''
+        with open(isafile, 'r') as fh:
+            return fh.read()
 
     @property
     def extensions(self):
         return self._exts
 
+    @property
+    def isacache(self):
+        return self._isacache
+
     @property
     def regs(self):
         return self._regs
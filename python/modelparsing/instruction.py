@@ -28,15 +28,25 @@
 
 import logging
 
+from encoding import define
+from encoding import defname
+from encoding import encode
+
 logger = logging.getLogger(__name__)
 
 
-class Instruction:
+class Instruction(object):
     '''
     Class, that represents one single custom instruction.
     Contains the name, the mask and the match.
+    Instructions created from models only keep the values, the mask and
+    match defines are built on access.
     '''
 
+    __slots__ = ('_cycles', '_form', '_mask', '_match', '_name',
+                 '_maskname', '_maskvalue', '_matchname', '_matchvalue',
+                 '_operands')
+
     def __init__(self, cycles, form, mask, match, name):
         self._cycles = cycles
         self._form = form  # format
@@ -52,6 +62,27 @@ class Instruction:
         # the match value
         self._matchvalue = int(match.split()[-1], 16)
 
+        self.set_operands(form)
+
+    @classmethod
+    def from_model(cls, model):
+        '''
+        Create the instruction from the fields of a model.
+        Mask and match are encoded directly, nothing has to be parsed.
+        '''
+        inst = cls.__new__(cls)
+        inst._cycles = model.cycles
+        inst._form = model.form
+        inst._name = model.name
+        inst._maskvalue, inst._matchvalue = encode(model)
+        inst._mask = None
+        inst._maskname = None
+        inst._match = None
+        inst._matchname = None
+        inst.set_operands(model.form)
+        return inst
+
+    def set_operands(self, form):
         # set right operands that are used in binutils' opc parsing
         # d -> Rd
         # s -> Rs1
@@ -66,7 +97,7 @@ class Instruction:
         else:
             logger.warn('Instruction format unnokwn. ' +
                         'Leaving operands field empty.')
-            self.operands = ''
+            self._operands = ''
 
     @property
     def cycles(self):
@@ -78,10 +109,14 @@ class Instruction:
 
     @property
     def mask(self):
+        if self._mask is None:
+            return define('MASK', self._name, self._maskvalue)
         return self._mask
 
     @property
     def maskname(self):
+        if self._maskname is None:
+            return defname('MASK', self._name)
         return self._maskname
 
     @property
@@ -90,10 +125,14 @@ class Instruction:
 
     @property
     def match(self):
+        if self._match is None:
+            return define('MATCH', self._name, self._matchvalue)
         return self._match
 
     @property
     def matchname(self):
+        if self._matchname is None:
+            return defname('MATCH', self._name)
         return self._matchname
 
     @property
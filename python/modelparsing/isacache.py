@@ -0,0 +1,258 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+
+from fileutils import write_if_changed
+
+logger = logging.getLogger(__name__)
+
+# number of isa_parser outputs, that are kept in the cache
+MAXENTRIES = 8
+# bump, if the layout of the cached entries changes
+VERSION = 2
+
+
+def isa_includes(file, seen=None):
+    '''
+    Return all isa files, that are included by file.
+    '''
+    if seen is None:
+        seen = set()
+
+    prog = re.compile(r'^\s*##include\s+"([^"]+)"')
+
+    with open(file, 'r') as fh:
+        content = fh.readlines()
+
+    for line in content:
+        match = prog.match(line)
+        if match:
+            include = os.path.normpath(os.path.join(
+                os.path.dirname(file), match.group(1)))
+            if include not in seen and os.path.isfile(include):
+                seen.add(include)
+                isa_includes(include, seen)
+
+    return sorted(seen)
+
+
+def relocate(text, roots):
+    '''
+    Replace the root directories in text by their names, so that text does
+    not depend on the place of the checkouts.
+    '''
+    for (name, root) in sorted(roots, key=lambda root: -len(root[1])):
+        text = text.replace(root + os.sep, '<{}>/'.format(name))
+    return text
+
+
+class IsaCache:
+    '''
+    Persistent cache for the C++ files generated by the gem5 isa_parser.
+    An entry is keyed by a hash over the isa description with all included
+    isa files, the isa_parser itself and the output directory.
+    Paths are taken relative to the build directory and the gem5 checkout,
+    so machines with checkouts in other places share the entries.
+    Entries, that are missing locally, are looked up in the remote store.
+    '''
+
+    def __init__(self, path, maxentries=MAXENTRIES, remote=None):
+        self._path = path
+        self._maxentries = maxentries
+        self._remote = remote
+
+        if not os.path.exists(self._path):
+            os.makedirs(self._path)
+
+    def key(self, isamain, isaparser, outdir):
+        '''
+        Calculate the key for the isa description isamain.
+        '''
+        # outdir is placed in the build directory,
+        # isa_parser.py in src/arch of gem5
+        outdir = os.path.abspath(outdir)
+        roots = [('build', os.path.dirname(outdir)),
+                 ('gem5', os.path.dirname(os.path.dirname(
+                     os.path.dirname(os.path.abspath(isaparser)))))]
+
+        sha = hashlib.sha1()
+        sha.update('{} {}'.format(VERSION, relocate(outdir, roots)))
+
+        for file in [isamain, isaparser] + isa_includes(isamain):
+            sha.update(relocate(os.path.abspath(file), roots))
+            # the isa description includes other files by absolute paths
+            with open(file, 'rb') as fh:
+                sha.update(relocate(fh.read(), roots))
+
+        return sha.hexdigest()
+
+    def get(self, key, outdir):
+        '''
+        Restore the files of entry key to outdir.
+        Files, that did not change, keep their modification time.
+        Returns False, if there is no entry.
+        '''
+        entry = os.path.join(self._path, key)
+        if not os.path.isdir(entry) and not self.fetch(key):
+            logger.debug('Cache miss for isa {}'.format(key))
+            return False
+
+        logger.info('Cache hit for isa {}'.format(key))
+        install(entry, outdir)
+        # mark the entry as recently used
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+        return True
+
+    def put(self, key, outdir):
+        '''
+        Store all files in outdir as entry key.
+        '''
+        entry = os.path.join(self._path, key)
+        if os.path.isdir(entry):
+            return
+
+        # copy to a temporary directory first, so that
+        # concurrent readers never see partial entries
+        tmp = tempfile.mkdtemp(dir=self._path, prefix='.' + key)
+        try:
+            for file in os.listdir(outdir):
+                if os.path.isfile(os.path.join(outdir, file)):
+                    shutil.copy(os.path.join(outdir, file), tmp)
+            os.rename(tmp, entry)
+        except OSError:
+            # another process stored the same entry
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        if self._remote is not None:
+            self._remote.put('isa/' + key, pack(outdir))
+
+        self.evict()
+
+    def fetch(self, key):
+        '''
+        Store the entry key from the remote store locally.
+        Returns False, if the remote store does not have it.
+        '''
+        if self._remote is None:
+            return False
+        data = self._remote.get('isa/' + key)
+        if data is None:
+            return False
+
+        logger.info('Remote cache hit for isa {}'.format(key))
+        tmp = tempfile.mkdtemp(dir=self._path, prefix='.' + key)
+        try:
+            unpack(data, tmp)
+            os.rename(tmp, os.path.join(self._path, key))
+        except (OSError, tarfile.TarError) as e:
+            logger.warn('Failed to store remote entry {}: {}'.format(key, e))
+            shutil.rmtree(tmp, ignore_errors=True)
+        return os.path.isdir(os.path.join(self._path, key))
+
+    def evict(self):
+        '''
+        Remove the least recently used entries, until there are at most
+        maxentries left.
+        '''
+        entries = []
+        for entry in os.listdir(self._path):
+            if entry.startswith('.'):
+                continue
+            try:
+                mtime = os.stat(os.path.join(self._path, entry)).st_mtime
+            except OSError:
+                continue
+            entries.append((mtime, entry))
+
+        entries.sort()
+        while len(entries) > self._maxentries:
+            (_, entry) = entries.pop(0)
+            logger.debug('Evict isa cache entry {}'.format(entry))
+            shutil.rmtree(os.path.join(self._path, entry), ignore_errors=True)
+
+    @property
+    def maxentries(self):
+        return self._maxentries
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def remote(self):
+        return self._remote
+
+
+def install(src, dst):
+    '''
+    Copy all files from directory src to directory dst.
+    Files, that did not change, keep their modification time.
+    '''
+    if not os.path.exists(dst):
+        os.makedirs(dst)
+    for file in sorted(os.listdir(src)):
+        with open(os.path.join(src, file), 'rb') as fh:
+            write_if_changed(os.path.join(dst, file), fh.read())
+
+
+def pack(src):
+    '''
+    Return all files in directory src as compressed tar archive.
+    '''
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz') as tar:
+        for file in sorted(os.listdir(src)):
+            if os.path.isfile(os.path.join(src, file)):
+                tar.add(os.path.join(src, file), arcname=file)
+    return buf.getvalue()
+
+
+def unpack(data, dst):
+    '''
+    Extract the files of an archive created by pack to directory dst.
+    '''
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as tar:
+        for member in tar.getmembers():
+            # only plain files without directories are expected
+            if not member.isfile() or os.path.basename(
+                    member.name) != member.name:
+                raise tarfile.TarError('Unexpected member {}'.format(
+                    member.name))
+            with open(os.path.join(dst, member.name), 'wb') as fh:
+                fh.write(tar.extractfile(member).read())
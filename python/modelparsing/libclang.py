@@ -0,0 +1,83 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import platform
+
+# configured clang.cindex module
+_cindex = None
+
+
+def cindex():
+    '''
+    Return the clang.cindex module.
+    The bindings are imported and pointed to the libclang of the
+    distribution on first use, so that runs that do not need
+    libclang do not pay for it.
+    '''
+    global _cindex
+    if _cindex is not None:
+        return _cindex
+
+    import clang.cindex
+
+    clang.cindex.Config.set_library_file(library_file())
+
+    _cindex = clang.cindex
+    return _cindex
+
+
+def library_file():
+    '''
+    Return the path of the libclang of the distribution.
+    '''
+    if platform.system() == 'Linux':
+        (name, version, code) = platform.linux_distribution()
+    else:
+        (name, version, code) = ('n/a', 'n/a', 'n/a')
+
+    if name == 'Ubuntu':
+        if version == '16.04':
+            return '/usr/lib/llvm-3.8/lib/libclang-3.8.so'
+        return '/usr/lib/llvm-4.0/lib/libclang-4.0.so'
+    elif name == 'CentOS Linux':
+        return '/usr/lib64/llvm/libclang.so'
+    raise ValueError(name, 'Linux Version not supported.')
+
+
+def library_version():
+    '''
+    Return a string, that changes, if the libclang of the distribution is
+    replaced, without loading it.
+    '''
+    try:
+        path = os.path.realpath(library_file())
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return 'n/a'
+    return '{} {} {}'.format(path, stat.st_size, int(stat.st_mtime))
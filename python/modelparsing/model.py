@@ -26,26 +26,143 @@
 #
 # Authors: Robert Scheffel
 
-import clang.cindex
 import logging
-import subprocess
+import os
 
 from exceptions import ConsistencyError
+from libclang import cindex
+from scanner import scan_model
 
 logger = logging.getLogger(__name__)
 
+# flags used to parse and check the model with libclang
+CLANGFLAGS = ['-x', 'c++', '-c', '-std=c++11', '-Wall']
 
-class Model:
+# prefix of the annotation, that marks a function as custom instruction
+ANNOTATION = 'custom'
+# fields, that may be set in the annotation
+ANNOTATED = ('opc', 'funct3', 'funct7', 'cycles')
+
+# libclang index, shared by all models
+_index = None
+
+
+def index():
+    '''
+    Return the libclang index. It is only created once.
+    '''
+    global _index
+    if _index is None:
+        logger.info("Using libclang at %s" %
+                    cindex().Config.library_file)
+        _index = cindex().Index.create()
+    return _index
+
+
+def check_diagnostics(file, tu):
+    '''
+    Check the diagnostics libclang reported while parsing the model.
+    '''
+    logger.info('Check diagnostics of model {}'.format(file))
+    errors = False
+    for diag in tu.diagnostics:
+        if diag.severity >= cindex().Diagnostic.Error:
+            logger.error(diag)
+            errors = True
+        elif diag.severity >= cindex().Diagnostic.Warning:
+            logger.warn(diag)
+
+    if errors:
+        raise ConsistencyError(file, 'Compile error.')
+
+
+def parse_unit(impl, source):
+    '''
+    Parse the model file impl with libclang.
+    '''
+    tu = index().parse(impl, CLANGFLAGS, unsaved_files=[(impl, source)])
+    check_diagnostics(impl, tu)
+    return tu
+
+
+def annotation(node):
+    '''
+    Return the custom instruction annotation of a function or None.
+    '''
+    for child in node.get_children():
+        if child.kind == cindex().CursorKind.ANNOTATE_ATTR and \
+                child.spelling.split()[:1] == [ANNOTATION]:
+            return child.spelling
+    return None
+
+
+def parse_file(impl, fast=False):
+    '''
+    Return all models defined in the model file impl.
+    A file either defines a single instruction, whose encoding and cycles
+    are given by global variables, or several functions, that carry their
+    encoding and cycles in an annotation:
+
+        __attribute__((annotate("custom opc=0x02 funct3=0x1 cycles=2")))
+        void mac(uint32_t &Rd, uint32_t Rs1, uint32_t Rs2) { ... }
+
+    The file is parsed only once for all of its functions.
+    If fast is set, single instruction files are scanned without libclang.
+    '''
+    if fast:
+        logger.info("Scanning model @ %s" % impl)
+        fields = scan_model(impl)
+        if fields is not None:
+            return [Model.from_dict(fields)]
+        logger.info('Fall back to libclang')
+
+    with open(impl, 'r') as fh:
+        source = fh.read()
+
+    tu = parse_unit(impl, source)
+
+    functions = []
+    for node in tu.cursor.get_children():
+        if node.kind != cindex().CursorKind.FUNCTION_DECL or \
+                node.location.file is None or \
+                node.location.file.name != impl or \
+                not node.is_definition():
+            continue
+        if annotation(node) is None:
+            logger.debug('Function {} is not annotated'.format(node.spelling))
+            continue
+        functions.append(node)
+
+    if not functions:
+        return [Model.from_unit(impl, source, tu.cursor)]
+
+    return [Model.from_unit(impl, source, node) for node in functions]
+
+
+class Model(object):
     '''
     C++ Reference of the custom instruction.
+    The position of the definition in the model file is kept, so a
+    released model reads its definition from the file on access.
     '''
 
-    def __init__(self, impl=None, read=False, write=False):
+    __slots__ = ('_cycles', '_dfn', '_form', '_funct3', '_funct7', '_name',
+                 '_opc', '_check_rd', '_check_rs1', '_check_op2',
+                 '_rettype', '_span', '_file', '_stat', '_impl', '_source')
+
+    def __init__(self, impl=None, read=False, write=False, fast=False):
         '''
         Init method, that takes the location of
         the implementation as an argument.
+        If fast is set, a model that follows the expected layout is
+        extracted without libclang.
         '''
 
+        # position of the definition in the model file
+        self._span = None
+        self._file = None
+        self._stat = None
+
         if impl is None:
             # we generate a model for read and write
             self._cycles = 1
@@ -76,72 +193,104 @@ class Model:
 
             self.check_consistency()
 
-        else:
-            logger.info("Using libclang at %s" %
-                        clang.cindex.Config.library_file)
-
-            self.compile_model(impl)
-
-            index = clang.cindex.Index.create()
-            tu = index.parse(impl, ['-x', 'c++', '-c', '-std=c++11'])
-
-            # information to retrieve form model
-            self._cycles = 1            # cycle count for the instruction
-            self._dfn = ''              # definition
-            self._form = ''             # format
-            self._funct3 = 0xff         # funct3 bit field
-            self._funct7 = 0xff         # funct7 bit field
-            self._name = ''             # name
-            self._opc = 0x0             # opcode
-            # model consistency checks
-            self._check_rd = False      # check if rd is defined
-            self._check_rs1 = False     # check if rs1 is defined
-            self._check_op2 = False
-            self._rettype = ''
-
-            logger.info("Parsing model @ %s" % impl)
-
-            self.parse_model(tu.cursor)
+        elif fast and self.scan_model(impl):
             self.check_consistency()
 
-    def compile_model(self, file):
-        logger.info('Compile model {}'.format(file))
-        p = subprocess.Popen([r'g++',
-                              '-fsyntax-only',
-                              '-Wall',
-                              '-std=c++11',
-                              '-c',
-                              file],
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE)
-        (_, ret) = p.communicate()
-
-        if ret:
-            logger.error(ret)
-            raise ConsistencyError(file, 'Compile error.')
+        else:
+            # the model is read once and handed to libclang as unsaved file,
+            # definitions are sliced from the same buffer
+            with open(impl, 'r') as fh:
+                source = fh.read()
+
+            tu = parse_unit(impl, source)
+            self.parse_unit(impl, source, tu.cursor)
+
+    @classmethod
+    def from_unit(cls, impl, source, node):
+        '''
+        Create a model from the cursor node of the parsed model file impl.
+        '''
+        model = cls.__new__(cls)
+        model._span = None
+        model._file = None
+        model._stat = None
+        model.parse_unit(impl, source, node)
+        return model
+
+    def parse_unit(self, impl, source, node):
+        '''
+        Extract the model from the cursor node, that is either the
+        translation unit or a single annotated function.
+        '''
+        # information to retrieve form model
+        self._cycles = 1            # cycle count for the instruction
+        self._dfn = ''              # definition
+        self._form = ''             # format
+        self._funct3 = None         # funct3 bit field
+        self._funct7 = None         # funct7 bit field
+        self._name = ''             # name
+        self._opc = None            # opcode
+        # model consistency checks
+        self._check_rd = False      # check if rd is defined
+        self._check_rs1 = False     # check if rs1 is defined
+        self._check_op2 = False
+        self._rettype = ''
+
+        logger.info("Parsing model @ %s" % impl)
+
+        self._impl = impl
+        self._source = source
+        self.parse_model(node)
+        del self._impl
+        del self._source
+
+        self.check_consistency()
+
+    def scan_model(self, impl):
+        '''
+        Extract the model information without libclang.
+        Returns False, if the model does not follow the expected layout.
+        '''
+        logger.info("Scanning model @ %s" % impl)
+        fields = scan_model(impl)
+        if fields is None:
+            logger.info('Fall back to libclang')
+            return False
+
+        self._load(fields)
+        return True
 
     def parse_model(self, node):
         '''
         Parse the model and search for all necessary information.
+        Only cursors located in the model file itself are visited.
         '''
+        CursorKind = cindex().CursorKind
+
         for child in node.get_children():
+            if child.location.file is None or \
+                    child.location.file.name != self._impl:
+                # declared in an included header
+                continue
             self.parse_model(child)
 
         # only set name if it's unset
-        # due to parsing of included header the function definition occures
-        # twice
-        if node.kind == clang.cindex.CursorKind.FUNCTION_DECL \
+        if node.kind == CursorKind.FUNCTION_DECL \
                 and self._name == '':
             # save name
             self._name = node.spelling
-            # save rettype for consistency check
-            self._rettype = list(node.get_tokens())[0].spelling
+            # save rettype for consistency check, attributes may
+            # precede the return type
+            self._rettype = node.result_type.spelling
             logger.info("Function name: {}".format(self._name))
 
-        if node.kind == clang.cindex.CursorKind.COMPOUND_STMT:
+        if node.kind == CursorKind.ANNOTATE_ATTR:
+            self.extract_annotation(node.spelling)
+
+        if node.kind == CursorKind.COMPOUND_STMT:
             self.extract_definition(node)
 
-        if node.kind == clang.cindex.CursorKind.VAR_DECL:
+        if node.kind == CursorKind.VAR_DECL:
             # process all variable declarations
             # opcode
             if node.spelling == 'opc':
@@ -160,7 +309,7 @@ class Model:
                 logger.debug('Model cycles:')
                 self._cycles = self.extract_value(node)
 
-        if node.kind == clang.cindex.CursorKind.PARM_DECL:
+        if node.kind == CursorKind.PARM_DECL:
             # process all parameter declarations
             # check if Rd and Rs1 exists
             if node.spelling.startswith('Rd'):
@@ -182,16 +331,33 @@ class Model:
         '''
         Extract a function definition.
         '''
-        filename = node.location.file.name
-        with open(filename, 'r') as fh:
-            contents = fh.read()
-
-        self._dfn = contents[node.extent.start.offset: node.extent.end.offset]
+        self._span = (node.extent.start.offset, node.extent.end.offset)
+        self._dfn = self._source[self._span[0]:self._span[1]]
 
         logger.info("Definintion in {} @ line {}".format(
-            filename, node.location.line))
+            self._impl, node.location.line))
         logger.debug('Definition:\n%s' % self._dfn)
 
+    def extract_annotation(self, text):
+        '''
+        Extract the encoding and cycles from an annotation like
+        "custom opc=0x02 funct3=0x1 funct7=0x3 cycles=2".
+        '''
+        fields = text.split()
+        if fields[:1] != [ANNOTATION]:
+            return
+
+        for field in fields[1:]:
+            (name, sep, value) = field.partition('=')
+            if name not in ANNOTATED or not sep:
+                raise ConsistencyError(text, 'Invalid annotation.')
+            try:
+                value = int(value, 0)
+            except ValueError:
+                raise ConsistencyError(text, 'Invalid annotation.')
+            logger.debug('Model {}: {}'.format(name, value))
+            setattr(self, '_' + name, value)
+
     def extract_value(self, node):
         '''
         Extract a variable value.
@@ -226,14 +392,16 @@ class Model:
             raise ConsistencyError(
                 self._rettype, 'Function has to be of type void.')
 
-        if self._opc not in [0x02, 0x0a, 0x16, 0x1e]:
+        # unset encoding fields are assigned by the allocator
+        if self._opc is not None and self._opc not in [0x02, 0x0a, 0x16, 0x1e]:
             raise ValueError(self._opc, 'Invalid opcode.')
 
         # funct3 --> 3 bits
-        if self._funct3 > 0x7:
+        if self._funct3 is not None and self._funct3 > 0x7:
             raise ValueError(self._funct3, 'Invalid funct3.')
         # funct7 --> 7 bits
-        if self._form == 'R' and self._funct7 > 0x7f:
+        if (self._form == 'R' and self._funct7 is not None and
+                self._funct7 > 0x7f):
             raise ValueError(self._funct7, 'Invalid funct7.')
 
         # check, if cycles where added
@@ -241,21 +409,118 @@ class Model:
             raise ValueError(self._cycles, 'Missing cycle information.')
 
         # does the definition starts and end with a bracket
-        if not self._dfn.startswith('{'):
+        dfn = self.definition
+        if not dfn.startswith('{'):
             raise ConsistencyError(
-                self._dfn, 'Function definition not found.')
-        if not self._dfn.endswith('}'):
+                dfn, 'Function definition not found.')
+        if not dfn.endswith('}'):
             raise ConsistencyError(
-                self._dfn, 'Closing bracket missing.')
+                dfn, 'Closing bracket missing.')
 
         logger.info('Model meets requirements')
 
+    def release(self, impl):
+        '''
+        Drop the definition, it is read again from impl on access.
+        Models without a known position are kept as they are.
+        '''
+        if self._span is None:
+            return
+        self._file = impl
+        st = os.stat(impl)
+        self._stat = (st.st_size, st.st_mtime)
+        self._dfn = None
+
+    def load_definition(self):
+        '''
+        Read the definition of a released model from the model file.
+        '''
+        st = os.stat(self._file)
+        if (st.st_size, st.st_mtime) != self._stat:
+            raise ConsistencyError(self._file,
+                                   'Model changed since it was parsed.')
+        with open(self._file, 'r') as fh:
+            fh.seek(self._span[0])
+            return fh.read(self._span[1] - self._span[0])
+
+    def set_encoding(self, opc, funct3, funct7=None):
+        '''
+        Set the encoding fields, that were left unset in the model.
+        '''
+        self._opc = opc
+        self._funct3 = funct3
+        if self._form == 'R':
+            self._funct7 = funct7
+        self.check_consistency()
+
+    def to_dict(self):
+        '''
+        Return the extracted information as a dictionary.
+        '''
+        return {'cycles': self._cycles,
+                'definition': self.definition,
+                'form': self._form,
+                'funct3': self._funct3,
+                'funct7': self._funct7,
+                'name': self._name,
+                'opc': self._opc,
+                'check_rd': self._check_rd,
+                'check_rs1': self._check_rs1,
+                'check_op2': self._check_op2,
+                'rettype': self._rettype}
+
+    @classmethod
+    def from_dict(cls, fields):
+        '''
+        Create a model from a dictionary created by to_dict.
+        The consistency of the model is checked again.
+        '''
+        model = cls.__new__(cls)
+        model._file = None
+        model._stat = None
+        model._load(fields)
+        model.check_consistency()
+        return model
+
+    def _load(self, fields):
+        def _str(value):
+            # json only knows unicode strings
+            if isinstance(value, unicode):
+                return value.encode('utf-8')
+            return value
+
+        self._cycles = fields['cycles']
+        self._dfn = _str(fields['definition'])
+        self._form = _str(fields['form'])
+        self._funct3 = fields['funct3']
+        self._funct7 = fields['funct7']
+        self._name = _str(fields['name'])
+        self._opc = fields['opc']
+        self._check_rd = fields['check_rd']
+        self._check_rs1 = fields['check_rs1']
+        self._check_op2 = fields['check_op2']
+        self._rettype = _str(fields['rettype'])
+        self._span = fields.get('span')
+        if self._span is not None:
+            self._span = tuple(self._span)
+
+    def __getstate__(self):
+        # models are handed between processes
+        return dict((name, getattr(self, name)) for name in self.__slots__
+                    if hasattr(self, name))
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     @property
     def cycles(self):
         return self._cycles
 
     @property
     def definition(self):
+        if self._dfn is None:
+            return self.load_definition()
         return self._dfn
 
     @property
@@ -277,3 +542,11 @@ class Model:
     @property
     def opc(self):
         return self._opc
+
+    @property
+    def released(self):
+        return self._dfn is None
+
+    @property
+    def span(self):
+        return self._span
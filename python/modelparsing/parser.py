@@ -26,88 +26,411 @@
 #
 # Authors: Robert Scheffel
 
+import functools
+import hashlib
+import json
 import logging
 import os
+import shutil
+import time
 
 from stat import *
 
+from allocator import Allocator
+from cache import includes
 from compiler import Compiler
+from exceptions import ConsistencyError
 from extensions import Extensions
+from fileutils import FileLock
+from fileutils import makedirs
+from fileutils import write_if_changed
+from gem5 import BUILDPATH
+from gem5 import GEM5PATH
 from gem5 import Gem5
 from model import Model
+from model import parse_file
+import profiling
 from registers import Registers
+from scheduler import Scheduler
+from templating import templatepath
+from templating import templates
 
 logger = logging.getLogger(__name__)
 
+# lock and record of the extension set, that is applied to a toolchain
+TCLOCK = '.riscv-custom-extension.lock'
+TCRECORD = '.riscv-custom-extension.json'
+
+
+def parse_model(impl, fast=False):
+    '''
+    Parse a single model file and return the models it defines.
+    Module level function, so it can be handed to a worker pool.
+    Errors are raised as ConsistencyError, that names the model file.
+    '''
+    try:
+        with profiling.span(impl, 'model'):
+            return parse_file(impl, fast=fast)
+    except Exception as e:
+        logger.error('Failed to parse model {}'.format(impl))
+        # the pool never delivers exceptions, that can not be unpickled,
+        # e.g. the errors of libclang
+        raise ConsistencyError(impl, '{}: {}'.format(type(e).__name__, e))
+
+
+def encodings(modelpath):
+    '''
+    Return the record of the assigned encodings of the models in modelpath.
+    '''
+    if os.path.isdir(modelpath):
+        return os.path.join(modelpath, 'encodings.json')
+    return os.path.join(os.path.dirname(modelpath), 'encodings.json')
+
+
+def normpath(path):
+    '''
+    Return the absolute and normalized path.
+    '''
+    return os.path.normpath(os.path.abspath(path))
+
 
 class Parser:
     '''
     This class stepwise calls all the functions necessary to parse modules
     and retrieve the information necessary to extend gnu binutils and gem5.
+    The backends are only created, once they are needed.
+    In a dry run, neither the toolchain nor the build directory
+    are touched.
+    Several parsers may generate into different build directories at the
+    same time. The toolchain and the build directory are locked, while they
+    are changed.
+    In low memory mode, the definitions of the models are released after
+    parsing and read from the model files, whenever they are needed.
     '''
 
-    def __init__(self, tcpath, modelpath):
-        self._compiler = Compiler(None, None, tcpath)
-        self._gem5 = Gem5([], None)
+    def __init__(self, tcpath, modelpath, jobs=1, cache=None, fast=False,
+                 isacache=None, dryrun=False, buildpath=BUILDPATH,
+                 catalog=None, lowmem=False, gem5path=GEM5PATH):
+        self._allocator = None
+        self._buildpath = os.path.abspath(buildpath)
+        self._cache = cache
+        self._catalog = catalog
+        self._isacache = isacache
+        self._compiler = None
+        self._dryrun = dryrun
+        self._gem5 = None
+        self._gem5path = gem5path
         self._exts = None
+        self._fast = fast
+        self._fingerprint = None
+        self._jobs = jobs
+        self._lowmem = lowmem
         self._models = []
+        # parsed models by file
+        self._parsed = {}
+        self._files = []
+        # models, that were created without a model file
+        self._added = []
         self._regs = Registers()
         self._modelpath = modelpath
         self._tcpath = tcpath
+        # (phase, seconds) of the finished phases
+        self._timings = []
+
+        # fingerprints of the extension sets applied to gem5 and the
+        # toolchain, the toolchain may be shared by several build directories
+        self.fingerprints = os.path.join(self._buildpath, 'fingerprints.json')
+        self.tcfingerprints = os.path.join(tcpath, TCRECORD)
 
-    def restore(self):
+        # the lock is placed next to the build directory, so it survives
+        # the removal of the directory
+        self._buildlock = FileLock(self._buildpath + '.lock')
+        self._tclock = FileLock(os.path.join(tcpath, TCLOCK))
+
+    def restore(self, compiler=True, gem5=True, clean=False):
         '''
-        Restore the toolchain to its defaults.
+        Restore the toolchain and gem5 to their defaults.
+        If clean is set, the build directory is removed while it is locked.
         '''
+        # the locks are always taken in the same order
+        locks = []
+        if compiler:
+            locks.append(self._tclock)
+        if gem5 or clean:
+            locks.append(self._buildlock)
+        for lock in locks:
+            lock.acquire()
+        try:
+            backends = []
+            if compiler:
+                logger.info(
+                    'Remove custom instructions from GNU binutils files')
+                backends.append('compiler')
+            if gem5:
+                backends.append('gem5')
+            for backend in backends:
+                self.backend(backend).restore()
+
+                # the backend is not applied anymore
+                record = self.fingerprints_of(backend)
+                if os.path.exists(record):
+                    os.remove(record)
 
-        logger.info('Remove custom instructions from GNU binutils files')
-        self._compiler.restore()
-        self._gem5.restore()
+            if clean and os.path.exists(self._buildpath):
+                logger.info('Remove build directory')
+                shutil.rmtree(self._buildpath)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
 
+    @profiling.profiled('parse', 'phase')
     def parse_models(self):
         '''
         Parse the c++ reference implementation
         of the custom instruction.
         '''
+        start = time.time()
 
         logger.info('Determine if modelpath is a folder or a single file')
         if os.path.isdir(self._modelpath):
-            # restore the toolchain to its defaults
-            self.restore()
             logger.info('Traverse over directory')
             self.treewalk(self._modelpath)
         else:
             logger.info('Single file, start parsing')
-            model = Model(self._modelpath)
-            self._models.append(model)
+            self._files = [self._modelpath]
+            self._parsed = dict(zip(self._files,
+                                    self.parse_files(self._files)))
 
+        self.gen_extensions()
+        self.update_catalog()
+
+        self._timings.append(('parse', time.time() - start))
+
+    def gen_extensions(self):
+        '''
+        Create the extensions from the parsed models.
+        '''
+        self._models = [model for file in self._files
+                        for model in self._parsed[file]]
+        self._models.extend(self._added)
         # add model for read function
         self._models.append(Model(read=True))
         # add model for write function
         self._models.append(Model(write=True))
 
+        # assign encodings to models, that do not define them
+        self._allocator = Allocator(encodings(self._modelpath),
+                                    readonly=self._dryrun)
+        self._allocator.allocate(self._models)
+
+        self._fingerprint = self.gen_fingerprint()
+
         self._exts = Extensions(self._models)
-        self._compiler = Compiler(self._exts, self._regs, self._tcpath)
-        self._gem5 = Gem5(self._exts, self._regs)
+        # backends are created again with the extensions on next use
+        self._compiler = None
+        self._gem5 = None
+
+    def add(self, models):
+        '''
+        Add models, that were created without a model file, e.g. by a
+        Family. They are handled like the parsed models. If the models
+        were already parsed, the extensions are created again.
+        '''
+        self._added.extend(models)
+        if self._exts is not None:
+            self.gen_extensions()
+
+    def update_catalog(self):
+        '''
+        Record the models and registers in the catalog.
+        '''
+        if self._catalog is None:
+            return
+        self._catalog.update(self._modelpath,
+                             [(file, model) for file in self._files
+                              for model in self._parsed[file]],
+                             self._regs.regmap)
+
+    @profiling.profiled('update', 'phase')
+    def update(self, changed=(), removed=(), compiler=True, gem5=True,
+               full=False):
+        '''
+        Update the extensions after files below the modelpath changed.
+        Only changed models and models including changed headers are
+        parsed again and only the generation steps, whose input changed,
+        are run. If full is set, all steps are run, e.g. after a failed
+        update. Returns the names of the steps, that were run.
+        '''
+        start = time.time()
+        regmap = dict(self._regs.regmap)
+        models = [model.to_dict() for model in self._models]
+        insts = [(inst.name, inst.form, inst.maskvalue, inst.matchvalue)
+                 for inst in self._exts.instructions]
+
+        if os.path.isdir(self._modelpath):
+            # models may have been added or removed,
+            # register files are parsed again
+            self._regs = Registers()
+            self._files = self.find_models(self._modelpath)
+
+        # the paths of the watcher and of the includes are written
+        # differently, e.g. relative to the modelpath
+        changed = set(normpath(file) for file in changed)
+        removed = set(normpath(file) for file in removed)
+        stale = set(file for file in self._files
+                    if normpath(file) in changed)
+        for header in changed.union(removed):
+            if header.endswith('.hh'):
+                # removed headers are still included by the models
+                stale.update(file for file in self._files
+                             if header in [normpath(include) for include
+                                           in includes(file, missing=True)])
+        stale = [file for file in self._files
+                 if file in stale or file not in self._parsed]
+        self._parsed = dict((file, self._parsed[file])
+                            for file in self._files if file in self._parsed)
+        self._parsed.update(zip(stale, self.parse_files(stale)))
+
+        self.gen_extensions()
+        self.update_catalog()
+        self._timings.append(('parse', time.time() - start))
+        if full:
+            return self.extend(compiler, gem5)
+
+        steps = set()
+        if [(inst.name, inst.form, inst.maskvalue, inst.matchvalue)
+                for inst in self._exts.instructions] != insts:
+            # encodings changed
+            steps.update(['compiler.header', 'compiler.source',
+                          'compiler.stdlibs', 'gem5.decoder', 'gem5.cxx',
+                          'gem5.timings'])
+        if [model.to_dict() for model in self._models] != models:
+            # definitions or timings changed
+            steps.update(['gem5.decoder', 'gem5.cxx', 'gem5.timings'])
+        if self._regs.regmap != regmap:
+            steps.update(['compiler.stdlibs', 'gem5.regsintr'])
+
+        if not steps:
+            logger.info('Extensions did not change')
+            return []
+        return self.extend(compiler, gem5, steps)
+
+    def gen_fingerprint(self):
+        '''
+        Return a fingerprint of the extension set.
+        It covers the models, the registers and the code and templates,
+        that generate the files. The backends add their other inputs.
+        '''
+        sha = hashlib.sha1()
+        sha.update(self._tcpath)
+        models = sorted(self._models, key=lambda model: model.name)
+        sha.update(json.dumps([model.to_dict() for model in models],
+                              sort_keys=True))
+        sha.update(json.dumps(self._regs.regmap, sort_keys=True))
+
+        package = os.path.dirname(os.path.realpath(__file__))
+        sources = [os.path.join(package, file)
+                   for file in sorted(os.listdir(package))
+                   if file.endswith('.py')]
+        sources.extend(os.path.join(templatepath, name)
+                       for name in templates())
+        for source in sources:
+            with open(source, 'r') as fh:
+                sha.update(fh.read())
+        return sha.hexdigest()
+
+    def backend(self, backend):
+        '''
+        Return the compiler or the gem5 backend.
+        '''
+        if backend == 'compiler':
+            return self.compiler
+        return self.decoder
+
+    def backend_fingerprint(self, backend):
+        '''
+        Return the fingerprint of the extension set together with
+        the other inputs of a backend.
+        '''
+        sha = hashlib.sha1(self._fingerprint)
+        for file in self.backend(backend).inputs():
+            sha.update(file)
+            with open(file, 'r') as fh:
+                sha.update(fh.read())
+        return sha.hexdigest()
+
+    def applied(self, backend):
+        '''
+        Check if the extension set was already applied to a backend and
+        all of its outputs still exist.
+        '''
+        fingerprints = self.fingerprints_of(backend)
+        if self._fingerprint is None or not os.path.isfile(fingerprints):
+            return False
+        with open(fingerprints, 'r') as fh:
+            record = json.load(fh)
+        if record.get(backend) != self.backend_fingerprint(backend):
+            return False
+
+        for output in self.backend(backend).outputs():
+            if not os.path.exists(output):
+                logger.info('{} is missing'.format(output))
+                return False
+        return True
+
+    def record(self, backend):
+        '''
+        Record, that the extension set was applied to a backend.
+        '''
+        fingerprints = self.fingerprints_of(backend)
+        record = {}
+        if os.path.isfile(fingerprints):
+            with open(fingerprints, 'r') as fh:
+                record = json.load(fh)
+        record[backend] = self.backend_fingerprint(backend)
+
+        if not os.path.exists(os.path.dirname(fingerprints)):
+            os.makedirs(os.path.dirname(fingerprints))
+        write_if_changed(fingerprints,
+                         json.dumps(record, indent=4, sort_keys=True,
+                                    separators=(',', ': ')) + '\n')
+
+    def fingerprints_of(self, backend):
+        '''
+        Return the file, the fingerprint of backend is recorded in.
+        '''
+        if backend == 'compiler':
+            return self.tcfingerprints
+        return self.fingerprints
 
     def treewalk(self, top):
+        '''
+        Search for models and register files below top and parse them.
+        '''
+        self._files = self.find_models(top)
+        self._parsed = dict(zip(self._files, self.parse_files(self._files)))
+
+    def find_models(self, top):
+        '''
+        Collect all model files below top.
+        Register files are parsed right away.
+        '''
         logger.info('Search for models in {}'.format(top))
         logger.debug('Directory content: {}'.format(os.listdir(top)))
-        for file in os.listdir(top):
+        files = []
+        for file in sorted(os.listdir(top)):
             pathname = os.path.join(top, file)
             mode = os.stat(pathname)[ST_MODE]
 
             if S_ISDIR(mode):
                 # directory
-                self.treewalk(pathname)
+                files.extend(self.find_models(pathname))
             elif S_ISREG(mode):
                 # file
                 if pathname.endswith('.cc'):
                     logger.info(
                         'Model definition in file {}'.format(pathname))
-                    model = Model(pathname)
-
-                    self._models.append(model)
+                    files.append(pathname)
                 # registers
                 if pathname.endswith('registers.hh'):
                     logger.info('Custom registers in file {}'.format(pathname))
@@ -116,34 +439,235 @@ class Parser:
                 # unknown file type
                 logger.info('Unknown file type, skip')
 
+        return files
+
+    def parse_files(self, files):
+        '''
+        Parse the given model files.
+        Returns the list of models of every file.
+        Models found in the cache are not parsed again.
+        If more than one job is allowed, the remaining files are parsed by
+        a pool of worker processes. The order of the returned models always
+        matches the order of the files.
+        '''
+        models = [None] * len(files)
+        if self._cache:
+            for i, impl in enumerate(files):
+                models[i] = self._cache.get(impl)
+
+        missing = [i for i, model in enumerate(models) if model is None]
+        parsed = self.parse_pool([files[i] for i in missing])
+
+        for i, found in zip(missing, parsed):
+            models[i] = found
+            # scanning is cheap enough, only cache models
+            # that were checked by libclang
+            if self._cache and not self._fast:
+                self._cache.put(files[i], found)
+
+        if self._lowmem:
+            for impl, found in zip(files, models):
+                for model in found:
+                    model.release(impl)
+
+        return models
+
+    def parse_pool(self, files):
+        '''
+        Parse the given model files, using a pool of worker processes.
+        If profiling is on, the workers return their events with the
+        models.
+        '''
+        parse = functools.partial(parse_model, fast=self._fast)
+
+        jobs = min(self._jobs, len(files))
+        if jobs <= 1:
+            return [parse(impl) for impl in files]
+
+        profiler = profiling.active()
+        if profiler is not None:
+            parse = functools.partial(profiling.collect, parse)
+
+        import multiprocessing
+
+        logger.info('Parse {} models using {} jobs'.format(len(files), jobs))
+        pool = multiprocessing.Pool(jobs)
+        try:
+            # use a timeout, otherwise python 2 can not
+            # interrupt the pool with Ctrl-C
+            models = pool.map_async(parse, files).get(0xffff)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        if profiler is not None:
+            for (_, events) in models:
+                profiler.extend(events)
+            models = [model for (model, _) in models]
+
+        return models
+
+    @profiling.profiled('extend', 'phase')
+    def extend(self, compiler=True, gem5=True, steps=None, force_gem5=False):
+        '''
+        Extend the riscv compiler and the gem5 simulator.
+        The generation steps of both backends are run by one scheduler,
+        so independent steps run concurrently, if more than one job
+        is allowed. If steps is given, only these steps and the steps they
+        depend on are run. If force_gem5 is set, the gem5 files are
+        generated, even if they are up to date. Returns the names of the
+        steps, that were run.
+        Backends, that are not up to date, are restored first, if a
+        directory of models is generated. The locks are held from the
+        restore until the new extension set is recorded.
+        '''
+        if self._dryrun:
+            logger.info('Dry run, nothing is extended')
+            return []
+
+        # the locks are always taken in the same order
+        locks = []
+        if compiler:
+            locks.append(self._tclock)
+        if gem5:
+            locks.append(self._buildlock)
+        for lock in locks:
+            lock.acquire()
+        try:
+            backends = []
+            stale = []
+            if compiler:
+                if self.applied('compiler'):
+                    logger.info('Toolchain is up to date')
+                else:
+                    backends.append(('compiler', self.compiler))
+                    stale.append('compiler')
+            if gem5:
+                if self.applied('gem5'):
+                    logger.info('Gem5 extension is up to date')
+                else:
+                    stale.append('gem5')
+                if force_gem5 or 'gem5' in stale:
+                    backends.append(('gem5', self.decoder))
+            if not backends:
+                return []
+
+            # only the backends, that are not up to date, are restored,
+            # the others keep their files and timestamps
+            if stale and steps is None and os.path.isdir(self._modelpath):
+                self.restore('compiler' in stale, 'gem5' in stale)
+            if gem5:
+                makedirs(self._buildpath)
+
+            scheduler = Scheduler(self._jobs)
+            for (_, backend) in backends:
+                backend.schedule(scheduler)
+            if steps is not None:
+                scheduler.select(steps)
+
+            start = time.time()
+            try:
+                scheduler.run()
+            finally:
+                self._timings.extend(scheduler.timings)
+                self._timings.append(('extend', time.time() - start))
+
+            for (name, _) in backends:
+                self.record(name)
+            return [task.name for task in scheduler.tasks]
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
     def extend_compiler(self):
         '''
         Extend the riscv compiler.
         '''
-        self._compiler.extend_compiler()
+        self.extend(gem5=False)
 
     def extend_gem5(self):
         '''
         Extend the gem5 simulator.
         '''
-        self._gem5.extend_gem5()
+        self.extend(compiler=False)
+
+    @property
+    def added(self):
+        return self._added
+
+    @property
+    def allocator(self):
+        return self._allocator
 
     @property
     def args(self):
         return self._args
 
+    @property
+    def buildpath(self):
+        return self._buildpath
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def catalog(self):
+        return self._catalog
+
     @property
     def compiler(self):
+        if self._compiler is None:
+            self._compiler = Compiler(self._exts, self._regs, self._tcpath)
         return self._compiler
 
     @property
     def decoder(self):
+        if self._gem5 is None:
+            self._gem5 = Gem5(self._exts, self._regs, self._isacache,
+                              self._buildpath, self._gem5path)
         return self._gem5
 
+    @property
+    def dryrun(self):
+        return self._dryrun
+
     @property
     def extensions(self):
         return self._exts
 
+    @property
+    def fast(self):
+        return self._fast
+
+    @property
+    def files(self):
+        return self._files
+
+    @property
+    def fingerprint(self):
+        return self._fingerprint
+
+    @property
+    def gem5path(self):
+        return self._gem5path
+
+    @property
+    def isacache(self):
+        return self._isacache
+
+    @property
+    def jobs(self):
+        return self._jobs
+
+    @property
+    def lowmem(self):
+        return self._lowmem
+
+    @property
+    def modelpath(self):
+        return self._modelpath
+
     @property
     def models(self):
         return self._models
@@ -151,3 +675,11 @@ class Parser:
     @property
     def regs(self):
         return self._regs
+
+    @property
+    def tcpath(self):
+        return self._tcpath
+
+    @property
+    def timings(self):
+        return self._timings
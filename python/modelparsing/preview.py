@@ -0,0 +1,143 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import difflib
+import logging
+import os
+
+from compiler import OPCC
+from compiler import OPCH_CUST
+from compiler import find_stdlibs
+from compiler import intrinsics
+from compiler import opcode_block
+from compiler import original_source
+from compiler import splice
+from gem5 import DECODER
+from gem5 import REGSINTR
+from gem5 import TIMINGS
+from gem5 import custom_decoder
+from gem5 import fu_timings
+from gem5 import regs_intrinsics
+
+logger = logging.getLogger(__name__)
+
+
+class Artifact(object):
+    '''
+    A generated file, that is rendered in memory.
+    The path is None, if the location of the file is not known, because
+    the toolchain is not available.
+    '''
+
+    def __init__(self, name, path, content):
+        self.name = name
+        self.path = path
+        self.content = content
+
+    def diff(self):
+        '''
+        Return the unified diff of the file on disk to the content.
+        '''
+        old = []
+        if os.path.isfile(self.path):
+            with open(self.path, 'r') as fh:
+                old = fh.readlines()
+        return ''.join(difflib.unified_diff(
+            old, self.content.splitlines(True),
+            'a/' + self.path.lstrip('/'), 'b/' + self.path.lstrip('/')))
+
+
+def artifacts(exts, regs, tcpath, buildpath, allocator=None):
+    '''
+    Render all files, that the backends would generate.
+    Nothing is written.
+    '''
+    files = []
+
+    # the record is only written, if encodings were assigned
+    if allocator is not None and allocator.record and (
+            allocator.assigned or os.path.isfile(allocator.record)):
+        files.append(Artifact('encodings.json', allocator.record,
+                              allocator.dump()))
+
+    # toolchain
+    opcc = os.path.abspath(os.path.join(tcpath, OPCC))
+    available = os.path.isfile(opcc)
+    if not available:
+        logger.warn('Toolchain not found in {}'.format(tcpath))
+
+    files.append(Artifact(
+        'riscv-custom-opc.h',
+        os.path.abspath(os.path.join(tcpath, OPCH_CUST))
+        if available else None,
+        exts.cust_header))
+
+    if available:
+        original = original_source(opcc)
+        block = opcode_block(exts.instructions, original)
+        files.append(Artifact('riscv-opc.c', opcc,
+                              ''.join(splice(original, block))))
+    else:
+        block = opcode_block(exts.instructions, [])
+        files.append(Artifact('riscv-opc.c', None, ''.join(block)))
+
+    stdlibs = find_stdlibs(tcpath)
+    files.append(Artifact(
+        'riscvintr.h',
+        os.path.join(stdlibs, 'riscvintr.h') if stdlibs else None,
+        intrinsics(regs.regmap, exts.instructions)))
+
+    # gem5
+    files.append(Artifact('custom.isa', os.path.join(buildpath, DECODER),
+                          custom_decoder(exts.models)))
+    files.append(Artifact('regsintr.hh', os.path.join(buildpath, REGSINTR),
+                          regs_intrinsics(regs.regmap)))
+    files.append(Artifact('minor_custom_timings.py',
+                          os.path.join(buildpath, TIMINGS),
+                          fu_timings(exts.instructions)))
+
+    return files
+
+
+def compare(files):
+    '''
+    Compare the rendered files with the files on disk.
+    Returns the unified diff and the names of the files, that differ.
+    Files without a known location are skipped.
+    '''
+    diffs = []
+    changed = []
+    for artifact in files:
+        if artifact.path is None:
+            logger.info('{} is not compared'.format(artifact.name))
+            continue
+        diff = artifact.diff()
+        if diff:
+            changed.append(artifact.name)
+            diffs.append(diff)
+    return (''.join(diffs), changed)
@@ -0,0 +1,313 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import resource
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# profiler, that records the spans, None if profiling is off
+_active = None
+
+
+def enable(profiler):
+    '''
+    Record all spans with profiler.
+    '''
+    global _active
+    _active = profiler
+
+
+def disable():
+    '''
+    Stop recording spans.
+    '''
+    global _active
+    _active = None
+
+
+def active():
+    '''
+    Return the profiler, that records the spans, or None.
+    '''
+    return _active
+
+
+def clock():
+    '''
+    Return the wall time, the cpu time of this process and the cpu time
+    of its finished child processes in seconds.
+    '''
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (time.time(), usage.ru_utime + usage.ru_stime,
+            children.ru_utime + children.ru_stime)
+
+
+class Span(object):
+    '''
+    Context manager, that records the enclosed code as event.
+    '''
+
+    def __init__(self, profiler, name, cat):
+        self._profiler = profiler
+        self._name = name
+        self._cat = cat
+        self._start = None
+        self.wall = None
+
+    def __enter__(self):
+        self._start = clock()
+        return self
+
+    def __exit__(self, *exc):
+        end = clock()
+        self.wall = end[0] - self._start[0]
+        # the cpu time is process wide, spans of other threads would be
+        # charged the cpu time of the threads running in parallel
+        thread = threading.current_thread()
+        main = isinstance(thread, threading._MainThread)
+        self._profiler.add({'name': self._name,
+                            'cat': self._cat,
+                            'pid': os.getpid(),
+                            'tid': thread.ident,
+                            'start': self._start[0],
+                            'wall': self.wall,
+                            'cpu': end[1] - self._start[1] if main else None,
+                            'children': (end[2] - self._start[2]
+                                         if main else None)})
+
+
+class PhaseSpan(Span):
+    '''
+    Span, that profiles the enclosed code with cProfile.
+    '''
+
+    def __enter__(self):
+        self._profiler._profiling = True
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return Span.__enter__(self)
+
+    def __exit__(self, *exc):
+        Span.__exit__(self, *exc)
+        self._profile.disable()
+        self._profiler._profiling = False
+        self._profiler.keep(self._name, self.wall, self._profile)
+
+
+class NoSpan(object):
+    '''
+    Context manager, that is used, if profiling is off.
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_nospan = NoSpan()
+
+
+def span(name, cat):
+    '''
+    Return a context manager, that records the enclosed code as span
+    name of category cat, if profiling is on.
+    '''
+    if _active is None:
+        return _nospan
+    return _active.span(name, cat)
+
+
+def profiled(name, cat):
+    '''
+    Decorator, that records every call of a function as span.
+    '''
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def collect(func, *args):
+    '''
+    Call func in a worker process and return its result together with the
+    recorded events, so they can be added to the profiler of the parent.
+    '''
+    profiler = Profiler()
+    enable(profiler)
+    try:
+        return func(*args), profiler.events
+    finally:
+        disable()
+
+
+class Profiler(object):
+    '''
+    Records the wall time, cpu time and cpu time of child processes of
+    spans. The cpu times are process wide, they are only recorded for
+    spans of the main thread. Spans of category phase are additionally
+    profiled with cProfile, if requested. Only the outermost phase of the
+    main thread is profiled and the statistics of the longest phase are
+    kept.
+    '''
+
+    def __init__(self, cprofile=False):
+        self._events = []
+        self._lock = threading.Lock()
+        self._cprofile = cprofile
+        self._profiling = False
+        # (wall time, name, profile) of the longest phase
+        self._hottest = None
+
+    def span(self, name, cat):
+        if (self._cprofile and cat == 'phase' and not self._profiling and
+                isinstance(threading.current_thread(), threading._MainThread)):
+            return PhaseSpan(self, name, cat)
+        return Span(self, name, cat)
+
+    def add(self, event):
+        '''
+        Add an event, that was recorded by a span.
+        '''
+        with self._lock:
+            self._events.append(event)
+
+    def extend(self, events):
+        '''
+        Add the events, that were recorded by a worker process.
+        '''
+        with self._lock:
+            self._events.extend(events)
+
+    def keep(self, name, wall, profile):
+        '''
+        Keep the cProfile statistics of a phase, if it is the longest.
+        '''
+        if self._hottest is None or wall > self._hottest[0]:
+            self._hottest = (wall, name, profile)
+
+    def trace(self):
+        '''
+        Return the events in the chrome trace event format.
+        '''
+        with self._lock:
+            events = sorted(self._events, key=lambda event: event['start'])
+        origin = events[0]['start'] if events else 0
+        trace = []
+        for event in events:
+            trace.append({'name': event['name'],
+                          'cat': event['cat'],
+                          'ph': 'X',
+                          'ts': int((event['start'] - origin) * 1e6),
+                          'dur': int(event['wall'] * 1e6),
+                          'pid': event['pid'],
+                          'tid': event['tid'],
+                          'args': {} if event['cpu'] is None else
+                          {'cpu_ms': event['cpu'] * 1000,
+                           'children_ms': event['children'] * 1000}})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def summary(self):
+        '''
+        Return a table of the spans, sorted by their total wall time.
+        Spans with the same name and category are added up. The cpu time
+        covers all threads of the process, it is only added up for spans
+        of the main thread and left empty, if there are none.
+        '''
+        with self._lock:
+            events = list(self._events)
+
+        totals = {}
+        for event in events:
+            for key in ((event['cat'], '*'), (event['cat'], event['name'])):
+                total = totals.setdefault(key, [0, 0., None, None])
+                total[0] += 1
+                total[1] += event['wall']
+                if event['cpu'] is not None:
+                    total[2] = (total[2] or 0.) + event['cpu']
+                    total[3] = (total[3] or 0.) + event['children']
+
+        row = '{:<10} {:<40} {:>7} {:>11} {:>11} {:>11}\n'
+        table = row.format('category', 'name', 'count', 'wall ms',
+                           'proc cpu ms', 'child ms')
+        for (cat, name), total in sorted(totals.items(),
+                                         key=lambda item: (item[0][1] != '*',
+                                                           -item[1][1])):
+            if len(name) > 40:
+                name = '...' + name[-37:]
+            table += row.format(cat, name, total[0],
+                                '{:.2f}'.format(total[1] * 1000),
+                                *['-' if value is None else
+                                  '{:.2f}'.format(value * 1000)
+                                  for value in total[2:]])
+        return table
+
+    def save(self, path):
+        '''
+        Write the trace to path and the summary next to it. If phases were
+        profiled with cProfile, the statistics of the longest phase are
+        written as well. Returns the written files.
+        '''
+        base = os.path.splitext(path)[0]
+        with open(path, 'w') as fh:
+            json.dump(self.trace(), fh)
+        files = [path]
+
+        with open(base + '.txt', 'w') as fh:
+            fh.write(self.summary())
+        files.append(base + '.txt')
+
+        if self._hottest is not None:
+            (_, name, profile) = self._hottest
+            profile.dump_stats(base + '.prof')
+            logger.info('cProfile statistics of phase {}'.format(name))
+            files.append(base + '.prof')
+
+        logger.info('Profile written to {}'.format(', '.join(files)))
+        return files
+
+    @property
+    def events(self):
+        return self._events
+
+    @property
+    def hottest(self):
+        return None if self._hottest is None else self._hottest[1]
+
@@ -0,0 +1,174 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# tokens of the c++ subset, that is used by conforming models
+_tokens = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<directive>\#[^\n]*)
+  | (?P<literal>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<number>0[xX][0-9a-fA-F]+|[0-9]+)[uUlL]*
+  | (?P<ident>[A-Za-z_]\w*)
+  | (?P<punct>.)
+''', re.S | re.X)
+
+# global variables that hold information about the instruction
+_fields = ('cycles', 'opc', 'funct3', 'funct7')
+
+
+def tokenize(source):
+    '''
+    Split source into (kind, spelling, offset) tuples.
+    Whitespace, comments and preprocessor directives are dropped.
+    '''
+    tokens = []
+    for match in _tokens.finditer(source):
+        kind = match.lastgroup
+        if kind in ('space', 'comment', 'directive'):
+            continue
+        tokens.append((kind, match.group(kind), match.start()))
+    return tokens
+
+
+def scan_model(impl):
+    '''
+    Extract the information of a model without libclang.
+    Only models that follow the layout of the example models are
+    understood: uint8_t globals for cycles, opc, funct3 and funct7,
+    followed by one void function taking Rd, Rs1 and Rs2 or imm.
+    The function body is not checked for errors.
+    Returns a dictionary like Model.to_dict with the span of the
+    definition or None, if the model does not match the expected layout.
+    '''
+    with open(impl, 'r') as fh:
+        source = fh.read()
+
+    try:
+        fields = _scan(source, tokenize(source))
+    except IndexError:
+        # unexpected end of file
+        fields = None
+
+    if fields is None:
+        logger.info('Model {} does not match the expected layout'.format(
+            impl))
+    return fields
+
+
+def _scan(source, tokens):
+    values = {'cycles': 1, 'opc': None, 'funct3': None, 'funct7': None}
+    seen = set()
+    pos = 0
+
+    # uint8_t name = value;
+    while tokens[pos][1] == 'uint8_t':
+        name = tokens[pos + 1][1]
+        if name not in _fields or name in seen:
+            return None
+        if tokens[pos + 2][1] != '=' or tokens[pos + 3][0] != 'number':
+            return None
+        if tokens[pos + 4][1] != ';':
+            return None
+        values[name] = int(tokens[pos + 3][1], 0)
+        seen.add(name)
+        pos += 5
+
+    # void name(type Rd, type Rs1, type Rs2/imm)
+    if tokens[pos][1] != 'void' or tokens[pos + 1][0] != 'ident':
+        return None
+    name = tokens[pos + 1][1]
+    if tokens[pos + 2][1] != '(':
+        return None
+    pos += 3
+
+    params = []
+    decl = []
+    while True:
+        (kind, spelling, _) = tokens[pos]
+        pos += 1
+        if kind == 'ident':
+            decl.append(spelling)
+        elif spelling in (',', ')') and len(decl) >= 2:
+            params.append(decl[-1])
+            decl = []
+            if spelling == ')':
+                break
+        else:
+            return None
+
+    if len(params) != 3:
+        return None
+    if not params[0].startswith('Rd') or not params[1].startswith('Rs1'):
+        return None
+    if params[2].startswith('Rs2'):
+        form = 'R'
+    elif params[2].startswith('imm'):
+        form = 'I'
+    else:
+        return None
+
+    # { definition }
+    if tokens[pos][1] != '{':
+        return None
+    start = tokens[pos][2]
+    depth = 0
+    while True:
+        spelling = tokens[pos][1]
+        pos += 1
+        if spelling == 'return' and tokens[pos][1] != ';':
+            # returning a value is an error libclang has to report
+            return None
+        if spelling == '{':
+            depth += 1
+        elif spelling == '}':
+            depth -= 1
+            if depth == 0:
+                end = tokens[pos - 1][2] + 1
+                break
+
+    # nothing may follow the function
+    if pos != len(tokens):
+        return None
+
+    return {'cycles': values['cycles'],
+            'definition': source[start:end],
+            'form': form,
+            'funct3': values['funct3'],
+            'funct7': values['funct7'],
+            'name': name,
+            'opc': values['opc'],
+            'check_rd': True,
+            'check_rs1': True,
+            'check_op2': True,
+            'rettype': 'void',
+            'span': (start, end)}
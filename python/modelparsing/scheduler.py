@@ -0,0 +1,207 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import logging
+import sys
+import threading
+import time
+
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+
+class Task(object):
+    '''
+    A single generation step with the names of the tasks it depends on.
+    '''
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.duration = None
+
+    def run(self):
+        logger.info('Start task {}'.format(self.name))
+        start = time.time()
+        try:
+            with span(self.name, 'task'):
+                self.func()
+        finally:
+            self.duration = time.time() - start
+        logger.info('Finished task {} in {:.3f}s'.format(self.name,
+                                                         self.duration))
+
+
+class Scheduler:
+    '''
+    Runs generation tasks in a pool of threads.
+    A task is started, once all of its dependencies finished.
+    Tasks can only depend on tasks, that were added before them, so the
+    order in which the tasks were added is always a valid sequential order.
+    '''
+
+    def __init__(self, jobs=1):
+        self._jobs = max(1, jobs)
+        self._tasks = []
+        self._names = {}
+
+    def add(self, name, func, deps=()):
+        '''
+        Add the task name, that calls func once all deps finished.
+        '''
+        if name in self._names:
+            raise ValueError('Task {} was already added'.format(name))
+        for dep in deps:
+            if dep not in self._names:
+                raise ValueError(
+                    'Task {} depends on unknown task {}'.format(name, dep))
+
+        task = Task(name, func, deps)
+        self._names[name] = task
+        self._tasks.append(task)
+        return task
+
+    def select(self, names):
+        '''
+        Only keep the tasks names and the tasks they depend on.
+        '''
+        keep = set(names)
+        for task in reversed(self._tasks):
+            if task.name in keep:
+                keep.update(task.deps)
+        self._tasks = [task for task in self._tasks if task.name in keep]
+        self._names = dict((task.name, task) for task in self._tasks)
+
+    def run(self):
+        '''
+        Run all tasks and return their timings.
+        If a task fails, the tasks depending on it are skipped, all other
+        tasks are finished and the first error is raised again.
+        '''
+        if self._jobs == 1 or len(self._tasks) <= 1:
+            self.run_sequential()
+        else:
+            self.run_threaded()
+        return self.timings
+
+    def run_sequential(self):
+        failed = set()
+        errors = []
+        for task in self._tasks:
+            if failed.intersection(task.deps):
+                logger.info('Skip task {}'.format(task.name))
+                failed.add(task.name)
+                continue
+            try:
+                task.run()
+            except Exception:
+                logger.error('Task {} failed'.format(task.name))
+                errors.append(sys.exc_info())
+                failed.add(task.name)
+
+        if errors:
+            (exctype, value, traceback) = errors[0]
+            raise exctype, value, traceback
+
+    def run_threaded(self):
+        cond = threading.Condition()
+        done = set()
+        failed = set()
+        errors = []
+        pending = list(self._tasks)
+        running = [0]
+
+        def worker(task):
+            try:
+                task.run()
+            except Exception:
+                logger.error('Task {} failed'.format(task.name))
+                with cond:
+                    errors.append(sys.exc_info())
+                    failed.add(task.name)
+            with cond:
+                done.add(task.name)
+                running[0] -= 1
+                cond.notify()
+
+        logger.info('Run {} tasks using {} jobs'.format(len(pending),
+                                                        self._jobs))
+        with cond:
+            while True:
+                # dependents of failed tasks are never started, tasks
+                # only depend on earlier tasks, so one pass finds all
+                for task in list(pending):
+                    if failed.intersection(task.deps):
+                        logger.info('Skip task {}'.format(task.name))
+                        failed.add(task.name)
+                        pending.remove(task)
+                ready = [task for task in pending
+                         if done.issuperset(task.deps)]
+                for task in ready[:self._jobs - running[0]]:
+                    pending.remove(task)
+                    running[0] += 1
+                    thread = threading.Thread(target=worker, args=(task,),
+                                              name=task.name)
+                    thread.daemon = True
+                    thread.start()
+                if not running[0]:
+                    break
+                # use a timeout, otherwise python 2 can not
+                # interrupt the wait with Ctrl-C
+                cond.wait(0xffff)
+
+        if errors:
+            (exctype, value, traceback) = errors[0]
+            raise exctype, value, traceback
+
+    @property
+    def jobs(self):
+        return self._jobs
+
+    @property
+    def tasks(self):
+        return self._tasks
+
+    @property
+    def timings(self):
+        return [(task.name, task.duration) for task in self._tasks
+                if task.duration is not None]
+
+
+def summary(timings):
+    '''
+    Format the phase timings as a table.
+    '''
+    if not timings:
+        return ''
+    width = max(len(name) for (name, _) in timings)
+    lines = ['{}  {:8.3f}s'.format(name.ljust(width), duration)
+             for (name, duration) in timings]
+    return '\n'.join(lines) + '\n'
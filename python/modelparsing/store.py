@@ -0,0 +1,240 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import BaseHTTPServer
+import logging
+import os
+import re
+import SocketServer
+import tempfile
+import urllib2
+
+from fileutils import makedirs
+
+logger = logging.getLogger(__name__)
+
+# seconds to wait for a remote store
+TIMEOUT = 10
+
+# keys are relative paths like models/<sha1>
+_keyprog = re.compile(r'^[\w.-]+(/[\w.-]+)*$')
+
+
+def check_key(key):
+    '''
+    Check, that key can be used as a relative path.
+    '''
+    if not _keyprog.match(key) or '..' in key.split('/'):
+        raise ValueError('Invalid store key {}'.format(key))
+
+
+class LocalStore(object):
+    '''
+    Artifact store in a directory, e.g. on a shared file system.
+    '''
+
+    def __init__(self, path):
+        self._path = path
+
+    def get(self, key):
+        '''
+        Return the data stored as key or None.
+        '''
+        check_key(key)
+        try:
+            with open(os.path.join(self._path, key), 'rb') as fh:
+                return fh.read()
+        except IOError:
+            return None
+
+    def put(self, key, data):
+        '''
+        Store data as key.
+        '''
+        check_key(key)
+        file = os.path.join(self._path, key)
+        makedirs(os.path.dirname(file))
+
+        # write to a temporary file first, so that
+        # concurrent readers never see partial entries
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(file),
+                                   prefix='.' + os.path.basename(file))
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.rename(tmp, file)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    @property
+    def path(self):
+        return self._path
+
+
+class HttpStore(object):
+    '''
+    Artifact store on a server, that speaks a minimal protocol:
+    GET <url>/<key> returns the data or 404, PUT <url>/<key> stores it.
+    The store is only an optimization, so errors are logged and after
+    the first connection error the server is not asked again.
+    '''
+
+    def __init__(self, url, timeout=TIMEOUT):
+        self._url = url.rstrip('/')
+        self._timeout = timeout
+        self._available = True
+
+    def get(self, key):
+        '''
+        Return the data stored as key or None.
+        '''
+        check_key(key)
+        if not self._available:
+            return None
+        try:
+            response = urllib2.urlopen(self._url + '/' + key,
+                                       timeout=self._timeout)
+            try:
+                return response.read()
+            finally:
+                response.close()
+        except urllib2.HTTPError as e:
+            if e.code != 404:
+                logger.warn('Store {} failed to get {}: {}'.format(
+                    self._url, key, e))
+        except Exception as e:
+            self.disable(e)
+        return None
+
+    def put(self, key, data):
+        '''
+        Store data as key.
+        '''
+        check_key(key)
+        if not self._available:
+            return
+        request = urllib2.Request(self._url + '/' + key, data,
+                                  {'Content-Type':
+                                   'application/octet-stream'})
+        request.get_method = lambda: 'PUT'
+        try:
+            urllib2.urlopen(request, timeout=self._timeout).close()
+        except urllib2.HTTPError as e:
+            logger.warn('Store {} failed to put {}: {}'.format(
+                self._url, key, e))
+        except Exception as e:
+            self.disable(e)
+
+    def disable(self, error):
+        logger.warn('Store {} is not available: {}'.format(self._url, error))
+        self._available = False
+
+    @property
+    def available(self):
+        return self._available
+
+    @property
+    def url(self):
+        return self._url
+
+
+def open_store(location):
+    '''
+    Return the store for location, either a http(s) url or a directory.
+    '''
+    if location.startswith(('http://', 'https://')):
+        return HttpStore(location)
+    if location.startswith('file://'):
+        location = location[len('file://'):]
+    return LocalStore(os.path.expanduser(location))
+
+
+class StoreHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''
+    Serves a LocalStore with the protocol of HttpStore.
+    '''
+
+    def do_GET(self):
+        data = self.lookup()
+        if data is None:
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_HEAD(self):
+        data = self.lookup()
+        if data is None:
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+
+    def do_PUT(self):
+        length = int(self.headers.getheader('Content-Length', 0))
+        data = self.rfile.read(length)
+        try:
+            self.server.store.put(self.path.lstrip('/'), data)
+        except ValueError:
+            self.send_error(400)
+            return
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def lookup(self):
+        try:
+            data = self.server.store.get(self.path.lstrip('/'))
+        except ValueError:
+            self.send_error(400)
+            return None
+        if data is None:
+            self.send_error(404)
+        return data
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class StoreServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    '''
+    Reference server for HttpStore, backed by a directory.
+    '''
+    daemon_threads = True
+
+    def __init__(self, path, address=('', 0)):
+        BaseHTTPServer.HTTPServer.__init__(self, address, StoreHandler)
+        self.store = LocalStore(path)
+
+    @property
+    def url(self):
+        (host, port) = self.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
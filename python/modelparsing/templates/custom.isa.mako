@@ -0,0 +1,71 @@
+## Copyright (c) 2018 TU Dresden
+## All rights reserved.
+##
+## Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met: redistributions of source code must retain the above copyright
+## notice, this list of conditions and the following disclaimer;
+## redistributions in binary form must reproduce the above copyright
+## notice, this list of conditions and the following disclaimer in the
+## documentation and/or other materials provided with the distribution;
+## neither the name of the copyright holders nor the names of its
+## contributors may be used to endorse or promote products derived from
+## this software without specific prior written permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+## Authors: Robert Scheffel
+<%
+dfn = {}
+for model in models:
+    if model.opc in dfn:
+        dfn[model.opc].append(model)
+    else:
+        dfn[model.opc] = [model]
+for opc, mdls in dfn.items():
+    funct3 = {}
+    for mdl in mdls:
+        if mdl.form == 'I':
+            funct3[mdl.funct3] = mdl
+        else:
+            if mdl.funct3 in funct3:
+                funct3[mdl.funct3].append(mdl)
+            else:
+                funct3[mdl.funct3] = [mdl]
+    dfn[opc] = funct3
+%>\
+// === AUTO GENERATED FILE ===
+
+% if dfn.items():
+decode OPCODE default Unknown::unknown() {
+% for opc, funct3_dict in sorted(dfn.items()):
+${hex(opc)}: decode FUNCT3 {
+% for funct3, val in sorted(funct3_dict.items()):
+% if type(val) != list:
+${hex(funct3)}: I32Op::${val.name}({${val.definition}}, uint32_t, IntCustOp);
+% else:
+${hex(funct3)}: decode FUNCT7 {
+% for mdl in sorted(val, key=lambda mdl: mdl.funct7):
+${hex(mdl.funct7)}: R32Op::${mdl.name}({${mdl.definition}}, IntCustOp);
+% endfor
+}
+% endif
+% endfor
+}
+% endfor
+}
+% else:
+decode OPCODE {
+default: Unknown::unknown();
+}
+% endif
@@ -0,0 +1,49 @@
+## Copyright (c) 2018 TU Dresden
+## All rights reserved.
+##
+## Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met: redistributions of source code must retain the above copyright
+## notice, this list of conditions and the following disclaimer;
+## redistributions in binary form must reproduce the above copyright
+## notice, this list of conditions and the following disclaimer in the
+## documentation and/or other materials provided with the distribution;
+## neither the name of the copyright holders nor the names of its
+## contributors may be used to endorse or promote products derived from
+## this software without specific prior written permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+## Authors: Robert Scheffel
+<%
+%>\
+# === AUTO GENERATED FILE ===
+
+from m5.objects import *
+% for inst in insts:
+
+
+class MinorFUTiming${inst.name.title()}(MinorFUTiming):
+    description = 'Custom${inst.name.title()}'
+    match = ${hex(inst.matchvalue)}
+    mask = ${hex(inst.maskvalue)}
+    srcRegsRelativeLats = [2]
+    extraCommitLat = ${inst.cycles - 1}
+% endfor
+
+
+custom_timings = [
+% for inst in insts:
+    MinorFUTiming${inst.name.title()}(),
+% endfor
+]
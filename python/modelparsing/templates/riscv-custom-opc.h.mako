@@ -0,0 +1,57 @@
+## Copyright (c) 2018 TU Dresden
+## All rights reserved.
+##
+## Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met: redistributions of source code must retain the above copyright
+## notice, this list of conditions and the following disclaimer;
+## redistributions in binary form must reproduce the above copyright
+## notice, this list of conditions and the following disclaimer in the
+## documentation and/or other materials provided with the distribution;
+## neither the name of the copyright holders nor the names of its
+## contributors may be used to endorse or promote products derived from
+## this software without specific prior written permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+## Authors: Robert Scheffel
+<%
+%>\
+/* Automatically generated by parse-opcodes.  */
+#ifndef RISCV_CUSTOM_ENCODING_H
+#define RISCV_CUSTOM_ENCODING_H
+% for inst in insts:
+${inst.match}${inst.mask}\
+% endfor
+% for num, name in csrs:
+#define CSR_${name.upper()} ${hex(num)}
+% endfor
+% for num, name in causes:
+#define CAUSE_${name.upper().replace(' ', '_')} ${hex(num)}
+% endfor
+#endif
+#ifdef DECLARE_INSN
+% for inst in insts:
+DECLARE_INSN(${inst.name}, ${inst.matchname}, ${inst.maskname})
+% endfor
+#endif
+#ifdef DECLARE_CUSTOM_CSR
+% for num, name in csrs:
+DECLARE_CUSTOM_CSR(${name}, CSR_${name.upper()})
+% endfor
+#endif
+#ifdef DECLARE_CUSTOM_CAUSE
+% for num, name in causes:
+DECLARE_CUSTOM_CAUSE("${name}", CAUSE_${name.upper().replace(' ', '_')})
+% endfor
+#endif
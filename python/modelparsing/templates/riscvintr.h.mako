@@ -0,0 +1,83 @@
+## Copyright (c) 2018 TU Dresden
+## All rights reserved.
+##
+## Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met: redistributions of source code must retain the above copyright
+## notice, this list of conditions and the following disclaimer;
+## redistributions in binary form must reproduce the above copyright
+## notice, this list of conditions and the following disclaimer in the
+## documentation and/or other materials provided with the distribution;
+## neither the name of the copyright holders nor the names of its
+## contributors may be used to endorse or promote products derived from
+## this software without specific prior written permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+## Authors: Robert Scheffel
+<%
+%>\
+// === AUTO GENERATED FILE ===
+
+#ifndef __RISCVINTR_H__
+#define __RISCVINTR_H__
+
+#include <stdint.h>
+
+% for reg, addr in sorted(regmap.items()):
+#define ${reg} ${hex(addr)}
+% endfor
+
+uint32_t READ_CUSTOM_REG(uint32_t reg)
+{
+    // uint32_t *val;
+    // val = (uint32_t *)reg;
+    // return *val;
+    uint32_t val;
+    __asm__ __volatile__(
+        "read_custreg %0, zero, %1"
+        : "=r" (val)
+        : "r" (reg)
+    );
+    return val;
+}
+
+void WRITE_CUSTOM_REG(uint32_t reg, uint32_t val)
+{
+    // uint32_t *addr = (uint32_t *)reg;
+    // *addr = val;
+    __asm__ __volatile__(
+        "write_custreg zero, %1, %0"
+        :
+        : "r" (reg), "r" (val)
+    );
+}
+
+// access methods for custom instructions
+% for inst in insts:
+% if inst.form is 'R':
+% if not inst.name in ('read_custreg', 'write_custreg'):
+
+void ${inst.name.upper()}(uint32_t* rd, uint32_t rs1, uint32_t rs2)
+{
+    __asm__ __volatile__(
+        "${inst.name} %0, %1, %2"
+        : "=r" (*rd)
+        : "r" (rs1), "r" (rs2)
+    );
+}
+% endif
+% endif
+% endfor
+
+#endif // __RISCVINTR_H__
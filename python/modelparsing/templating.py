@@ -0,0 +1,104 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import logging
+import os
+import threading
+
+from fileutils import write_stream_if_changed
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+# all templates used by the code generators
+templatepath = os.path.join(os.path.dirname(
+    os.path.realpath(__file__)), 'templates')
+
+# compiled templates are stored as python modules in this directory
+_module_directory = None
+_lookup = None
+_lookup_lock = threading.Lock()
+
+
+def set_module_directory(path):
+    '''
+    Set the directory, where the compiled templates are stored.
+    Compiled templates are reused, as long as the template did not change.
+    If path is None, the templates are compiled in memory on every run.
+    '''
+    global _module_directory
+    global _lookup
+    _module_directory = path
+    _lookup = None
+
+
+def get_template(name):
+    '''
+    Return the template name from the registry.
+    '''
+    global _lookup
+    with _lookup_lock:
+        if _lookup is None:
+            from mako.lookup import TemplateLookup
+            logger.debug('Template modules in {}'.format(_module_directory))
+            _lookup = TemplateLookup(directories=[templatepath],
+                                     module_directory=_module_directory)
+    return _lookup.get_template(name)
+
+
+def render(name, **kwargs):
+    '''
+    Render the template name with the given arguments.
+    '''
+    with span(name, 'render'):
+        return get_template(name).render(**kwargs)
+
+
+def render_file(path, name, **kwargs):
+    '''
+    Render the template name straight into the file path, the output is
+    never held in memory as a whole. Like write_if_changed, the file is
+    only replaced, if the content changed. Returns True, if it changed.
+    '''
+    from mako.runtime import Context
+
+    template = get_template(name)
+
+    def write(fh):
+        with span(name, 'render'):
+            template.render_context(Context(fh, **kwargs))
+
+    return write_stream_if_changed(path, write)
+
+
+def templates():
+    '''
+    Return the names of all templates in the registry.
+    '''
+    return sorted(file for file in os.listdir(templatepath)
+                  if file.endswith('.mako'))
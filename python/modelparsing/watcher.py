@@ -0,0 +1,132 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# seconds between two polls of the model directory
+INTERVAL = 0.5
+
+
+def snapshot(path):
+    '''
+    Return the modification time and size of all model and header files
+    below path.
+    '''
+    if not os.path.isdir(path):
+        files = [path]
+    else:
+        files = []
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            files.extend(os.path.join(dirpath, file)
+                         for file in sorted(filenames)
+                         if file.endswith(('.cc', '.hh')))
+
+    state = {}
+    for file in files:
+        try:
+            stat = os.stat(file)
+        except OSError:
+            continue
+        state[file] = (stat.st_mtime, stat.st_size)
+    return state
+
+
+class Watcher:
+    '''
+    Watches the models below a path for changes.
+    Inotify is used to wait for changes, if pyinotify is installed.
+    Otherwise the directory is polled.
+    '''
+
+    def __init__(self, path, interval=INTERVAL):
+        self._path = path
+        self._interval = interval
+        self._snapshot = snapshot(path)
+        self._notifier = None
+
+        try:
+            import pyinotify
+        except ImportError:
+            logger.info('pyinotify not available, poll {}'.format(path))
+        else:
+            manager = pyinotify.WatchManager()
+            mask = (pyinotify.IN_CLOSE_WRITE | pyinotify.IN_CREATE |
+                    pyinotify.IN_DELETE | pyinotify.IN_MOVED_FROM |
+                    pyinotify.IN_MOVED_TO)
+            watched = path if os.path.isdir(path) else os.path.dirname(path)
+            manager.add_watch(watched, mask, rec=True, auto_add=True)
+            self._notifier = pyinotify.Notifier(manager)
+            logger.info('Watch {} using inotify'.format(path))
+
+    def poll(self):
+        '''
+        Return the files, that changed or were added, and the files, that
+        were removed since the last call.
+        '''
+        state = snapshot(self._path)
+        changed = sorted(file for file in state
+                         if self._snapshot.get(file) != state[file])
+        removed = sorted(file for file in self._snapshot
+                         if file not in state)
+        self._snapshot = state
+        return (changed, removed)
+
+    def wait(self, timeout=None):
+        '''
+        Block until files changed and return them like poll.
+        Returns empty lists, if nothing changed within timeout seconds.
+        '''
+        start = time.time()
+        while True:
+            if self._notifier is not None:
+                if self._notifier.check_events(int(self._interval * 1000)):
+                    self._notifier.read_events()
+                    self._notifier.process_events()
+                    # editors write files in several steps
+                    time.sleep(self._interval / 4)
+            else:
+                time.sleep(self._interval)
+
+            (changed, removed) = self.poll()
+            if changed or removed:
+                return (changed, removed)
+            if timeout is not None and time.time() - start >= timeout:
+                return ([], [])
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def path(self):
+        return self._path
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import argparse
+import logging
+import os
+
+from modelparsing.store import StoreServer
+
+
+def main():
+    '''
+    Serve a directory as shared cache for the modelparser.
+    '''
+    parser = argparse.ArgumentParser(
+        prog='storeserver',
+        description='Share parsed models and generated decoder files ' +
+        'between machines.')
+
+    parser.add_argument('-d',
+                        '--directory',
+                        type=str,
+                        default=os.path.join(
+                            os.path.expanduser('~'),
+                            '.cache/riscv-custom-extension/store'),
+                        help='Directory, where the entries are stored.')
+    parser.add_argument('-b',
+                        '--bind',
+                        type=str,
+                        default='',
+                        help='Address to listen on.')
+    parser.add_argument('-p',
+                        '--port',
+                        type=int,
+                        default=8090,
+                        help='Port to listen on.')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    server = StoreServer(args.directory, (args.bind, args.port))
+    logging.info('Serving {} on {}'.format(args.directory, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -28,13 +28,27 @@
 #
 # Authors: Robert Scheffel
 
+from testcases import allocator_ut
+from testcases import cache_ut
+from testcases import catalog_ut
 from testcases import compiler_ut
+from testcases import encoding_ut
+from testcases import family_ut
+from testcases import fileutils_ut
 from testcases import gem5_ut
 from testcases import extensions_ut
 from testcases import instruction_ut
+from testcases import isacache_ut
 from testcases import model_ut
 from testcases import parser_ut
+from testcases import preview_ut
+from testcases import profiling_ut
 from testcases import registers_ut
+from testcases import scanner_ut
+from testcases import scheduler_ut
+from testcases import store_ut
+from testcases import templating_ut
+from testcases import watcher_ut
 
 import unittest
 
@@ -42,20 +56,48 @@ import unittest
 if __name__ == '__main__':
     # load test cases
     suiteList = []
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        allocator_ut.TestAllocator))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        cache_ut.TestCache))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        catalog_ut.TestCatalog))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         compiler_ut.TestCompiler))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        encoding_ut.TestEncoding))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        family_ut.TestFamily))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        fileutils_ut.TestFileutils))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         gem5_ut.TestGem5))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         extensions_ut.TestExtensions))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         instruction_ut.TestInstruction))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        isacache_ut.TestIsaCache))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         model_ut.TestModel))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         parser_ut.TestParser))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        preview_ut.TestPreview))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        profiling_ut.TestProfiling))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         registers_ut.TestRegisters))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        scanner_ut.TestScanner))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        scheduler_ut.TestScheduler))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        store_ut.TestStore))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        templating_ut.TestTemplating))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        watcher_ut.TestWatcher))
 
     # join them and run
     suite = unittest.TestSuite(suiteList)
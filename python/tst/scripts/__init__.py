@@ -30,3 +30,5 @@ import os
 
 model_gen = os.path.join(os.path.dirname(
     os.path.realpath(__file__)), 'model-gen.mako')
+render_all = os.path.join(os.path.dirname(
+    os.path.realpath(__file__)), 'render-all.py')
@@ -32,6 +32,7 @@
 % if model.cycles:
 uint8_t cycles = ${model.cycles}; // cycle count
 % endif
+% if 'noencoding' not in model.faults:
 % if model.ftype == 'R':
 uint8_t opc    = ${model.opc};  // opc, 5 bits
 uint8_t funct3 = ${model.funct3};  // funct3, 3 bits
@@ -40,6 +41,7 @@ uint8_t funct7 = ${model.funct7};  // funct7, 7 bits
 uint8_t opc    = ${model.opc};  // opc, 5 bits
 uint8_t funct3 = ${model.funct3};  // funct3, 3 bits
 % endif
+% endif
 
 ${model.rettype} ${model.name}(${opperands()})
 ${model.dfn}
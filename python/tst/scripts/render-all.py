@@ -0,0 +1,82 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+'''
+Render all generated files for a fixed set of models and registers and
+write them to stdout. Used to check, that the output does not depend on
+the hash seed of the interpreter.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.realpath(__file__)), '../..'))
+from modelparsing.extensions import Extensions
+from modelparsing.templating import render
+from modelparsing.templating import templates
+
+
+class Model:
+    def __init__(self, name, form, opc, funct3, funct7=None):
+        self.name = name
+        self.form = form
+        self.opc = opc
+        self.funct3 = funct3
+        self.funct7 = funct7
+        self.cycles = 1
+        self.definition = '{\n    Rd = Rs1;\n}'
+
+
+def render_all():
+    '''
+    Return the content of all templates.
+    '''
+    models = []
+    for opc in (0x1e, 0x02, 0x16, 0x0a):
+        for funct3 in (3, 0, 7, 1):
+            models.append(Model('i{}_{}'.format(opc, funct3), 'I',
+                                opc, funct3))
+        for funct7 in (9, 0, 120, 33, 64):
+            models.append(Model('r{}_{}'.format(opc, funct7), 'R',
+                                opc, 2, funct7))
+    regmap = dict(('CUSTOM_REG_{}'.format(i), 0x800 + i)
+                  for i in range(64))
+
+    exts = Extensions(models)
+    kwargs = {'models': models,
+              'insts': exts.instructions,
+              'regmap': regmap,
+              'csrs': [],
+              'causes': []}
+
+    return ''.join(render(name, **kwargs) for name in templates())
+
+
+if __name__ == '__main__':
+    sys.stdout.write(render_all())
@@ -0,0 +1,166 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import json
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.allocator import Allocator
+from modelparsing.exceptions import OpcodeError
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestAllocator(unittest.TestCase):
+    '''
+    Tests for the encoding allocator.
+    '''
+
+    class Model:
+        def __init__(self, name, form, opc=None, funct3=None, funct7=None):
+            self.name = name
+            self.form = form
+            self.opc = opc
+            self.funct3 = funct3
+            self.funct7 = funct7
+
+        def set_encoding(self, opc, funct3, funct7=None):
+            self.opc = opc
+            self.funct3 = funct3
+            self.funct7 = funct7
+
+        @property
+        def encoding(self):
+            return (self.opc, self.funct3, self.funct7)
+
+    def __init__(self, *args, **kwargs):
+        super(TestAllocator, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.record = self.folderpath + 'encodings.json'
+        # builtin read and write instructions
+        self.builtins = [self.Model('read_custreg', 'R', 0x1e, 0x7, 0x7e),
+                         self.Model('write_custreg', 'R', 0x1e, 0x7, 0x7f)]
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def testAllocateRType(self):
+        models = [self.Model('rtype1', 'R'), self.Model('rtype0', 'R')]
+
+        Allocator().allocate(models + self.builtins)
+
+        # packed next to the builtin instructions, sorted by name
+        self.assertEqual(models[1].encoding, (0x1e, 0x7, 0x0))
+        self.assertEqual(models[0].encoding, (0x1e, 0x7, 0x1))
+
+    def testAllocateIType(self):
+        models = [self.Model('itype0', 'I'), self.Model('itype1', 'I')]
+
+        Allocator().allocate(models + self.builtins)
+
+        # opcode of the builtin instructions is used first
+        self.assertEqual(models[0].encoding, (0x1e, 0x0, None))
+        self.assertEqual(models[1].encoding, (0x1e, 0x1, None))
+
+    def testAllocatePartial(self):
+        models = [self.Model('rtype', 'R', opc=0x02),
+                  self.Model('itype', 'I', funct3=0x7),
+                  self.Model('fixed', 'I', 0x02, 0x0)]
+
+        Allocator().allocate(models + self.builtins)
+
+        self.assertEqual(models[0].encoding, (0x02, 0x1, 0x0))
+        self.assertEqual(models[1].encoding, (0x02, 0x7, None))
+        self.assertEqual(models[2].encoding, (0x02, 0x0, None))
+
+    def testAllocateFull(self):
+        models = [self.Model('itype{}'.format(i), 'I', opc=0x0a)
+                  for i in range(9)]
+
+        with self.assertRaises(OpcodeError):
+            Allocator().allocate(models)
+
+    def testRecord(self):
+        models = [self.Model('rtype', 'R'), self.Model('itype', 'I')]
+
+        Allocator(self.record).allocate(models)
+
+        with open(self.record, 'r') as fh:
+            record = json.load(fh)
+        self.assertEqual(record['rtype'], {'form': 'R',
+                                           'opc': 0x02,
+                                           'funct3': 0x1,
+                                           'funct7': 0x0})
+
+        # recorded encodings are kept, even if new models sort before them
+        models = [self.Model('rtype', 'R'), self.Model('itype', 'I'),
+                  self.Model('atype', 'R')]
+
+        Allocator(self.record).allocate(models)
+
+        self.assertEqual(models[0].encoding, (0x02, 0x1, 0x0))
+        self.assertEqual(models[1].encoding, (0x02, 0x0, None))
+        self.assertEqual(models[2].encoding, (0x02, 0x1, 0x1))
+
+    def testRecordPrune(self):
+        models = [self.Model('rtype', 'R'), self.Model('atype', 'R')]
+        Allocator(self.record).allocate(models)
+
+        # the encodings of removed models are dropped
+        Allocator(self.record).allocate(models[:1])
+
+        with open(self.record, 'r') as fh:
+            record = json.load(fh)
+        self.assertEqual(sorted(record), ['rtype'])
+
+    def testRecordNotCreated(self):
+        # models with complete encodings need no record
+        models = [self.Model('rtype', 'R', opc=0x02, funct3=0x0, funct7=0x0)]
+        Allocator(self.record).allocate(models)
+
+        self.assertFalse(os.path.exists(self.record))
@@ -0,0 +1,191 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import json
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+import modelparsing.cache as cachemodule
+from modelparsing.cache import ModelCache
+from modelparsing.cache import extractor
+from modelparsing.cache import includes
+from modelparsing.model import Model
+from modelparsing.store import LocalStore
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestCache(unittest.TestCase):
+    '''
+    Tests for the model cache.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestCache, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.cachepath = self.folderpath + 'cache'
+        self.header = self.folderpath + 'test.hh'
+        with open(self.header, 'w') as fh:
+            fh.write('#include <cstdint>\n')
+        self.impl = self.folderpath + 'test.cc'
+        with open(self.impl, 'w') as fh:
+            fh.write('#include "test.hh"\n' +
+                     '#include "missing.hh"\n')
+
+        self.fields = {'cycles': 1,
+                       'definition': '{\n    Rd = Rs1;\n}',
+                       'form': 'I',
+                       'funct3': 0x0,
+                       'funct7': 0xff,
+                       'name': 'test',
+                       'opc': 0x02,
+                       'check_rd': True,
+                       'check_rs1': True,
+                       'check_op2': True,
+                       'rettype': 'void'}
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def testIncludes(self):
+        # only existing local headers are returned
+        self.assertEqual(includes(self.impl),
+                         [os.path.normpath(self.header)])
+        # removed headers are still included
+        self.assertEqual(includes(self.impl, missing=True),
+                         [os.path.normpath(self.folderpath + 'missing.hh'),
+                          os.path.normpath(self.header)])
+
+    def testKeyHeaderChanged(self):
+        cache = ModelCache(self.cachepath)
+        key = cache.key(self.impl)
+        self.assertEqual(key, cache.key(self.impl))
+
+        with open(self.header, 'a') as fh:
+            fh.write('#define c0 0x800\n')
+
+        self.assertNotEqual(key, cache.key(self.impl))
+
+    def testKeyExtractorChanged(self):
+        cache = ModelCache(self.cachepath)
+        key = cache.key(self.impl)
+        self.assertEqual(len(extractor()), 40)
+
+        # a new parser or libclang invalidates all entries
+        saved = cachemodule._extractor
+        cachemodule._extractor = '0' * 40
+        try:
+            self.assertNotEqual(key, cache.key(self.impl))
+        finally:
+            cachemodule._extractor = saved
+
+    def testGetPut(self):
+        cache = ModelCache(self.cachepath)
+        self.assertEqual(cache.get(self.impl), None)
+
+        cache.put(self.impl, [Model.from_dict(self.fields)])
+        [model] = cache.get(self.impl)
+
+        self.assertEqual(model.to_dict(), self.fields)
+        self.assertTrue(isinstance(model.name, str))
+
+    def testEvict(self):
+        # the cache is only able to hold one entry
+        cache = ModelCache(self.cachepath, maxsize=300)
+        cache.put(self.impl, [Model.from_dict(self.fields)])
+
+        impl = self.folderpath + 'other.cc'
+        with open(impl, 'w') as fh:
+            fh.write('\n')
+        cache.put(impl, [Model.from_dict(self.fields)])
+
+        self.assertEqual(len(os.listdir(self.cachepath)), 1)
+
+    def testRemote(self):
+        # entries of other machines are taken from the remote store
+        remote = LocalStore(self.folderpath + 'remote')
+        cache = ModelCache(self.cachepath, remote=remote)
+        cache.put(self.impl, [Model.from_dict(self.fields)])
+
+        other = ModelCache(self.folderpath + 'other', remote=remote)
+        [model] = other.get(self.impl)
+
+        self.assertEqual(model.to_dict(), self.fields)
+        self.assertTrue(isinstance(model.name, str))
+        # the entry is stored locally
+        self.assertEqual(os.listdir(other.path),
+                         [cache.key(self.impl) + '.json'])
+
+    def testRemoteInvalid(self):
+        # remote entries with another layout are a miss
+        remote = LocalStore(self.folderpath + 'remote')
+        cache = ModelCache(self.cachepath, remote=remote)
+        key = cache.key(self.impl)
+
+        for entry in [self.fields, {'models': 1}, {'models': [{}]}]:
+            remote.put('models/' + key, json.dumps(entry))
+            self.assertIsNone(cache.get(self.impl))
+        self.assertEqual(os.listdir(cache.path), [])
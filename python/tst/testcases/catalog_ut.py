@@ -0,0 +1,190 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import time
+import unittest
+
+sys.path.append('..')
+from modelparsing.allocator import OPCODES
+from modelparsing.catalog import Catalog
+from modelparsing.model import Model
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestCatalog(unittest.TestCase):
+    '''
+    Tests for the catalog of models, encodings and registers.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestCatalog, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.db = self.folderpath + 'catalog.db'
+        self.repo0 = self.folderpath + 'repo0'
+        self.repo1 = self.folderpath + 'repo1'
+        os.mkdir(self.repo0)
+        os.mkdir(self.repo1)
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def model(self, repo, name, form, opc, funct3, funct7=None):
+        '''
+        Create a model and the file it is defined in.
+        '''
+        file = os.path.join(repo, name + '.cc')
+        with open(file, 'w') as fh:
+            fh.write('// {} {} {} {}\n'.format(form, opc, funct3, funct7))
+        model = Model.from_dict({'cycles': 1,
+                                 'definition': '{\n}',
+                                 'form': form,
+                                 'funct3': funct3,
+                                 'funct7': funct7,
+                                 'name': name,
+                                 'opc': opc,
+                                 'check_rd': True,
+                                 'check_rs1': True,
+                                 'check_op2': True,
+                                 'rettype': 'void'})
+        return (file, model)
+
+    def testLookup(self):
+        catalog = Catalog(self.db)
+        catalog.update(self.repo0,
+                       [self.model(self.repo0, 'itype', 'I', 0x02, 0x0),
+                        self.model(self.repo0, 'rtype', 'R', 0x0a, 0x1,
+                                   0x3)],
+                       {'c0': 0x800})
+
+        (model,) = catalog.lookup('rtype')
+        self.assertEqual(model['repository'], os.path.abspath(self.repo0))
+        self.assertEqual((model['opc'], model['funct3'], model['funct7']),
+                         (0x0a, 0x1, 0x3))
+        self.assertEqual((model['mask'], model['match']),
+                         (0xfe00707f, 0x0600102b))
+        self.assertEqual(catalog.lookup('missing'), [])
+
+        self.assertEqual([model['name'] for model in
+                          catalog.encoding(0x707f, 0x0000000b)], ['itype'])
+        self.assertEqual(catalog.encoding(0xfe00707f, 0x0800102b), [])
+
+        self.assertEqual(catalog.registers(address=0x800),
+                         [(os.path.abspath(self.repo0), 'c0', 0x800)])
+        self.assertEqual(catalog.registers(name='c1'), [])
+
+    def testConflicts(self):
+        catalog = Catalog(self.db)
+        catalog.update(self.repo0,
+                       [self.model(self.repo0, 'itype', 'I', 0x02, 0x0),
+                        self.model(self.repo0, 'rtype', 'R', 0x0a, 0x1,
+                                   0x3)],
+                       {})
+        self.assertEqual(catalog.conflicts(), [])
+
+        catalog.update(self.repo1,
+                       [self.model(self.repo1, 'other', 'R', 0x02, 0x0,
+                                   0x1),
+                        self.model(self.repo1, 'rtype', 'R', 0x0a, 0x1,
+                                   0x4),
+                        self.model(self.repo1, 'free', 'R', 0x0a, 0x1,
+                                   0x5)],
+                       {})
+
+        conflicts = [(first['name'], second['name'])
+                     for (first, second) in catalog.conflicts()]
+        self.assertEqual(sorted(conflicts),
+                         [('itype', 'other'), ('rtype', 'rtype')])
+        self.assertEqual(len(catalog.conflicts(self.repo1)), 2)
+
+    def testIncremental(self):
+        catalog = Catalog(self.db)
+        models = [self.model(self.repo0, 'itype', 'I', 0x02, 0x0),
+                  self.model(self.repo0, 'rtype', 'R', 0x0a, 0x1, 0x3)]
+        self.assertEqual(catalog.update(self.repo0, models, {}), 2)
+        # unchanged files are not written again
+        self.assertEqual(catalog.update(self.repo0, models, {}), 0)
+
+        models[1] = self.model(self.repo0, 'rtype', 'R', 0x0a, 0x2, 0x3)
+        self.assertEqual(catalog.update(self.repo0, models, {}), 1)
+        self.assertEqual(catalog.lookup('rtype')[0]['funct3'], 0x2)
+
+        # encodings assigned by the allocator change without the file
+        models[1][1].set_encoding(0x0a, 0x5, 0x3)
+        self.assertEqual(catalog.update(self.repo0, models, {}), 1)
+        self.assertEqual(catalog.lookup('rtype')[0]['funct3'], 0x5)
+
+        # removed files are removed from the catalog
+        catalog.update(self.repo0, models[1:], {})
+        self.assertEqual(catalog.lookup('itype'), [])
+
+        # the catalog is persistent
+        catalog.close()
+        catalog = Catalog(self.db)
+        self.assertEqual(len(catalog.lookup('rtype')), 1)
+
+        catalog.remove(self.repo0)
+        self.assertEqual(catalog.lookup('rtype'), [])
+        self.assertEqual(catalog.repositories(), [])
+
+    def testManyModels(self):
+        # queries stay fast for thousands of models
+        catalog = Catalog(self.db)
+        models = []
+        for i in range(0, 4096):
+            (opc, funct3, funct7) = (OPCODES[i >> 10],
+                                     (i >> 7) & 0x7, i & 0x7f)
+            models.append(self.model(self.repo0, 'rtype{}'.format(i), 'R',
+                                     opc, funct3, funct7))
+        catalog.update(self.repo0, models, {})
+
+        start = time.time()
+        self.assertEqual(len(catalog.lookup('rtype4095')), 1)
+        self.assertEqual(len(catalog.encoding(0x707f, 0x0000100b)), 128)
+        self.assertEqual(catalog.conflicts(), [])
+        self.assertLess(time.time() - start, 1.0)
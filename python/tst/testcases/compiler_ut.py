@@ -411,3 +411,46 @@ class TestCompiler(unittest.TestCase):
             content = fh.readlines()
 
         self.assertEqual(len(content), 7)
+
+    def testExtendSourceSorted(self):
+        # the block of entries is sorted by name
+        insts = [self.Instruction(name, 'I',
+                                  'MASK', 'MASKNAME', 'MASKKVAL',
+                                  'MATCH', 'MATCHNAME', 'MATCHVAL',
+                                  'd,s,j') for name in ('b', 'c', 'a', 'b')]
+        exts = self.Extensions([], insts, 'customheader')
+
+        compiler = Compiler(exts, self.regs, self.tc)
+        compiler.opcc = self.opcsource
+        compiler.extend_source()
+
+        with open(self.opcsource, 'r') as fh:
+            content = fh.readlines()
+
+        self.assertEqual(len(content), 9)
+        self.assertEqual([line[:5] for line in content[2:5]],
+                         ['{"a",', '{"b",', '{"c",'])
+
+    def testExtendSourceRemoveStale(self):
+        # entries of a previous run, that are gone, are removed
+        compiler = Compiler(self.exts, self.regs, self.tc)
+        compiler.opcc = self.opcsource
+        compiler.extend_source()
+
+        inst = self.Instruction('rtype', 'R',
+                                'MASK', 'MASKNAME', 'MASKKVAL',
+                                'MATCH', 'MATCHNAME', 'MATCHVAL',
+                                'd,s,t')
+        exts = self.Extensions([], [inst], 'customheader')
+
+        compiler = Compiler(exts, self.regs, self.tc)
+        compiler.opcc = self.opcsource
+        compiler.extend_source()
+
+        with open(self.opcsource, 'r') as fh:
+            content = fh.readlines()
+
+        self.assertEqual(len(content), 7)
+        self.assertEqual(
+            content[2],
+            '{"rtype",  "I",  "d,s,t", MATCHNAME, MASKNAME, match_opcode, 0 },\n')
@@ -0,0 +1,178 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.encoding import EncodingIndex
+from modelparsing.encoding import base_index
+from modelparsing.encoding import define
+from modelparsing.encoding import encode
+from modelparsing.encoding import header
+from modelparsing.encoding import read_opcodes
+from modelparsing.exceptions import OpcodeError
+from modelparsing.instruction import Instruction
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestEncoding(unittest.TestCase):
+    '''
+    Tests for the encoding of custom instructions.
+    '''
+
+    class Model:
+        def __init__(self, name, form, opc, funct3, funct7=0xff, cycles=1):
+            self.name = name
+            self.form = form
+            self.opc = opc
+            self.funct3 = funct3
+            self.funct7 = funct7
+            self.cycles = cycles
+
+    def __init__(self, *args, **kwargs):
+        super(TestEncoding, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.opcodes = self.folderpath + 'opcodes'
+        with open(self.opcodes, 'w') as fh:
+            fh.write('# comment\n' +
+                     '\n' +
+                     'add     rd rs1 rs2 31..25=0  14..12=0 6..2=0x0C ' +
+                     '1..0=3\n' +
+                     'addi    rd rs1 imm12           14..12=0 6..2=0x04 ' +
+                     '1..0=3\n' +
+                     '@nop    11..7=0 19..15=0 31..20=0 14..12=0 6..2=0x04 ' +
+                     '1..0=3\n' +
+                     'c.addi  1..0=1 15..13=0 12=ignore\n')
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def testEncodeRType(self):
+        model = self.Model('rtype', 'R', 0x02, 0x1, 0x2)
+
+        self.assertEqual(encode(model), (0xfe00707f, 0x400100b))
+
+    def testEncodeIType(self):
+        model = self.Model('itype', 'I', 0x1e, 0x7)
+
+        self.assertEqual(encode(model), (0x707f, 0x707b))
+
+    def testEncodeIllegalValue(self):
+        # funct7 has to be set for R-Type instructions
+        with self.assertRaises(OpcodeError):
+            encode(self.Model('rtype', 'R', 0x02, 0x1))
+        with self.assertRaises(OpcodeError):
+            encode(self.Model('itype', 'I', 0x20, 0x1))
+        with self.assertRaises(OpcodeError):
+            encode(self.Model('itype', 'I', 0x02, None))
+
+    def testEncodeFormat(self):
+        with self.assertRaises(OpcodeError):
+            encode(self.Model('stype', 'S', 0x02, 0x1))
+
+    def testDefine(self):
+        self.assertEqual(define('MASK', 'add.w', 0x707f),
+                         '#define MASK_ADD_W  0x707f\n')
+        self.assertEqual(define('MATCH', 'add.w', 0xb),
+                         '#define MATCH_ADD_W 0xb\n')
+
+    def testHeader(self):
+        insts = [Instruction.from_model(self.Model('itype', 'I', 0x02, 0x0)),
+                 Instruction.from_model(self.Model('rtype', 'R', 0x02, 0x1,
+                                                   0x2))]
+
+        content = header(insts).splitlines()
+
+        self.assertEqual(content[3:7], ['#define MATCH_ITYPE 0xb',
+                                        '#define MASK_ITYPE  0x707f',
+                                        '#define MATCH_RTYPE 0x400100b',
+                                        '#define MASK_RTYPE  0xfe00707f'])
+        self.assertIn('DECLARE_INSN(rtype, MATCH_RTYPE, MASK_RTYPE)', content)
+        self.assertEqual(content[-1], '#endif')
+
+    def testHeaderMultipleDefinitions(self):
+        insts = [Instruction.from_model(self.Model('itype', 'I', 0x02, 0x0)),
+                 Instruction.from_model(self.Model('itype', 'I', 0x02, 0x1))]
+
+        with self.assertRaises(OpcodeError):
+            header(insts)
+
+    def testReadOpcodes(self):
+        self.assertEqual(read_opcodes(self.opcodes),
+                         [('add', 0xfe00707f, 0x33),
+                          ('addi', 0x707f, 0x13),
+                          ('c.addi', 0xe003, 0x1)])
+
+    def testIndex(self):
+        index = EncodingIndex()
+        index.add('rtype', 0xfe00707f, 0x400100b)
+        index.add('itype', 0x707f, 0x200b)
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.find(0xfe00707f, 0x400100b), 'rtype')
+        self.assertEqual(index.find(0xfe00707f, 0x600100b), None)
+        # only the bits covered by both masks are compared
+        self.assertEqual(index.find(0x707f, 0x100b), 'rtype')
+        self.assertEqual(index.find(0xfe00707f, 0x600200b), 'itype')
+        self.assertEqual(index.find(0x707f, 0x300b), None)
+
+        # views are kept up to date
+        index.add('rtype0', 0xfe00707f, 0x600300b)
+        self.assertEqual(index.find(0x707f, 0x300b), 'rtype0')
+
+    def testBaseIndex(self):
+        missing = self.folderpath + 'missing'
+        index = base_index([self.opcodes, missing])
+
+        self.assertEqual(len(index), 3)
+        self.assertIs(base_index([self.opcodes, missing]), index)
+        self.assertEqual(index.find(*encode(self.Model('op', 'R', 0x0c, 0x0,
+                                                       0x1))), None)
+        self.assertEqual(index.find(*encode(self.Model('op', 'I', 0x0c,
+                                                       0x0))), 'add')
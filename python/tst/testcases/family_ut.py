@@ -0,0 +1,147 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.allocator import Allocator
+from modelparsing.exceptions import ConsistencyError
+from modelparsing.extensions import Extensions
+from modelparsing.family import Family
+from modelparsing.family import build
+from modelparsing.parser import Parser
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestFamily(unittest.TestCase):
+    '''
+    Tests for models created without model files.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestFamily, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        if not os.path.isdir(self.folderpath):
+            os.makedirs(self.folderpath)
+        self.mac = Family('mac$bits$mode', 'R',
+                          '{\n    Rd = $mode(Rs1 * Rs2 + Rd, $bits);\n}',
+                          cycles=lambda params: params['bits'] // 8)
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def testBuild(self):
+        model = build('add3', 'I', '{\n    Rd = Rs1 + imm;\n}', cycles=2,
+                      opc=0x0a, funct3=0x1, funct7=0x7)
+
+        self.assertEqual(model.name, 'add3')
+        self.assertEqual(model.form, 'I')
+        self.assertEqual(model.cycles, 2)
+        self.assertEqual(model.opc, 0x0a)
+        self.assertEqual(model.funct3, 0x1)
+        # I-Type instructions have no funct7
+        self.assertIsNone(model.funct7)
+        self.assertEqual(model.definition, '{\n    Rd = Rs1 + imm;\n}')
+
+    def testBuildInvalid(self):
+        with self.assertRaises(ConsistencyError):
+            build('3add', 'R', '{}')
+        with self.assertRaises(ConsistencyError):
+            build('add', 'S', '{}')
+        with self.assertRaises(ConsistencyError):
+            build('add', 'R', 'Rd = Rs1;')
+        with self.assertRaises(ValueError):
+            build('add', 'R', '{}', opc=0x10)
+        with self.assertRaises(ValueError):
+            build('add', 'R', '{}', cycles=0)
+
+    def testModels(self):
+        models = self.mac.models(bits=[8, 16, 32], mode=['sat', 'wrap'])
+
+        self.assertEqual([model.name for model in models],
+                         ['mac8sat', 'mac8wrap', 'mac16sat', 'mac16wrap',
+                          'mac32sat', 'mac32wrap'])
+        self.assertEqual([model.cycles for model in models],
+                         [1, 1, 2, 2, 4, 4])
+        self.assertEqual(models[3].definition,
+                         '{\n    Rd = wrap(Rs1 * Rs2 + Rd, 16);\n}')
+
+        with self.assertRaises(ConsistencyError):
+            self.mac.model(bits=8)
+
+    def testExtensions(self):
+        # thousands of variants get their encodings assigned
+        models = self.mac.models(bits=range(8, 1008), mode=['sat', 'wrap'])
+        Allocator().allocate(models)
+        exts = Extensions(models)
+
+        self.assertEqual(len(exts.instructions), 2000)
+        self.assertEqual(len(set((inst.maskvalue, inst.matchvalue)
+                                 for inst in exts.instructions)), 2000)
+
+    def testParser(self):
+        # added models are handled like parsed models
+        models = self.folderpath + 'models/'
+        os.makedirs(models)
+
+        parser = Parser(self.folderpath + 'tc', models, dryrun=True)
+        parser.add(self.mac.models(bits=[8], mode=['sat']))
+        parser.parse_models()
+
+        self.assertEqual([model.name for model in parser.models],
+                         ['mac8sat', 'read_custreg', 'write_custreg'])
+        fingerprint = parser.fingerprint
+
+        parser.add([build('mac64sat', 'R', '{\n    Rd = Rs1;\n}')])
+
+        self.assertEqual([inst.name
+                          for inst in parser.extensions.instructions],
+                         ['mac8sat', 'mac64sat', 'read_custreg',
+                          'write_custreg'])
+        self.assertNotEqual(parser.fingerprint, fingerprint)
@@ -0,0 +1,143 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.fileutils import FileLock
+from modelparsing.fileutils import write_if_changed
+from modelparsing.fileutils import write_stream_if_changed
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestFileutils(unittest.TestCase):
+    '''
+    Tests for the file helpers.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestFileutils, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.file = self.folderpath + 'file.h'
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def testWriteNew(self):
+        self.assertTrue(write_if_changed(self.file, 'content\n'))
+
+        with open(self.file, 'r') as fh:
+            self.assertEqual(fh.read(), 'content\n')
+        # no temporary files are left
+        self.assertEqual(os.listdir(self.folderpath), ['file.h'])
+
+    def testWriteUnchanged(self):
+        write_if_changed(self.file, 'content\n')
+        os.utime(self.file, (0, 0))
+
+        self.assertFalse(write_if_changed(self.file, 'content\n'))
+        self.assertEqual(os.path.getmtime(self.file), 0)
+
+    def testWriteChanged(self):
+        write_if_changed(self.file, 'content\n')
+        os.chmod(self.file, 0o755)
+        os.utime(self.file, (0, 0))
+
+        self.assertTrue(write_if_changed(self.file, 'changed\n'))
+        self.assertNotEqual(os.path.getmtime(self.file), 0)
+        # the mode of the replaced file is kept
+        self.assertEqual(stat.S_IMODE(os.stat(self.file).st_mode), 0o755)
+
+        with open(self.file, 'r') as fh:
+            self.assertEqual(fh.read(), 'changed\n')
+
+    def testWriteStream(self):
+        def write(fh):
+            fh.write('con')
+            fh.write('tent\n')
+
+        self.assertTrue(write_stream_if_changed(self.file, write))
+        os.utime(self.file, (0, 0))
+        self.assertFalse(write_stream_if_changed(self.file, write))
+        self.assertEqual(os.path.getmtime(self.file), 0)
+
+        with open(self.file, 'r') as fh:
+            self.assertEqual(fh.read(), 'content\n')
+        # no temporary files are left
+        self.assertEqual(os.listdir(self.folderpath), ['file.h'])
+
+    def locked(self, path):
+        '''
+        Check in another process, if the lock on path is held.
+        '''
+        return subprocess.call([
+            sys.executable, '-c',
+            'import fcntl, sys\n' +
+            'fh = open(sys.argv[1], "a")\n' +
+            'try:\n' +
+            '    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)\n' +
+            'except IOError:\n' +
+            '    sys.exit(1)\n', path]) == 1
+
+    def testFileLock(self):
+        path = self.folderpath + 'sub/.lock'
+        lock = FileLock(path)
+
+        with lock:
+            self.assertTrue(lock.locked)
+            self.assertTrue(self.locked(path))
+            # the owner can acquire the lock again
+            with lock:
+                self.assertTrue(lock.locked)
+            self.assertTrue(self.locked(path))
+
+        self.assertFalse(lock.locked)
+        self.assertFalse(self.locked(path))
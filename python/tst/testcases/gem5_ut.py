@@ -33,6 +33,8 @@ import unittest
 
 sys.path.append('..')
 from modelparsing.gem5 import Gem5
+from modelparsing.gem5 import add_syspath
+from modelparsing.gem5 import isa_main
 from tst import folderpath
 sys.path.remove('..')
 
@@ -239,3 +241,32 @@ decode OPCODE default Unknown::unknown() {
 }
 '''
         self.assertEqual(decoder.decoder, expect)
+
+    def testIsaMain(self):
+        # the isa description includes the decoder of the build directory
+        isadir = self.folderpath + 'src/isa/'
+        os.makedirs(isadir)
+        isamain = isadir + 'main.isa'
+        with open(isamain, 'w') as fh:
+            fh.write('##include "includes.isa"\n' +
+                     'namespace RiscvcustomISA;\n' +
+                     '##include "../../build/isa/custom.isa"\n')
+
+        decoder = '/tmp/build0/isa/custom.isa'
+        self.assertEqual(isa_main(isamain, decoder),
+                         '##include "{}includes.isa"\n'.format(isadir) +
+                         'namespace RiscvcustomISA;\n' +
+                         '##include "/tmp/build0/isa/custom.isa"\n')
+
+    def testAddSyspath(self):
+        # the isa parser paths are added only once
+        paths = [self.folderpath + 'python', self.folderpath + 'ply']
+        add_syspath(paths)
+        add_syspath(paths)
+        try:
+            self.assertEqual(sys.path[0:2], paths)
+            self.assertEqual(len([path for path in sys.path
+                                  if path in paths]), 2)
+        finally:
+            for path in paths:
+                sys.path.remove(path)
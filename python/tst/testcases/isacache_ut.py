@@ -0,0 +1,181 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.isacache import IsaCache
+from modelparsing.isacache import isa_includes
+from modelparsing.store import LocalStore
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestIsaCache(unittest.TestCase):
+    '''
+    Tests for the cache of the isa_parser output.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestIsaCache, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.cachepath = self.folderpath + 'cache'
+        self.outdir = self.folderpath + 'generated'
+        os.makedirs(self.outdir)
+
+        os.mkdir(self.folderpath + 'formats')
+        self.isamain = self.folderpath + 'main.isa'
+        with open(self.isamain, 'w') as fh:
+            fh.write('##include "formats/formats.isa"\n' +
+                     '##include "custom.isa"\n' +
+                     '##include "missing.isa"\n')
+        self.formats = self.folderpath + 'formats/formats.isa'
+        with open(self.formats, 'w') as fh:
+            fh.write('##include "basic.isa"\n')
+        self.basic = self.folderpath + 'formats/basic.isa'
+        with open(self.basic, 'w') as fh:
+            fh.write('def format Basic() {{ }};\n')
+        self.custom = self.folderpath + 'custom.isa'
+        with open(self.custom, 'w') as fh:
+            fh.write('decode OPCODE {\ndefault: Unknown::unknown();\n}\n')
+        self.isaparser = self.folderpath + 'isa_parser.py'
+        with open(self.isaparser, 'w') as fh:
+            fh.write('# isa_parser\n')
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def testIsaIncludes(self):
+        self.assertEqual(isa_includes(self.isamain),
+                         sorted([self.basic, self.custom, self.formats]))
+
+    def testKeyIncludeChanged(self):
+        cache = IsaCache(self.cachepath)
+        key = cache.key(self.isamain, self.isaparser, self.outdir)
+
+        self.assertEqual(key,
+                         cache.key(self.isamain, self.isaparser, self.outdir))
+
+        with open(self.basic, 'a') as fh:
+            fh.write('def format Other() {{ }};\n')
+
+        self.assertNotEqual(
+            key, cache.key(self.isamain, self.isaparser, self.outdir))
+
+    def testKeyRelocated(self):
+        # checkouts in other places share the entries
+        def checkout(path, content):
+            arch = path + 'gem5/src/arch/'
+            os.makedirs(arch + 'riscv')
+            with open(arch + 'isa_parser.py', 'w') as fh:
+                fh.write('# isa_parser\n')
+            with open(arch + 'riscv/bitfields.isa', 'w') as fh:
+                fh.write(content)
+            os.makedirs(path + 'build/isa')
+            with open(path + 'build/isa/main.isa', 'w') as fh:
+                fh.write('##include "{}"\n'.format(
+                    os.path.abspath(arch + 'riscv/bitfields.isa')))
+            return cache.key(path + 'build/isa/main.isa',
+                             arch + 'isa_parser.py', path + 'build/generated')
+
+        cache = IsaCache(self.cachepath)
+        key = checkout(self.folderpath + 'a/', 'def bitfield OPCODE;\n')
+
+        self.assertEqual(
+            key, checkout(self.folderpath + 'b/', 'def bitfield OPCODE;\n'))
+        self.assertNotEqual(
+            key, checkout(self.folderpath + 'c/', 'def bitfield FUNCT3;\n'))
+
+    def testGetPut(self):
+        cache = IsaCache(self.cachepath)
+        key = cache.key(self.isamain, self.isaparser, self.outdir)
+
+        self.assertFalse(cache.get(key, self.outdir))
+
+        with open(os.path.join(self.outdir, 'decoder.cc'), 'w') as fh:
+            fh.write('// decoder\n')
+        cache.put(key, self.outdir)
+
+        # restored files, that did not change, keep their mtime
+        os.utime(os.path.join(self.outdir, 'decoder.cc'), (0, 0))
+        self.assertTrue(cache.get(key, self.outdir))
+        self.assertEqual(
+            os.path.getmtime(os.path.join(self.outdir, 'decoder.cc')), 0)
+
+        shutil.rmtree(self.outdir)
+        self.assertTrue(cache.get(key, self.outdir))
+        with open(os.path.join(self.outdir, 'decoder.cc'), 'r') as fh:
+            self.assertEqual(fh.read(), '// decoder\n')
+
+    def testEvict(self):
+        cache = IsaCache(self.cachepath, maxentries=2)
+        for key in ('a', 'b', 'c'):
+            cache.put(key, self.outdir)
+            os.utime(os.path.join(self.cachepath, key),
+                     (ord(key), ord(key)))
+        cache.evict()
+
+        self.assertEqual(sorted(os.listdir(self.cachepath)), ['b', 'c'])
+
+    def testRemote(self):
+        # entries of other machines are taken from the remote store
+        remote = LocalStore(self.folderpath + 'remote')
+        cache = IsaCache(self.cachepath, remote=remote)
+        key = cache.key(self.isamain, self.isaparser, self.outdir)
+        with open(os.path.join(self.outdir, 'decoder.cc'), 'w') as fh:
+            fh.write('// decoder\n')
+        cache.put(key, self.outdir)
+        shutil.rmtree(self.outdir)
+
+        other = IsaCache(self.folderpath + 'other', remote=remote)
+        self.assertTrue(other.get(key, self.outdir))
+        with open(os.path.join(self.outdir, 'decoder.cc'), 'r') as fh:
+            self.assertEqual(fh.read(), '// decoder\n')
+        self.assertEqual(os.listdir(other.path), [key])
+
+        self.assertFalse(other.get('0' * 40, self.outdir))
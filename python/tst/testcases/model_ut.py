@@ -27,6 +27,7 @@
 # Authors: Robert Scheffel
 
 import os
+import pickle
 import shutil
 import sys
 import unittest
@@ -37,10 +38,31 @@ from mako.template import Template
 
 sys.path.append('..')
 from modelparsing.exceptions import ConsistencyError
+from modelparsing.model import parse_file
 from modelparsing.parser import Model
 from tst import folderpath
 sys.path.remove('..')
 
+# model file, that defines several instructions
+MULTIPLE = '''#include <cstdint>
+
+__attribute__((annotate("custom opc=0x02 funct3=0x1 funct7=0x3 cycles=2")))
+void mac(uint32_t &Rd, uint32_t Rs1, uint32_t Rs2)
+{
+    Rd = Rd + Rs1 * Rs2;
+}
+
+static uint32_t helper(uint32_t x)
+{
+    return x;
+}
+
+__attribute__((annotate("custom")))
+void addi(uint32_t &Rd, uint32_t Rs1, uint32_t imm)
+{
+    Rd = Rs1 + imm;
+}
+'''
 
 class TestModel(unittest.TestCase):
     '''
@@ -299,6 +321,31 @@ class TestModel(unittest.TestCase):
         self.assertEqual(model.definition,
                          '{\n    // function definition\n}')
 
+    def testReleaseModel(self):
+        # a released model reads its definition from the file
+        name = 'release'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        model = Model(filename)
+        fields = model.to_dict()
+        model.release(filename)
+
+        self.assertTrue(model.released)
+        self.assertEqual(model.to_dict(), fields)
+        self.assertEqual(model.definition,
+                         '{\n    // function definition\n}')
+
+        # models are handed between processes
+        model = pickle.loads(pickle.dumps(model))
+        self.assertEqual(model.to_dict(), fields)
+
+        with open(filename, 'a') as fh:
+            fh.write('// changed\n')
+        with self.assertRaises(ConsistencyError):
+            model.definition
+
     def testNoDefinitionModel(self):
         name = 'nodef'
         filename = self.folderpath + name + '.cc'
@@ -343,3 +390,86 @@ class TestModel(unittest.TestCase):
 
         with self.assertRaises(ValueError):
             Model(filename)
+
+    def testHeaderFunctionModel(self):
+        # functions declared in included headers are ignored
+        name = 'header'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        header = self.folderpath + 'helper.hh'
+        with open(header, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     'void helper(uint32_t Rd, uint32_t Rs1, uint32_t Rs2);\n')
+        with open(filename, 'r') as fh:
+            content = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write('#include "helper.hh"\n' + content)
+
+        # parse model
+        model = Model(filename)
+
+        self.assertEqual(model.name, self.ccmodel.name)
+        self.assertEqual(model.form, self.ccmodel.ftype)
+
+    def testCompileErrorModel(self):
+        name = 'compileerror'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        with open(filename, 'a') as fh:
+            fh.write('undefined_t broken;\n')
+
+        with self.assertRaises(ConsistencyError):
+            Model(filename)
+
+    def testNoEncodingModel(self):
+        # encoding fields may be left to the allocator
+        name = 'noencoding'
+        self.ftype = 'R'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename, faults=['noencoding'])
+
+        model = Model(filename)
+
+        self.assertIsNone(model.opc)
+        self.assertIsNone(model.funct3)
+        self.assertIsNone(model.funct7)
+
+        model.set_encoding(0x16, 0x1, 0x05)
+
+        self.assertEqual(model.opc, 0x16)
+        self.assertEqual(model.funct3, 0x1)
+        self.assertEqual(model.funct7, 0x05)
+
+        with self.assertRaises(ValueError):
+            model.set_encoding(0x10, 0x1, 0x05)
+
+    def testMultipleModels(self):
+        # every annotated function of a file is a model
+        filename = self.folderpath + 'multiple.cc'
+        with open(filename, 'w') as fh:
+            fh.write(MULTIPLE)
+
+        models = parse_file(filename)
+
+        self.assertEqual([model.name for model in models], ['mac', 'addi'])
+        self.assertEqual([model.form for model in models], ['R', 'I'])
+        self.assertEqual([model.cycles for model in models], [2, 1])
+        self.assertEqual((models[0].opc, models[0].funct3, models[0].funct7),
+                         (0x02, 0x1, 0x3))
+        self.assertIsNone(models[1].opc)
+        self.assertEqual(models[0].definition,
+                         '{\n    Rd = Rd + Rs1 * Rs2;\n}')
+        self.assertEqual(models[1].definition, '{\n    Rd = Rs1 + imm;\n}')
+
+    def testInvalidAnnotation(self):
+        filename = self.folderpath + 'invalid.cc'
+        with open(filename, 'w') as fh:
+            fh.write(MULTIPLE.replace('cycles=2', 'latency=2'))
+
+        with self.assertRaises(ConsistencyError):
+            parse_file(filename)
@@ -36,11 +36,87 @@ from scripts.ccmodel import CCModel
 from mako.template import Template
 
 sys.path.append('..')
+from modelparser import ModelParser
+from modelparsing.cache import ModelCache
+from modelparsing.compiler import OPCC
+from modelparsing.compiler import OPCH
+from modelparsing.compiler import TERMINATOR
 from modelparsing.exceptions import ConsistencyError
 from modelparsing.parser import Parser
+import modelparsing.parser as parsermodule
+from modelparsing.watcher import Watcher
 from tst import folderpath
 sys.path.remove('..')
 
+# replaces isa_parser.py of gem5, copies the isa description to the
+# generated files
+ISAPARSER = '''
+import os
+
+OUTPUTS = ['decoder.cc', 'inst-constrs.cc', 'generic_cpu_exec.cc']
+
+
+class ISAParser(object):
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def parse_isa_desc(self, isa_desc):
+        with open(isa_desc, 'r') as fh:
+            content = fh.read()
+        for name in OUTPUTS:
+            with open(os.path.join(self.output_dir, name), 'w') as fh:
+                fh.write(content)
+'''
+
+
+class UnpicklableError(Exception):
+    '''
+    Error, that takes other arguments than it passes to Exception.
+    '''
+
+    def __init__(self, impl, reason):
+        super(UnpicklableError, self).__init__(
+            '{}: {}'.format(impl, reason))
+
+
+def toolchain(path):
+    '''
+    Create a stand-in toolchain below path and return its path.
+    '''
+    opch = os.path.join(path, OPCH)
+    os.makedirs(os.path.dirname(opch))
+    with open(opch, 'w') as fh:
+        fh.write('#ifndef RISCV_ENCODING_H\n#define RISCV_ENCODING_H\n' +
+                 '#endif\n')
+
+    opcc = os.path.join(path, OPCC)
+    os.makedirs(os.path.dirname(opcc))
+    with open(opcc, 'w') as fh:
+        fh.write('{\n' + TERMINATOR + '{0, 0, 0, 0, 0, 0, 0}\n};\n')
+
+    install = os.path.join(path, 'install')
+    os.makedirs(os.path.join(install, 'lib/gcc/riscv32-unknown-elf',
+                             '7.2.0/include'))
+    with open(os.path.join(path, 'Makefile'), 'w') as fh:
+        fh.write('INSTALL_DIR := {}\n'.format(install))
+
+    return path
+
+
+def gem5(path):
+    '''
+    Create a stand-in gem5 checkout below path and return its path.
+    '''
+    decoder = os.path.join(path, 'src/arch/riscv/isa/decoder/rv32.isa')
+    os.makedirs(os.path.dirname(decoder))
+    with open(decoder, 'w') as fh:
+        fh.write('decode OPCODE default Unknown::unknown() {\n}\n')
+
+    with open(os.path.join(path, 'src/arch/isa_parser.py'), 'w') as fh:
+        fh.write(ISAPARSER)
+
+    return path
+
 
 class TestParser(unittest.TestCase):
     '''
@@ -107,6 +183,9 @@ class TestParser(unittest.TestCase):
                      '{0, 0, 0, 0, 0, 0, 0}\n' +
                      '};')
 
+        self.tc = os.path.join(os.path.expanduser('~'),
+                               'projects/riscv-gnu-toolchain')
+
     def tearDown(self):
         # remove generated file
         if hasattr(self, '_outcome'):  # Python 3.4+
@@ -146,3 +225,366 @@ class TestParser(unittest.TestCase):
 
         with open(filename, 'w') as fh:
             fh.write(modelgen.render(model=self.ccmodel))
+
+    def testParseFilesParallel(self):
+        # models parsed by a pool keep the order of the files
+        names = []
+        files = []
+        for i in range(0, 4):
+            name = 'itype{}'.format(i)
+            self.funct3 = i
+            filename = self.folderpath + name + '.cc'
+            self.genModel(name, filename)
+            names.append(name)
+            files.append(filename)
+
+        parser = Parser(self.tc, self.folderpath, jobs=2)
+        models = parser.parse_files(files)
+
+        self.assertEqual([model.name for [model] in models], names)
+
+    def testParseFilesParallelError(self):
+        # errors of a worker are raised in the parent
+        name = 'itype'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename)
+
+        name = 'nord'
+        faulty = self.folderpath + name + '.cc'
+        self.genModel(name, faulty, faults=['nord'])
+
+        parser = Parser(self.tc, self.folderpath, jobs=2)
+        with self.assertRaises(ConsistencyError) as cm:
+            parser.parse_files([filename, faulty])
+        self.assertEqual(cm.exception.args[0], faulty)
+
+    def testParseFilesParallelUnpicklable(self):
+        # errors, that can not be unpickled, do not block the pool
+        def parse_file(impl, fast=False):
+            raise UnpicklableError(impl, 'broken')
+
+        files = []
+        for i in range(0, 2):
+            name = 'itype{}'.format(i)
+            files.append(self.folderpath + name + '.cc')
+            self.genModel(name, files[-1])
+
+        parser = Parser(self.tc, self.folderpath, jobs=2)
+        original = parsermodule.parse_file
+        parsermodule.parse_file = parse_file
+        try:
+            with self.assertRaises(ConsistencyError) as cm:
+                parser.parse_files(files)
+        finally:
+            parsermodule.parse_file = original
+        self.assertIn(cm.exception.args[0], files)
+
+    def testFingerprint(self):
+        # a recorded fingerprint marks the extension set as applied
+        name = 'itype'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename)
+        tc = toolchain(self.folderpath + 'tc')
+        gem5path = gem5(self.folderpath + 'gem5')
+        buildpath = self.folderpath + 'build'
+
+        parser = Parser(tc, filename, buildpath=buildpath, gem5path=gem5path)
+        parser.parse_models()
+
+        self.assertFalse(parser.applied('compiler'))
+        parser.extend(gem5=False)
+        self.assertTrue(parser.applied('compiler'))
+        self.assertFalse(parser.applied('gem5'))
+        # the toolchain keeps its own record
+        self.assertTrue(os.path.isfile(parser.tcfingerprints))
+        self.assertFalse(os.path.exists(parser.fingerprints))
+
+        # same models give the same fingerprint
+        parser0 = Parser(tc, filename, buildpath=buildpath, gem5path=gem5path)
+        parser0.parse_models()
+
+        self.assertEqual(parser0.fingerprint, parser.fingerprint)
+        self.assertTrue(parser0.applied('compiler'))
+
+        # a changed model does not match anymore
+        self.funct3 = 0x01
+        self.genModel(name, filename)
+
+        parser1 = Parser(tc, filename, buildpath=buildpath, gem5path=gem5path)
+        parser1.parse_models()
+
+        self.assertNotEqual(parser1.fingerprint, parser.fingerprint)
+        self.assertFalse(parser1.applied('compiler'))
+
+    def testFingerprintOutputs(self):
+        # missing outputs and changed isa inputs are generated again
+        name = 'itype'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename)
+        gem5path = gem5(self.folderpath + 'gem5')
+        buildpath = self.folderpath + 'build'
+
+        parser = Parser(toolchain(self.folderpath + 'tc'), filename,
+                        buildpath=buildpath, gem5path=gem5path)
+        parser.parse_models()
+        self.assertEqual(len(parser.extend()), 7)
+        self.assertEqual(parser.extend(), [])
+
+        # scons -c
+        shutil.rmtree(os.path.join(buildpath, 'generated'))
+        os.remove(os.path.join(buildpath, 'isa/custom.isa'))
+        self.assertFalse(parser.applied('gem5'))
+        self.assertEqual(len(parser.extend(compiler=False)), 4)
+        for output in parser.decoder.outputs():
+            self.assertTrue(os.path.isfile(output))
+
+        with open(os.path.join(gem5path, 'src/arch/isa_parser.py'),
+                  'a') as fh:
+            fh.write('# changed\n')
+        self.assertFalse(parser.applied('gem5'))
+        self.assertTrue(parser.applied('compiler'))
+
+    def testForceGem5(self):
+        # the SCons builder generates the gem5 files again
+        name = 'itype'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename)
+
+        parser = Parser(toolchain(self.folderpath + 'tc'), filename,
+                        buildpath=self.folderpath + 'build',
+                        gem5path=gem5(self.folderpath + 'gem5'))
+        parser.parse_models()
+        parser.extend()
+
+        self.assertEqual(parser.extend(force_gem5=True),
+                         ['gem5.decoder', 'gem5.cxx', 'gem5.regsintr',
+                          'gem5.timings'])
+
+    def testRestoreStale(self):
+        # a new build directory does not restore an applied toolchain
+        models = self.folderpath + 'models/'
+        os.makedirs(models)
+        self.genModel('itype', models + 'itype.cc')
+        tc = toolchain(self.folderpath + 'tc')
+        gem5path = gem5(self.folderpath + 'gem5')
+
+        parser = Parser(tc, models, buildpath=self.folderpath + 'build0',
+                        gem5path=gem5path)
+        parser.parse_models()
+        parser.extend()
+
+        opcc = os.path.join(tc, OPCC)
+        mtime = int(os.stat(opcc).st_mtime) - 10
+        os.utime(opcc, (mtime, mtime))
+
+        other = Parser(tc, models, buildpath=self.folderpath + 'build1',
+                       gem5path=gem5path)
+        other.parse_models()
+
+        self.assertEqual(other.extend(),
+                         ['gem5.decoder', 'gem5.cxx', 'gem5.regsintr',
+                          'gem5.timings'])
+        self.assertEqual(os.stat(opcc).st_mtime, mtime)
+
+        # the lock of the build directory is kept outside of it
+        other.restore(clean=True)
+        self.assertFalse(os.path.exists(self.folderpath + 'build1'))
+        self.assertTrue(os.path.exists(self.folderpath + 'build1.lock'))
+        self.assertFalse(os.path.exists(other.tcfingerprints))
+
+    def testUpdate(self):
+        # only the steps, whose input changed, are run again
+        class UpdateParser(Parser):
+            def extend(self, compiler=True, gem5=True, steps=None):
+                return sorted(steps)
+
+        name = 'itype'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename)
+
+        parser = UpdateParser(self.tc, filename)
+        parser.fingerprints = self.folderpath + 'build/fingerprints.json'
+        parser.parse_models()
+
+        # touched model
+        self.assertEqual(parser.update([filename]), [])
+
+        # changed definition
+        with open(filename, 'r') as fh:
+            content = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write(content.replace('// function definition', 'return;'))
+
+        self.assertEqual(parser.update([filename]),
+                         ['gem5.cxx', 'gem5.decoder', 'gem5.timings'])
+        self.assertEqual(parser.models[0].definition, '{\n    return;\n}')
+
+        # changed encoding
+        self.funct3 = 0x01
+        self.genModel(name, filename)
+
+        self.assertEqual(parser.update([filename]),
+                         ['compiler.header', 'compiler.source',
+                          'compiler.stdlibs', 'gem5.cxx', 'gem5.decoder',
+                          'gem5.timings'])
+        self.assertEqual(parser.models[0].funct3, 0x01)
+
+    def testUpdateExtend(self):
+        # an update runs the selected steps of the backends
+        name = 'itype'
+        filename = self.folderpath + 'models/' + name + '.cc'
+        os.makedirs(os.path.dirname(filename))
+        self.genModel(name, filename)
+
+        parser = Parser(toolchain(self.folderpath + 'tc'),
+                        os.path.dirname(filename),
+                        buildpath=self.folderpath + 'build',
+                        gem5path=gem5(self.folderpath + 'gem5'))
+        parser.parse_models()
+        self.assertEqual(len(parser.extend()), 7)
+
+        with open(filename, 'r') as fh:
+            content = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write(content.replace('// function definition', 'return;'))
+
+        self.assertEqual(sorted(parser.update([filename])),
+                         ['gem5.cxx', 'gem5.decoder', 'gem5.timings'])
+        with open(self.folderpath + 'build/isa/custom.isa', 'r') as fh:
+            self.assertIn('return;', fh.read())
+
+    def testUpdateHeaderRelative(self):
+        # models including a changed header are parsed again, also if the
+        # modelpath is relative like the default ./../extensions
+        class UpdateParser(Parser):
+            def extend(self, compiler=True, gem5=True, steps=None):
+                return sorted(steps)
+
+            def parse_files(self, files):
+                self.parsed = list(files)
+                return Parser.parse_files(self, files)
+
+        models = self.folderpath + 'models/'
+        filename = models + 'itype/itype.cc'
+        os.makedirs(os.path.dirname(filename))
+        self.genModel('itype', filename)
+        with open(filename, 'a') as fh:
+            fh.write('#include "../helper.hh"\n')
+        with open(models + 'helper.hh', 'w') as fh:
+            fh.write('\n')
+
+        modelpath = './' + os.path.relpath(models)
+        parser = UpdateParser(self.tc, modelpath, dryrun=True)
+        parser.parse_models()
+        watcher = Watcher(modelpath)
+
+        with open(models + 'helper.hh', 'w') as fh:
+            fh.write('// changed\n')
+        (changed, removed) = watcher.poll()
+        self.assertEqual(len(changed), 1)
+
+        parser.update(changed, removed)
+        self.assertEqual([os.path.basename(file) for file in parser.parsed],
+                         ['itype.cc'])
+
+        # the model does not compile without the removed header
+        os.remove(models + 'helper.hh')
+        (changed, removed) = watcher.poll()
+        self.assertEqual(len(removed), 1)
+
+        parser.parsed = []
+        with self.assertRaises(ConsistencyError):
+            parser.update(changed, removed)
+        self.assertEqual([os.path.basename(file) for file in parser.parsed],
+                         ['itype.cc'])
+
+    def testLowMemory(self):
+        # definitions are released, also for models taken from the cache
+        models = self.folderpath + 'models/'
+        os.makedirs(models)
+        for i in range(0, 3):
+            name = 'itype{}'.format(i)
+            self.funct3 = i
+            self.genModel(name, models + name + '.cc')
+
+        parser = Parser(self.tc, models, dryrun=True)
+        parser.parse_models()
+
+        cache = ModelCache(self.folderpath + 'cache')
+        for run in range(0, 2):
+            lowmem = Parser(self.tc, models, cache=cache, dryrun=True,
+                            lowmem=True)
+            lowmem.parse_models()
+
+            self.assertEqual([model.released for model in lowmem.models],
+                             [True, True, True, False, False])
+            self.assertEqual(lowmem.fingerprint, parser.fingerprint)
+            self.assertEqual(lowmem.extensions.cust_header,
+                             parser.extensions.cust_header)
+
+    def testMultipleModelsPerFile(self):
+        # a file defines several instructions, they are cached together
+        models = self.folderpath + 'models/'
+        os.makedirs(models)
+        self.genModel('itype', models + 'itype.cc')
+        with open(models + 'multiple.cc', 'w') as fh:
+            fh.write('#include <cstdint>\n\n')
+            for name in ['mac', 'msub']:
+                fh.write('__attribute__((annotate("custom cycles=3")))\n' +
+                         'void {}'.format(name) +
+                         '(uint32_t &Rd, uint32_t Rs1, uint32_t Rs2)\n' +
+                         '{\n    Rd = Rs1 * Rs2;\n}\n\n')
+
+        cache = ModelCache(self.folderpath + 'cache')
+        for run in range(0, 2):
+            parser = Parser(self.tc, models, cache=cache, dryrun=True)
+            parser.parse_models()
+
+            self.assertEqual([model.name for model in parser.models],
+                             ['itype', 'mac', 'msub', 'read_custreg',
+                              'write_custreg'])
+            self.assertEqual([model.cycles for model in parser.models[1:3]],
+                             [3, 3])
+
+    def testModelParserSources(self):
+        # sources for the SCons builder
+        name = 'itype'
+        filename = self.folderpath + 'models/' + name + '.cc'
+        os.makedirs(os.path.dirname(filename))
+        self.genModel(name, filename)
+        with open(filename, 'a') as fh:
+            fh.write('#include "helper.hh"\n')
+        header = self.folderpath + 'models/helper.hh'
+        with open(header, 'w') as fh:
+            fh.write('#include "../common.hh"\n')
+        common = self.folderpath + 'common.hh'
+        with open(common, 'w') as fh:
+            fh.write('\n')
+
+        record = self.folderpath + 'models/encodings.json'
+        with open(record, 'w') as fh:
+            fh.write('{}\n')
+
+        modelparser = ModelParser()
+        modelparser.modelpath = self.folderpath + 'models'
+        sources = modelparser.sources()
+
+        self.assertIn(os.path.normpath(filename), sources)
+        self.assertIn(os.path.normpath(header), sources)
+        self.assertIn(os.path.normpath(common), sources)
+        self.assertIn(record, sources)
+        self.assertTrue(any(source.endswith('main.isa')
+                            for source in sources))
+        self.assertTrue(any(source.endswith('custom.isa.mako')
+                            for source in sources))
+        self.assertEqual(sources, sorted(set(sources)))
+
+        targets = [os.path.basename(target)
+                   for target in modelparser.targets()]
+        self.assertEqual(targets, ['custom.isa',
+                                   'main.isa',
+                                   'decoder.cc',
+                                   'inst-constrs.cc',
+                                   'generic_cpu_exec.cc',
+                                   'regsintr.hh',
+                                   'minor_custom_timings.py'])
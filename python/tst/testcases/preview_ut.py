@@ -0,0 +1,163 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.allocator import Allocator
+from modelparsing.extensions import Extensions
+from modelparsing.model import Model
+from modelparsing.preview import artifacts
+from modelparsing.preview import compare
+from modelparsing.registers import Registers
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestPreview(unittest.TestCase):
+    '''
+    Tests for rendering the generated files in memory.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestPreview, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.exts = Extensions([Model(read=True), Model(write=True)])
+        self.regs = Registers()
+        self.tc = self.folderpath + 'toolchain'
+        self.build = self.folderpath + 'build'
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def write(self, files):
+        for artifact in files:
+            if artifact.path is None:
+                continue
+            if not os.path.isdir(os.path.dirname(artifact.path)):
+                os.makedirs(os.path.dirname(artifact.path))
+            with open(artifact.path, 'w') as fh:
+                fh.write(artifact.content)
+
+    def testArtifactsWithoutToolchain(self):
+        files = artifacts(self.exts, self.regs, self.tc, self.build)
+
+        self.assertEqual([artifact.name for artifact in files],
+                         ['riscv-custom-opc.h', 'riscv-opc.c',
+                          'riscvintr.h', 'custom.isa', 'regsintr.hh',
+                          'minor_custom_timings.py'])
+        # toolchain files are rendered, but not compared
+        self.assertEqual([artifact.name for artifact in files
+                          if artifact.path is None],
+                         ['riscv-custom-opc.h', 'riscv-opc.c',
+                          'riscvintr.h'])
+        self.assertIn('read_custreg', files[1].content)
+        # nothing is written
+        self.assertFalse(os.path.exists(self.build))
+
+    def testCompare(self):
+        files = artifacts(self.exts, self.regs, self.tc, self.build)
+        (diff, changed) = compare(files)
+
+        self.assertEqual(changed,
+                         ['custom.isa', 'regsintr.hh',
+                          'minor_custom_timings.py'])
+        self.assertIn('+++ b/' + self.build.lstrip('/') + '/isa/custom.isa',
+                      diff)
+
+        self.write(files)
+        self.assertEqual(compare(files), ('', []))
+
+        # changed registers only change the register intrinsics
+        self.regs.regmap['CUSTREG'] = 0x800
+        files = artifacts(self.exts, self.regs, self.tc, self.build)
+        (diff, changed) = compare(files)
+
+        self.assertEqual(changed, ['regsintr.hh'])
+        self.assertIn('+', diff)
+
+    def testSourcePatch(self):
+        opcc = os.path.join(self.tc, 'riscv-binutils-gdb/opcodes/riscv-opc.c')
+        os.makedirs(os.path.dirname(opcc))
+        with open(opcc, 'w') as fh:
+            fh.write('{\n' +
+                     '{ test },\n' +
+                     '\n' +
+                     '/* Terminate the list.  */\n' +
+                     '{0, 0, 0, 0, 0, 0, 0}\n' +
+                     '};')
+
+        files = artifacts(self.exts, self.regs, self.tc, self.build)
+        source = [artifact for artifact in files
+                  if artifact.name == 'riscv-opc.c'][0]
+
+        self.assertEqual(source.path, os.path.abspath(opcc))
+        self.assertEqual(source.content.splitlines()[1:3],
+                         ['{ test },',
+                          '{"read_custreg",  "I",  "d,s,t", ' +
+                          'MATCH_READ_CUSTREG, MASK_READ_CUSTREG, ' +
+                          'match_opcode, 0 },'])
+        # the source on disk is left untouched
+        (diff, changed) = compare(files)
+        self.assertIn('riscv-opc.c', changed)
+        with open(opcc, 'r') as fh:
+            self.assertNotIn('read_custreg', fh.read())
+
+    def testRecord(self):
+        record = self.folderpath + 'encodings.json'
+        model = Model(read=True)
+        model.set_encoding(None, None, None)
+        allocator = Allocator(record, readonly=True)
+        allocator.allocate([model])
+
+        self.assertFalse(os.path.exists(record))
+
+        files = artifacts(self.exts, self.regs, self.tc, self.build,
+                          allocator)
+        self.assertEqual(files[0].name, 'encodings.json')
+        self.assertIn('read_custreg', files[0].content)
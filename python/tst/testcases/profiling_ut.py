@@ -0,0 +1,196 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import json
+import os
+import pstats
+import shutil
+import sys
+import threading
+import unittest
+
+sys.path.append('..')
+from modelparsing import profiling
+from modelparsing.fileutils import write_if_changed
+from modelparsing.profiling import Profiler
+from modelparsing.profiling import profiled
+from modelparsing.profiling import span
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestProfiling(unittest.TestCase):
+    '''
+    Tests for the profiling hooks and the trace export.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestProfiling, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        if not os.path.isdir(self.folderpath):
+            os.makedirs(self.folderpath)
+
+    def tearDown(self):
+        profiling.disable()
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def testDisabled(self):
+        # without a profiler, the hooks record nothing
+        profiler = Profiler()
+        with span('a', 'task'):
+            pass
+        self.assertEqual(profiler.events, [])
+
+    def testSpans(self):
+        profiler = Profiler()
+        profiling.enable(profiler)
+
+        @profiled('outer', 'phase')
+        def outer():
+            with span('inner', 'task'):
+                write_if_changed(self.folderpath + 'file', 'content')
+
+        outer()
+        profiling.disable()
+
+        self.assertEqual([(event['name'], event['cat'])
+                          for event in profiler.events],
+                         [(self.folderpath + 'file', 'write'),
+                          ('inner', 'task'),
+                          ('outer', 'phase')])
+
+        trace = profiler.trace()['traceEvents']
+        # sorted by start, relative to the first event
+        self.assertEqual([event['name'] for event in trace],
+                         ['outer', 'inner', self.folderpath + 'file'])
+        self.assertEqual(trace[0]['ts'], 0)
+        for event in trace:
+            self.assertEqual(event['ph'], 'X')
+            self.assertIn('cpu_ms', event['args'])
+            self.assertIn('children_ms', event['args'])
+        self.assertLessEqual(trace[2]['ts'] + trace[2]['dur'],
+                             trace[0]['dur'] + 1)
+
+    def testThreads(self):
+        # spans of other threads only record the wall time
+        profiler = Profiler()
+        profiling.enable(profiler)
+        with span('main', 'task'):
+            def worker():
+                with span('worker', 'task'):
+                    pass
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        profiling.disable()
+
+        events = dict((event['name'], event) for event in profiler.events)
+        self.assertEqual((events['worker']['cpu'],
+                          events['worker']['children']), (None, None))
+        self.assertIsNotNone(events['main']['cpu'])
+
+        trace = dict((event['name'], event)
+                     for event in profiler.trace()['traceEvents'])
+        self.assertEqual(trace['worker']['args'], {})
+        self.assertIn('cpu_ms', trace['main']['args'])
+
+        rows = [line.split() for line in profiler.summary().splitlines()]
+        self.assertIn('proc', rows[0])
+        worker = [row for row in rows if row[1] == 'worker'][0]
+        self.assertEqual(worker[4:], ['-', '-'])
+
+    def testCollect(self):
+        # events of a worker are returned with the result
+        (result, events) = profiling.collect(self.work, 'x')
+        self.assertEqual(result, 'xx')
+        self.assertEqual([event['name'] for event in events], ['work'])
+        self.assertIsNone(profiling.active())
+
+        profiler = Profiler()
+        profiler.extend(events)
+        self.assertEqual(profiler.events, events)
+
+    def work(self, arg):
+        with span('work', 'model'):
+            return arg * 2
+
+    def testSave(self):
+        profiler = Profiler(cprofile=True)
+        profiling.enable(profiler)
+        with span('short', 'phase'):
+            pass
+        with span('long', 'phase'):
+            with span('nested', 'phase'):
+                sum(range(100000))
+        for i in range(3):
+            with span('render', 'render'):
+                pass
+        profiling.disable()
+
+        # only the outermost phases are profiled
+        self.assertEqual(profiler.hottest, 'long')
+
+        files = profiler.save(self.folderpath + 'trace.json')
+        self.assertEqual(files, [self.folderpath + 'trace.json',
+                                 self.folderpath + 'trace.txt',
+                                 self.folderpath + 'trace.prof'])
+
+        with open(self.folderpath + 'trace.json', 'r') as fh:
+            trace = json.load(fh)
+        self.assertEqual(len(trace['traceEvents']), 6)
+
+        with open(self.folderpath + 'trace.txt', 'r') as fh:
+            summary = fh.readlines()
+        rows = [line.split()[:3] for line in summary[1:]]
+        # totals per category come first
+        self.assertEqual(sorted(rows[:2]), [['phase', '*', '3'],
+                                            ['render', '*', '3']])
+        self.assertIn(['render', 'render', '3'], rows)
+        # then the spans, the longest first
+        names = [row[1] for row in rows[2:]]
+        self.assertLess(names.index('long'), names.index('short'))
+
+        stats = pstats.Stats(self.folderpath + 'trace.prof')
+        self.assertTrue(stats.total_calls > 0)
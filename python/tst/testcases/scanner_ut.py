@@ -0,0 +1,195 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+from scripts import model_gen
+from scripts.ccmodel import CCModel
+from mako.template import Template
+
+sys.path.append('..')
+from modelparsing.exceptions import ConsistencyError
+from modelparsing.model import Model
+from modelparsing.scanner import scan_model
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestScanner(unittest.TestCase):
+    '''
+    Tests for the libclang free model scanner.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestScanner, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        # frequently used variables
+        self.ftype = 'R'
+        self.inttype = 'uint32_t'
+        self.opc = 0x02
+        self.funct3 = 0x01
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def genModel(self, name, filename, funct7=0xff, faults=[]):
+        '''
+        Create local cc Model and from that cc file.
+        '''
+        self.ccmodel = CCModel(name,
+                               self.ftype,
+                               self.inttype,
+                               self.opc,
+                               self.funct3,
+                               funct7,
+                               faults)
+
+        # generate .cc models
+        modelgen = Template(filename=model_gen)
+
+        with open(filename, 'w') as fh:
+            fh.write(modelgen.render(model=self.ccmodel))
+
+    def testScanRType(self):
+        name = 'rtype'
+        funct7 = 0x03
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename, funct7)
+
+        fields = scan_model(filename)
+
+        self.assertEqual(fields['name'], name)
+        self.assertEqual(fields['form'], 'R')
+        self.assertEqual(fields['opc'], self.opc)
+        self.assertEqual(fields['funct3'], self.funct3)
+        self.assertEqual(fields['funct7'], funct7)
+        self.assertEqual(fields['cycles'], 1)
+        self.assertEqual(fields['definition'],
+                         '{\n    // function definition\n}')
+
+    def testScanIType(self):
+        name = 'itype'
+        self.ftype = 'I'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        fields = scan_model(filename)
+
+        self.assertEqual(fields['name'], name)
+        self.assertEqual(fields['form'], 'I')
+        self.assertIsNone(fields['funct7'])
+
+    def testScanSameAsLibclang(self):
+        name = 'same'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename, 0x01)
+
+        # the definition is found at the same position
+        model = Model(filename)
+        fields = model.to_dict()
+        fields['span'] = model.span
+        self.assertEqual(scan_model(filename), fields)
+
+    def testScanNoRd(self):
+        # models with missing parameters are left to libclang
+        name = 'nord'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename, faults=['nord'])
+
+        self.assertEqual(scan_model(filename), None)
+
+    def testScanNonVoid(self):
+        name = 'nonvoid'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename, faults=['nonvoid', 'return'])
+
+        self.assertEqual(scan_model(filename), None)
+
+    def testScanTrailingCode(self):
+        name = 'trailing'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        with open(filename, 'a') as fh:
+            fh.write('uint8_t other = 0;\n')
+
+        self.assertEqual(scan_model(filename), None)
+
+    def testFastModelFallback(self):
+        # the fallback to libclang still reports errors
+        name = 'return'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename, faults=['return'])
+
+        with self.assertRaises(ConsistencyError):
+            Model(filename, fast=True)
@@ -0,0 +1,145 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import sys
+import threading
+import unittest
+
+sys.path.append('..')
+from modelparsing.scheduler import Scheduler
+from modelparsing.scheduler import summary
+sys.path.remove('..')
+
+
+class TestScheduler(unittest.TestCase):
+    '''
+    Tests for the scheduler of the generation tasks.
+    '''
+
+    def setUp(self):
+        self.order = []
+        self.lock = threading.Lock()
+
+    def task(self, name):
+        def func():
+            with self.lock:
+                self.order.append(name)
+        return func
+
+    def testSequential(self):
+        scheduler = Scheduler()
+        scheduler.add('a', self.task('a'))
+        scheduler.add('b', self.task('b'), ['a'])
+        scheduler.add('c', self.task('c'))
+        timings = scheduler.run()
+
+        self.assertEqual(self.order, ['a', 'b', 'c'])
+        self.assertEqual([name for (name, _) in timings], ['a', 'b', 'c'])
+
+    def testDependencies(self):
+        scheduler = Scheduler(4)
+        scheduler.add('a', self.task('a'))
+        scheduler.add('b', self.task('b'), ['a'])
+        scheduler.add('c', self.task('c'), ['b'])
+        scheduler.add('d', self.task('d'), ['a', 'c'])
+        scheduler.run()
+
+        self.assertEqual(self.order, ['a', 'b', 'c', 'd'])
+
+    def testConcurrent(self):
+        # both tasks only finish, if they run at the same time
+        first = threading.Event()
+        second = threading.Event()
+
+        def a():
+            first.set()
+            self.assertTrue(second.wait(10))
+
+        def b():
+            second.set()
+            self.assertTrue(first.wait(10))
+
+        scheduler = Scheduler(2)
+        scheduler.add('a', a)
+        scheduler.add('b', b)
+        scheduler.run()
+
+    def testFailure(self):
+        def fail():
+            raise RuntimeError('failed')
+
+        scheduler = Scheduler(2)
+        scheduler.add('a', fail)
+        scheduler.add('b', self.task('b'), ['a'])
+
+        self.assertRaises(RuntimeError, scheduler.run)
+        # dependents of failed tasks are skipped
+        self.assertEqual(self.order, [])
+        self.assertEqual([name for (name, _) in scheduler.timings], ['a'])
+
+    def testFailureIndependent(self):
+        def fail():
+            raise RuntimeError('failed')
+
+        for jobs in (1, 2):
+            self.order = []
+            scheduler = Scheduler(jobs)
+            scheduler.add('a', fail)
+            scheduler.add('b', self.task('b'), ['a'])
+            scheduler.add('c', self.task('c'), ['b'])
+            scheduler.add('d', self.task('d'))
+            scheduler.add('e', self.task('e'), ['d'])
+
+            self.assertRaises(RuntimeError, scheduler.run)
+            # only the tasks depending on the failed task are skipped
+            self.assertEqual(self.order, ['d', 'e'])
+
+    def testUnknownDependency(self):
+        scheduler = Scheduler()
+        scheduler.add('a', self.task('a'))
+
+        self.assertRaises(ValueError, scheduler.add, 'b', self.task('b'),
+                          ['c'])
+        self.assertRaises(ValueError, scheduler.add, 'a', self.task('a'))
+
+    def testSelect(self):
+        # selected tasks keep their dependencies
+        scheduler = Scheduler()
+        scheduler.add('a', self.task('a'))
+        scheduler.add('b', self.task('b'), ['a'])
+        scheduler.add('c', self.task('c'))
+        scheduler.select(['b'])
+        scheduler.run()
+
+        self.assertEqual(self.order, ['a', 'b'])
+        self.assertEqual([task.name for task in scheduler.tasks], ['a', 'b'])
+
+    def testSummary(self):
+        self.assertEqual(summary([('parse', 1.5), ('gem5.cxx', 0.25)]),
+                         'parse        1.500s\n' +
+                         'gem5.cxx     0.250s\n')
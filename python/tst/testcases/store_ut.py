@@ -0,0 +1,129 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import threading
+import unittest
+
+sys.path.append('..')
+from modelparsing.store import HttpStore
+from modelparsing.store import LocalStore
+from modelparsing.store import StoreServer
+from modelparsing.store import open_store
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestStore(unittest.TestCase):
+    '''
+    Tests for the artifact stores and the reference server.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestStore, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.storepath = self.folderpath + 'store'
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def serve(self):
+        '''
+        Start a local stand-in server in the background.
+        '''
+        server = StoreServer(self.storepath, ('127.0.0.1', 0))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def testLocalStore(self):
+        store = LocalStore(self.storepath)
+        self.assertIsNone(store.get('models/abc'))
+
+        store.put('models/abc', '\\x00data')
+        self.assertEqual(store.get('models/abc'), '\\x00data')
+        self.assertEqual(os.listdir(self.storepath + '/models'), ['abc'])
+
+    def testInvalidKey(self):
+        store = LocalStore(self.storepath)
+        for key in ('../abc', '/abc', 'models/../../abc', ''):
+            self.assertRaises(ValueError, store.put, key, 'data')
+            self.assertRaises(ValueError, store.get, key)
+
+    def testHttpStore(self):
+        server = self.serve()
+        store = HttpStore(server.url)
+
+        self.assertIsNone(store.get('isa/abc'))
+        store.put('isa/abc', '\\x00data' * 1000)
+
+        self.assertEqual(store.get('isa/abc'), '\\x00data' * 1000)
+        self.assertTrue(store.available)
+        # the server stores the entries in its directory
+        self.assertEqual(LocalStore(self.storepath).get('isa/abc'),
+                         '\\x00data' * 1000)
+
+    def testHttpStoreUnavailable(self):
+        server = StoreServer(self.storepath, ('127.0.0.1', 0))
+        url = server.url
+        server.server_close()
+
+        store = HttpStore(url, timeout=1)
+        self.assertIsNone(store.get('isa/abc'))
+        self.assertFalse(store.available)
+        # no further requests are made
+        store.put('isa/abc', 'data')
+
+    def testOpenStore(self):
+        self.assertTrue(isinstance(open_store('http://localhost:8090'),
+                                   HttpStore))
+        store = open_store('file://' + self.storepath)
+        self.assertTrue(isinstance(store, LocalStore))
+        self.assertEqual(store.path, self.storepath)
@@ -0,0 +1,148 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+
+from scripts import render_all
+
+sys.path.append('..')
+from modelparsing import templating
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestTemplating(unittest.TestCase):
+    '''
+    Tests for the template registry.
+    '''
+
+    class Inst:
+        def __init__(self, name):
+            self.name = name
+            self.form = 'R'
+
+    def __init__(self, *args, **kwargs):
+        super(TestTemplating, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.modules = self.folderpath + 'mako'
+
+    def tearDown(self):
+        templating.set_module_directory(None)
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def testTemplates(self):
+        self.assertEqual(templating.templates(),
+                         ['custom.isa.mako',
+                          'decoder-patch.isa.mako',
+                          'minor_custom_timings.py.mako',
+                          'regsintr.hh.mako',
+                          'riscv-custom-opc.h.mako',
+                          'riscvintr.h.mako'])
+
+    def testRender(self):
+        content = templating.render('regsintr.hh.mako',
+                                    regmap={'CUSTREG': 0x1})
+
+        self.assertIn('#define CUSTREG 0x1\n', content)
+        self.assertNotIn('Copyright', content)
+
+    def testRenderFile(self):
+        # rendering into a file gives the same content
+        insts = [self.Inst('inst{}'.format(i)) for i in range(100)]
+        regmap = {'CUSTREG': 0x1}
+        path = self.folderpath + 'riscvintr.h'
+
+        self.assertTrue(templating.render_file(path, 'riscvintr.h.mako',
+                                               regmap=regmap, insts=insts))
+        self.assertFalse(templating.render_file(path, 'riscvintr.h.mako',
+                                                regmap=regmap, insts=insts))
+
+        with open(path, 'r') as fh:
+            self.assertEqual(fh.read(),
+                             templating.render('riscvintr.h.mako',
+                                               regmap=regmap, insts=insts))
+
+    def testModuleDirectory(self):
+        templating.set_module_directory(self.modules)
+        templating.get_template('regsintr.hh.mako')
+
+        module = os.path.join(self.modules, 'regsintr.hh.mako.py')
+        self.assertTrue(os.path.isfile(module))
+
+        # a new registry reuses the compiled module
+        mtime = int(os.path.getmtime(module))
+        os.utime(module, (mtime, mtime))
+        templating.set_module_directory(self.modules)
+        templating.get_template('regsintr.hh.mako')
+
+        self.assertEqual(os.path.getmtime(module), mtime)
+
+    def testModuleDirectoryTemplateChanged(self):
+        templating.set_module_directory(self.modules)
+        templating.get_template('regsintr.hh.mako')
+
+        # a module older than its template is compiled again
+        module = os.path.join(self.modules, 'regsintr.hh.mako.py')
+        os.utime(module, (0, 0))
+        templating.set_module_directory(self.modules)
+        templating.get_template('regsintr.hh.mako')
+
+        self.assertNotEqual(os.path.getmtime(module), 0)
+
+    def testReproducible(self):
+        # the output must not depend on the hash seed
+        outputs = []
+        for seed in ('1', '2'):
+            env = dict(os.environ)
+            env['PYTHONHASHSEED'] = seed
+            outputs.append(subprocess.check_output(
+                [sys.executable, render_all], env=env))
+
+        self.assertTrue(outputs[0])
+        self.assertEqual(outputs[0], outputs[1])
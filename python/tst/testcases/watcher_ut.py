@@ -0,0 +1,101 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.watcher import Watcher
+from modelparsing.watcher import snapshot
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestWatcher(unittest.TestCase):
+    '''
+    Tests for the watcher of the model directory.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestWatcher, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.models = self.folderpath + 'models/'
+        os.makedirs(self.models + 'sub')
+        self.model = self.models + 'itype.cc'
+        with open(self.model, 'w') as fh:
+            fh.write('// model\n')
+        self.regs = self.models + 'sub/registers.hh'
+        with open(self.regs, 'w') as fh:
+            fh.write('// registers\n')
+        with open(self.models + 'README', 'w') as fh:
+            fh.write('not watched\n')
+
+    def tearDown(self):
+        if os.path.isdir(self.folderpath):
+            shutil.rmtree(self.folderpath)
+
+    def testSnapshot(self):
+        self.assertEqual(sorted(snapshot(self.models)),
+                         [self.model, self.regs])
+        self.assertEqual(list(snapshot(self.model)), [self.model])
+
+    def testPoll(self):
+        watcher = Watcher(self.models)
+        self.assertEqual(watcher.poll(), ([], []))
+
+        with open(self.model, 'a') as fh:
+            fh.write('// changed\n')
+        added = self.models + 'rtype.cc'
+        with open(added, 'w') as fh:
+            fh.write('// model\n')
+        os.remove(self.regs)
+
+        self.assertEqual(watcher.poll(), ([self.model, added], [self.regs]))
+        self.assertEqual(watcher.poll(), ([], []))
+
+    def testWaitTimeout(self):
+        watcher = Watcher(self.models, interval=0.01)
+        self.assertEqual(watcher.wait(timeout=0.05), ([], []))